@@ -11,11 +11,12 @@ Features:
 """
 
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import os
+import requests
 
 # Configuración PRIMERO (debe ser lo primero en la app)
 st.set_page_config(
@@ -38,7 +39,7 @@ from services import (
     add_essential_wisdom,
     HTMLReportRenderer,  # Report renderer estilo FinRobot
     # === SEC ANALYZER (FinRobot-inspired) ===
-    SECAnalyzer, format_filing_date, get_filing_icon,
+    SECAnalyzer, format_filing_date, get_filing_icon, XBRL_METRICS,
     # === SCREENER (Discovery) ===
     ScreenerService,
     # === MACRO SERVICE (Pablo Gil) ===
@@ -1026,6 +1027,9 @@ with tabs[6]:  # COMITÉ
                             fundamentals = st.session_state.market_service.get_fundamentals(ticker)
                             income = st.session_state.openbb.get_income_statement(ticker, period="annual", limit=3)
                             balance = st.session_state.openbb.get_balance_sheet(ticker, period="annual", limit=3)
+                            # Histórico de 10 ejercicios de los filings XBRL de SEC (una descarga, luego en disco)
+                            st.session_state.sec_analyzer.load_company_facts(ticker)
+                            xbrl_history = st.session_state.sec_analyzer.fact_store.summary_text(ticker)
                             
                             # Crear contexto artificial
                             auto_context = f"""
@@ -1043,6 +1047,8 @@ with tabs[6]:  # COMITÉ
                             
                             BALANCE SHEET:
                             {balance.to_string() if balance is not None else 'No disponible'}
+                            
+                            {xbrl_history or 'HISTÓRICO SEC XBRL: No disponible'}
                             """
                             
                             st.session_state['auto_financial_context'] = auto_context
@@ -1085,6 +1091,11 @@ with tabs[6]:  # COMITÉ
             # Obtener contexto de datos
             if st.session_state.oraculo.is_loaded:
                 ctx = st.session_state.oraculo.get_financial_context()
+                # Tendencia de 10 ejercicios junto al 10-K, si el histórico XBRL ya está en disco
+                xbrl_history = st.session_state.sec_analyzer.fact_store.summary_text(ticker)
+                if xbrl_history:
+                    ctx['value'] += "\n\n" + xbrl_history
+                    ctx['growth'] += "\n\n" + xbrl_history
             elif has_auto_context:
                 # Pasar los mismos datos a todos los agentes si no hay desglose específico
                 raw_data = st.session_state['auto_financial_context']
@@ -1366,10 +1377,19 @@ with tabs[10]:
         
         if up and st.button("⚙️ Procesar Documento"):
             with st.spinner("Indexando documento..."):
-                n, s = st.session_state.oraculo.ingest(up)
-                st.session_state.active_doc_name = up.name
-                st.session_state.doc_structure = s
-                st.success(f"✅ {n} chunks indexados")
+                try:
+                    n, s = st.session_state.oraculo.ingest(up)
+                except Exception as e:
+                    st.error(f"❌ Error procesando {up.name}: {e}")
+                else:
+                    st.session_state.active_doc_name = up.name
+                    st.session_state.doc_structure = s
+                    st.success(
+                        f"✅ {n} chunks indexados"
+                        + (f" ({s.reused_chunks} reutilizados sin recalcular)" if s.reused_chunks else "")
+                    )
+                    if s.timings:
+                        st.caption(" · ".join(f"{stage}: {seconds:.1f}s" for stage, seconds in s.timings.items()))
     
     with c2:
         st.subheader("🔍 Búsqueda Rápida por Sección")
@@ -1381,7 +1401,18 @@ with tabs[10]:
             if cols[i % 4].button(section.upper(), key=f"sec_{section}"):
                 result = st.session_state.oraculo.search_section(section)
                 st.write(result)
-    
+
+        st.subheader("📊 Cifras de los Estados Financieros")
+        fc1, fc2 = st.columns([3, 1])
+        line_item = fc1.text_input("Línea", placeholder="Total revenues", key="fin_line_item")
+        period = fc2.text_input("Periodo", placeholder="2023", key="fin_period")
+        if line_item:
+            facts = st.session_state.oraculo.financial_facts(line_item, period or None)
+            if facts.empty:
+                st.info("Sin cifras para esa línea en las tablas del documento activo")
+            else:
+                st.dataframe(facts[['line_item', 'parent', 'period', 'duration', 'value', 'unit', 'title', 'page']])
+
     # History
     st.markdown("---")
     st.subheader("📜 Historial de Análisis")
@@ -1414,6 +1445,9 @@ with tabs[11]:
     
     with col1:
         search_ticker = st.text_input("🔍 Buscar filings por ticker", ticker, key="sec_ticker")
+        matches = sec.search_companies(search_ticker, limit=5) if search_ticker else []
+        if matches and matches[0].ticker != search_ticker.upper().strip():
+            st.caption("¿Quizás: " + ", ".join(f"{c.ticker} ({c.name})" for c in matches) + "?")
     
     with col2:
         form_types = st.multiselect(
@@ -1426,7 +1460,88 @@ with tabs[11]:
         with st.spinner("Buscando en SEC EDGAR..."):
             filings = sec.get_recent_filings(search_ticker, form_types)
             st.session_state['sec_filings_list'] = filings
-    
+
+    # Descarga masiva a la caché local (10 peticiones/s como máximo, según SEC)
+    with st.expander("📦 Descarga masiva de filings"):
+        bulk_mode = st.radio("Seleccionar por", ["Ticker y fechas", "Accessions"], horizontal=True, key="sec_bulk_mode")
+        if bulk_mode == "Ticker y fechas":
+            bcol1, bcol2 = st.columns(2)
+            bulk_start = bcol1.date_input("Desde", datetime.now() - timedelta(days=5 * 365), key="sec_bulk_start")
+            bulk_end = bcol2.date_input("Hasta", datetime.now(), key="sec_bulk_end")
+        else:
+            bulk_accessions = st.text_area("Accessions (una por línea)", key="sec_bulk_accessions",
+                                           placeholder="0000320193-23-000106")
+
+        if st.button("📦 Descargar", key="sec_bulk_download"):
+            downloader = sec.bulk_downloader()
+            try:
+                with st.spinner("Seleccionando filings en EDGAR..."):
+                    if bulk_mode == "Ticker y fechas":
+                        selection = downloader.select(search_ticker, form_types or None,
+                                                      bulk_start.isoformat(), bulk_end.isoformat())
+                    else:
+                        selection = downloader.select_accessions(bulk_accessions.split(), ticker=search_ticker or None)
+            except (ValueError, requests.exceptions.RequestException) as e:
+                st.error(f"❌ {e}")
+                selection = []
+
+            if selection:
+                bar = st.progress(0.0, text=f"0/{len(selection)} filings")
+
+                def _bulk_progress(result, done, total):
+                    f = result.filing
+                    bar.progress(done / total, text=f"{done}/{total} · {f['form_type']} {f['filing_date']} ({result.status})")
+
+                results = downloader.download(selection, progress=_bulk_progress)
+                downloaded = sum(r.status == 'downloaded' for r in results)
+                cached = sum(r.status == 'cached' for r in results)
+                failed = [r for r in results if not r.ok]
+                st.success(f"✅ {downloaded} descargados ({sum(r.bytes for r in results) / 1e6:.1f} MB), "
+                           f"{cached} ya estaban en caché")
+                for r in failed:
+                    st.warning(f"⚠️ {r.filing['accession_number']}: {r.error}")
+            elif bulk_mode == "Ticker y fechas":
+                st.info("ℹ️ No hay filings de esos tipos en el rango de fechas")
+
+    # Histórico de fundamentales desde los hechos XBRL (companyfacts)
+    with st.expander("🧮 Histórico XBRL (companyfacts)"):
+        xcol1, xcol2 = st.columns(2)
+        with xcol1:
+            if st.button(f"📥 Cargar XBRL de {search_ticker}", key="sec_xbrl_fetch") and search_ticker:
+                with st.spinner("Descargando companyfacts de SEC..."):
+                    n_facts = sec.load_company_facts(search_ticker, max_age_hours=0)
+                if n_facts:
+                    st.success(f"✅ {n_facts:,} hechos XBRL de {search_ticker}")
+                else:
+                    st.error(f"❌ No se pudo cargar el XBRL de {search_ticker}")
+        with xcol2:
+            xbrl_path = st.text_input("O importar de disco (JSON, .json.gz, carpeta o companyfacts.zip)", key="sec_xbrl_path")
+            if st.button("📂 Importar", key="sec_xbrl_import") and xbrl_path:
+                status = st.empty()
+                try:
+                    n_companies = sec.import_company_facts(
+                        xbrl_path, progress=lambda n, name: status.caption(f"{n} emisores · {name}")
+                    )
+                    st.success(f"✅ {n_companies} emisores importados")
+                except Exception as e:
+                    st.error(f"❌ Error importando {xbrl_path}: {e}")
+
+        stored = sec.fact_store.companies()
+        if not stored.empty:
+            st.caption(f"{len(stored)} emisores en el almacén local")
+            qcol1, qcol2, qcol3 = st.columns([2, 1, 1])
+            xbrl_tickers = qcol1.text_input("Tickers", search_ticker, key="sec_xbrl_tickers")
+            xbrl_metric = qcol2.selectbox("Métrica", list(XBRL_METRICS), key="sec_xbrl_metric")
+            xbrl_years = qcol3.number_input("Años", 1, 30, 15, key="sec_xbrl_years")
+            history = sec.fact_store.frame(
+                [t.strip() for t in xbrl_tickers.split(",") if t.strip()], xbrl_metric, years=int(xbrl_years)
+            )
+            if history.empty:
+                st.info("ℹ️ Sin datos de esa métrica para esos tickers")
+            else:
+                st.line_chart(history)
+                st.dataframe(history, use_container_width=True)
+
     # Mostrar filings encontrados
     if 'sec_filings_list' in st.session_state and st.session_state['sec_filings_list']:
         filings = st.session_state['sec_filings_list']
@@ -1602,7 +1717,9 @@ FECHA: {analyzed.filing_date}
                     filename = f"{analyzed.ticker}_{analyzed.form_type}_{analyzed.filing_date}.txt"
                     n_chunks = st.session_state.oraculo.ingest_text(
                         content, 
-                        filename=filename
+                        filename=filename,
+                        ticker=analyzed.ticker,
+                        tables=analyzed.tables
                     )
                     
                     # ACTUALIZAR ESTADO DE DOCUMENTO ACTIVO
@@ -45,6 +45,21 @@ class PathConfig:
     def vectordb(self) -> str:
         return os.path.join(self.base, '4_DATOS/vectordb')
     
+    @property
+    def documents(self) -> str:
+        """Un índice por documento del Oráculo (registro por hash de contenido)"""
+        return os.path.join(self.base, '4_DATOS/documents')
+    
+    @property
+    def query_vectors(self) -> str:
+        """Embeddings persistidos de consultas fijas, por modelo"""
+        return os.path.join(self.base, '4_DATOS/query_vectors')
+    
+    @property
+    def sec(self) -> str:
+        """Datos de SEC EDGAR en local (índice de CIKs, filings descargados)"""
+        return os.path.join(self.base, '4_DATOS/sec')
+    
     @property
     def historico(self) -> str:
         return os.path.join(self.base, '5_HISTORICO')
@@ -63,8 +78,8 @@ class PathConfig:
     
     def ensure_directories(self) -> None:
         """Crea todos los directorios necesarios"""
-        for path in [self.biblioteca, self.vectordb, self.debates, 
-                     self.sessions, self.exports]:
+        for path in [self.biblioteca, self.vectordb, self.documents, self.query_vectors, self.sec,
+                     self.debates, self.sessions, self.exports]:
             os.makedirs(path, exist_ok=True)
 
 # ============================================================================
@@ -80,7 +95,29 @@ class ModelTier(Enum):
 @dataclass
 class ModelConfig:
     """Configuración de modelos LLM"""
+    # Modelo único para la biblioteca, el Oráculo y los indexadores: cada
+    # índice registra su modelo y se rechaza con cualquier otro. El ahorro
+    # de tamaño frente a text-embedding-3-small se obtiene truncando
+    # (embedding_dimensions, p.ej. 1536) y cuantizando, no cambiando de modelo
     embedding_model: str = "text-embedding-3-large"
+    # Backend de embeddings: 'openai' | 'local' | 'hashing' | 'auto'
+    embedding_backend: str = field(default_factory=lambda: os.getenv('SINDICATO_EMBEDDINGS', 'openai'))
+    # Ruta de un modelo sentence-transformers en disco (backend 'local')
+    local_embedding_model: str = field(default_factory=lambda: os.getenv('SINDICATO_LOCAL_EMBEDDING_MODEL', ''))
+    hashing_dimension: int = 512
+    embedding_batch_size: int = 256
+    embedding_workers: int = 4
+    # Procesos para extraer PDFs por rangos de páginas (1 = sin paralelismo)
+    pdf_workers: int = field(default_factory=lambda: int(os.getenv('SINDICATO_PDF_WORKERS', str(min(4, os.cpu_count() or 1)))))
+    # Perfil de almacenamiento de índices NUEVOS (cada índice conserva el suyo):
+    # dimensiones Matryoshka (0 = completas; solo modelos entrenados así, p.ej.
+    # text-embedding-3-*) y cuantización 'float32' | 'float16' | 'int8'
+    embedding_dimensions: int = field(default_factory=lambda: int(os.getenv('SINDICATO_EMBEDDING_DIMS', '0')))
+    vector_quantization: str = field(default_factory=lambda: os.getenv('SINDICATO_VECTOR_QUANT', 'float32'))
+    # Índices de documentos del Oráculo abiertos a la vez (LRU)
+    resident_documents: int = field(default_factory=lambda: int(os.getenv('SINDICATO_RESIDENT_DOCS', '4')))
+    # Descargas simultáneas de filings de SEC (el límite de 10 peticiones/s es global)
+    sec_download_workers: int = field(default_factory=lambda: int(os.getenv('SINDICATO_SEC_WORKERS', '4')))
     fast_model: str = ModelTier.FAST.value
     standard_model: str = ModelTier.STANDARD.value
     premium_model: str = ModelTier.PREMIUM.value
@@ -1,23 +1,36 @@
 """
 📚 INDEXADOR STANDALONE - Sin dependencias de Streamlit
 Ejecuta directamente con Python
+
+Reanudable: publica checkpoints periódicos y lleva un diario por archivo
+(estado + hash). Al relanzarlo tras una interrupción omite los libros ya
+publicados sin cambios.
+
+Cada colección (cartas de Buffett, libros, 10-K, general) es un fragmento
+independiente: un checkpoint solo publica los fragmentos que han cambiado.
+
+    python index_biblioteca.py                           # incremental / reanudar
+    python index_biblioteca.py --rebuild                 # reconstruir desde cero
+    python index_biblioteca.py --shard sec_filings       # solo un fragmento
+    python index_biblioteca.py --shard sec_filings --rebuild
 """
 
 import os
 import sys
-import json
-import tempfile
 from datetime import datetime
 
 # Configurar paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LIBRARY_PATH = os.path.join(BASE_DIR, 'knowledge_library')
-VECTORSTORE_PATH = os.path.join(LIBRARY_PATH, 'vectorstore')
+VECTORSTORE_PATH = os.path.join(LIBRARY_PATH, 'vectorstore')  # Índice único anterior
+SHARDS_PATH = os.path.join(LIBRARY_PATH, 'shards')
 METADATA_PATH = os.path.join(LIBRARY_PATH, 'metadata.json')
+CATALOG_PATH = os.path.join(LIBRARY_PATH, 'catalog.sqlite')
+JOURNAL_PATH = os.path.join(LIBRARY_PATH, 'index_journal.sqlite')
 
 # Crear directorios
 os.makedirs(LIBRARY_PATH, exist_ok=True)
-os.makedirs(VECTORSTORE_PATH, exist_ok=True)
+os.makedirs(SHARDS_PATH, exist_ok=True)
 
 print("="*70)
 print("📚 INDEXADOR DE BIBLIOTECA - Sindicato V8")
@@ -26,12 +39,12 @@ print()
 
 # Importar dependencias necesarias
 try:
-    from langchain_openai import OpenAIEmbeddings
-    from langchain_community.vectorstores import FAISS
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    from langchain.schema import Document
-    import pdfplumber
-    from bs4 import BeautifulSoup
+    from services.chunking import StreamingChunker, iter_document_pages, iter_chunk_batches
+    from services.library_shards import get_sharded_store, classify_book, SHARDS, LEGACY_SHARD
+    from services.index_journal import IndexJournal
+    from services.library_catalog import LibraryCatalog
+    from services.embeddings import get_embedding_provider
+    from config import MODELS
     print("✅ Dependencias cargadas correctamente")
 except ImportError as e:
     print(f"❌ Error importando dependencias: {e}")
@@ -39,16 +52,32 @@ except ImportError as e:
     print("  pip install langchain langchain-openai langchain-community faiss-cpu pdfplumber beautifulsoup4")
     sys.exit(1)
 
-# Verificar API Key
-if not os.getenv('OPENAI_API_KEY'):
-    print("❌ OPENAI_API_KEY no configurada")
-    print("\nConfigura tu API key:")
-    print("  set OPENAI_API_KEY=tu-api-key")
-    sys.exit(1)
+# Verificar API Key (solo para el backend OpenAI; 'local'/'hashing' funcionan offline)
+if MODELS.embedding_backend == 'openai':
+    if not os.getenv('OPENAI_API_KEY'):
+        print("❌ OPENAI_API_KEY no configurada")
+        print("\nConfigura tu API key:")
+        print("  set OPENAI_API_KEY=tu-api-key")
+        print("\nO indexa sin API con un modelo local:")
+        print("  set SINDICATO_EMBEDDINGS=local")
+        print("  set SINDICATO_LOCAL_EMBEDDING_MODEL=ruta/al/modelo")
+        sys.exit(1)
 
-print("✅ OPENAI_API_KEY configurada")
+    print("✅ OPENAI_API_KEY configurada")
 print()
 
+# Modo reconstrucción: índice y diario desde cero
+REBUILD = '--rebuild' in sys.argv
+
+# Fragmento único (--shard NOMBRE): los demás no se leen ni se publican
+ONLY_SHARD = None
+if '--shard' in sys.argv:
+    position = sys.argv.index('--shard') + 1
+    ONLY_SHARD = sys.argv[position] if position < len(sys.argv) else None
+    if ONLY_SHARD not in SHARDS:
+        print(f"❌ Fragmento desconocido: {ONLY_SHARD} (opciones: {', '.join(SHARDS)})")
+        sys.exit(1)
+
 # Buscar archivos
 folder = "1_BIBLIOTECA"
 if not os.path.exists(folder):
@@ -61,9 +90,11 @@ books = []
 for root, dirs, files in os.walk(folder):
     for file in files:
         if any(file.lower().endswith(ext) for ext in supported):
+            if ONLY_SHARD and classify_book(file).shard != ONLY_SHARD:
+                continue
             books.append(os.path.join(root, file))
 
-print(f"📁 Carpeta: {folder}")
+print(f"📁 Carpeta: {folder}" + (f" (fragmento {ONLY_SHARD})" if ONLY_SHARD else ""))
 print(f"📚 Archivos encontrados: {len(books)}")
 print()
 
@@ -71,100 +102,56 @@ if not books:
     print("⚠️ No se encontraron archivos")
     sys.exit(0)
 
-# Funciones de extracción
-def extract_pdf(file_path):
-    try:
-        text_parts = []
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-        return "\n\n".join(text_parts)
-    except Exception as e:
-        print(f"   ⚠️ Error PDF: {e}")
-        return ""
+# Inicializar embeddings y vectorstore
+print("🔧 Inicializando embeddings...")
+# Mismo proveedor que la app (KnowledgeLibrary): un índice construido con otro
+# modelo se rechaza al abrirlo y la biblioteca aparecería vacía
+embeddings = get_embedding_provider()
+print(f"✅ Embeddings: {embeddings.name} ({embeddings.dimension} dims)")
 
-def extract_html(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f.read(), 'html.parser')
-            for tag in soup(['script', 'style', 'nav', 'footer']):
-                tag.decompose()
-            return soup.get_text(separator='\n', strip=True)
-    except Exception as e:
-        print(f"   ⚠️ Error HTML: {e}")
-        return ""
+# Un índice por fragmento; el índice único anterior se sigue sirviendo hasta un --rebuild completo
+store = get_sharded_store(SHARDS_PATH, embeddings, legacy_root=VECTORSTORE_PATH)
+current = store.current()
+if current is not None:
+    for shard, index in current.shards:
+        print(f"✅ Fragmento {shard}: generación {index.name} ({index.ntotal} vectores)")
+if ONLY_SHARD and store.has_legacy:
+    print("⚠️ Existe un índice anterior a la fragmentación: usa --rebuild sin --shard para retirarlo")
 
-def extract_txt(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except:
-        try:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                return f.read()
-        except Exception as e:
-            print(f"   ⚠️ Error TXT: {e}")
-            return ""
-
-def extract_epub(file_path):
-    try:
-        from ebooklib import epub
-        book = epub.read_epub(file_path)
-        text_parts = []
-        for item in book.get_items():
-            if item.get_type() == 9:
-                content = item.get_content().decode('utf-8', errors='ignore')
-                soup = BeautifulSoup(content, 'html.parser')
-                text = soup.get_text(separator='\n', strip=True)
-                if text:
-                    text_parts.append(text)
-        return "\n\n".join(text_parts)
-    except ImportError:
-        print("   ⚠️ ebooklib no instalado (pip install ebooklib)")
-        return ""
-    except Exception as e:
-        print(f"   ⚠️ Error EPUB: {e}")
-        return ""
-
-def extract_text(file_path, filename):
-    ext = os.path.splitext(filename)[1].lower()
-    
-    if ext == '.pdf':
-        return extract_pdf(file_path)
-    elif ext in ['.html', '.htm']:
-        return extract_html(file_path)
-    elif ext == '.epub':
-        return extract_epub(file_path)
-    elif ext in ['.txt', '.md']:
-        return extract_txt(file_path)
-    else:
-        return extract_txt(file_path)
+# Catálogo de libros
+# Catálogo compartido con la app (cada libro se registra en su propia transacción)
+catalog = LibraryCatalog(CATALOG_PATH)
 
-# Inicializar embeddings y vectorstore
-print("🔧 Inicializando embeddings...")
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+# Diario de la ejecución (estado + hash por archivo)
+journal = IndexJournal(JOURNAL_PATH)
 
-# Cargar vectorstore existente si existe
-vectorstore = None
-if os.path.exists(os.path.join(VECTORSTORE_PATH, 'index.faiss')):
-    try:
-        vectorstore = FAISS.load_local(
-            VECTORSTORE_PATH,
-            embeddings,
-            allow_dangerous_deserialization=True
+if REBUILD:
+    if ONLY_SHARD:
+        # Solo se olvidan los libros del fragmento; el resto sigue publicado
+        journal.forget(
+            [book['filename'] for book in catalog.list_books(shard=ONLY_SHARD)]
+            + [os.path.basename(path) for path in books]
         )
-        print("✅ Vectorstore existente cargado")
-    except:
-        print("⚠️ No se pudo cargar vectorstore existente, creando uno nuevo")
+    else:
+        journal.reset()
+    catalog.clear(shard=ONLY_SHARD)
+    print(f"♻️ Reconstrucción {'del fragmento ' + ONLY_SHARD if ONLY_SHARD else 'completa'} (--rebuild)")
+else:
+    catalog.import_metadata_json(METADATA_PATH)
+    if catalog.count():
+        print(f"✅ Catálogo cargado ({catalog.count()} libros previos)")
 
-# Cargar metadata existente
-metadata_dict = {}
-if os.path.exists(METADATA_PATH):
-    with open(METADATA_PATH, 'r', encoding='utf-8') as f:
-        metadata_dict = json.load(f)
-    print(f"✅ Metadata cargada ({len(metadata_dict)} libros previos)")
+if not REBUILD and not len(journal) and catalog.count():
+    # Bibliotecas indexadas antes del diario: lo que está en el catálogo ya está publicado
+    cataloged = {book['filename']: book for book in catalog.list_books()}
+    for path in books:
+        filename = os.path.basename(path)
+        if filename in cataloged:
+            journal.mark_done(
+                filename, path, journal.content_hash(filename, path),
+                cataloged[filename]['num_chunks'], cataloged[filename]['generation']
+            )
+    print(f"✅ Diario inicializado desde el catálogo ({len(journal)} libros)")
 
 print()
 print("="*70)
@@ -172,10 +159,56 @@ print("🚀 INICIANDO INDEXACIÓN")
 print("="*70)
 print()
 
+# Checkpoint cada N libros o M chunks: una interrupción pierde como mucho eso
+CHECKPOINT_EVERY_BOOKS = 10
+CHECKPOINT_EVERY_CHUNKS = 5000
+EMBED_BATCH_SIZE = 64
+
+
+# Escritor por fragmento (copia modificable de su generación activa), bajo demanda
+writers = {}
+# Fragmentos ya reconstruidos en esta ejecución (solo el primer escritor parte de cero)
+reset_shards = set()
+# Fragmentos con alguna generación publicada en esta ejecución
+published_shards = set()
+# Libros embebidos desde el último checkpoint, por fragmento (se catalogan al publicarse)
+pending_books = {}
+
+
+def writer_for(shard):
+    if shard not in writers:
+        reset = REBUILD and shard not in reset_shards
+        reset_shards.add(shard)
+        writers[shard] = store.writer(shard, reset=reset, dedup=True)
+    return writers[shard]
+
+
+def checkpoint():
+    """Publica cada fragmento con libros embebidos como generación nueva y confirma el diario."""
+    for shard, books_in_shard in list(pending_books.items()):
+        if not books_in_shard:
+            continue
+        writer = writers[shard]
+        generation = writer.commit()
+        catalog.record_generation(generation, writer.ntotal, writer.model_info.get('embedding_model'), shard=shard)
+        for filename, info in books_in_shard.items():
+            catalog.upsert_book(filename=filename, generation=generation, shard=shard, **info)
+        published_shards.add(shard)
+        confirmed = journal.checkpoint(generation, list(books_in_shard))
+        print(f"   💾 Checkpoint {shard}: {confirmed} libros publicados (generación {generation})")
+        # commit() libera el fragmento: el siguiente escritor (writer_for)
+        # parte de la generación recién publicada
+        del writers[shard]
+        del pending_books[shard]
+
+
 # Indexar
 indexed = 0
+skipped = 0
 errors = 0
-splitter = RecursiveCharacterTextSplitter(
+books_since_checkpoint = 0
+chunks_since_checkpoint = 0
+chunker = StreamingChunker(
     chunk_size=1500,
     chunk_overlap=200,
     separators=["\n\n", "\n", ". ", " "]
@@ -185,104 +218,135 @@ for i, path in enumerate(books, 1):
     filename = os.path.basename(path)
     print(f"[{i}/{len(books)}] {filename[:60]}")
     
-    # Extraer título/autor
-    name = os.path.splitext(filename)[0]
-    
-    if "Carta_Buffett" in filename:
-        year = filename.split("_")[-1].split(".")[0]
-        author = "Warren Buffett"
-        title = f"Carta a los Accionistas {year}"
-        topics = ['value investing', 'buffett', 'annual letters']
+    # Omitir archivos ya publicados sin cambios
+    try:
+        content_hash = journal.content_hash(filename, path)
+    except OSError as e:
+        print(f"   ❌ Error leyendo archivo: {e}")
+        errors += 1
+        continue
     
-    elif "Z-Library" in filename:
-        parts = name.replace(" (Z-Library)", "").split(" (")
-        title = parts[0].strip()
-        author = parts[1].strip("_)") if len(parts) > 1 else "Unknown"
-        topics = ['value investing', 'investment books']
+    if journal.is_current(filename, content_hash):
+        print(f"   ⏭️ Sin cambios, ya indexado")
+        skipped += 1
+        continue
     
-    elif any(x in filename.lower() for x in ['tsla', 'intc', 'pypl', '10-k', 'f-2024']):
-        ticker = filename.split("-")[0].upper()
-        author = f"{ticker} Inc."
-        title = f"10-K Filing {ticker}"
-        topics = ['sec filings', '10-k']
+    previous = journal.get(filename)
+    if previous and previous['status'] == 'done':
+        # El índice es append-only: la versión anterior queda hasta un --rebuild
+        print(f"   ⚠️ Contenido cambiado: se indexa la versión nueva (usa --rebuild para retirar la anterior)")
     
-    else:
-        author = "Unknown"
-        title = name
-        topics = ['general']
+    # Extraer título/autor/temas y fragmento
+    profile = classify_book(filename)
+    title, author, topics = profile.title, profile.author, profile.topics
+    writer = writer_for(profile.shard)
     
+    # Posición del escritor antes del libro: si falla a medias, se descarta lo añadido
+    savepoint = writer.savepoint()
+    duplicates_before = writer.duplicates
     try:
-        # Extraer texto
-        text = extract_text(path, filename)
-        
-        if not text or len(text) < 100:
-            print(f"   ⚠️ Texto insuficiente")
-            errors += 1
-            continue
-        
-        # Crear chunks
-        chunks = splitter.split_text(text)
-        
-        # Crear documentos
-        documents = []
-        for idx, chunk in enumerate(chunks):
-            doc = Document(
-                page_content=chunk,
-                metadata={
+        # Extraer, trocear y embeber en streaming (páginas → chunks → lotes)
+        chunks = chunker.chunks(iter_document_pages(path, filename))
+        num_chunks = 0
+        num_chars = 0
+        for batch in iter_chunk_batches(chunks, EMBED_BATCH_SIZE):
+            # Metadata por chunk
+            metadatas = [
+                {
                     'source': title,
                     'author': author,
                     'filename': filename,
-                    'chunk_index': idx,
-                    'topics': topics
+                    'chunk_index': chunk.index,
+                    'topics': topics,
+                    'page_start': chunk.page_start,
+                    'page_end': chunk.page_end
                 }
-            )
-            documents.append(doc)
+                for chunk in batch
+            ]
+            
+            # Añadir al índice
+            writer.add_texts([chunk.text for chunk in batch], metadatas)
+            num_chunks += len(batch)
+            num_chars += sum(len(chunk.text) for chunk in batch)
         
-        # Añadir a vectorstore
-        if vectorstore is None:
-            vectorstore = FAISS.from_documents(documents, embeddings)
-        else:
-            vectorstore.add_documents(documents)
+        if num_chars < 100:
+            print(f"   ⚠️ Texto insuficiente")
+            writer.rollback(savepoint)
+            journal.mark_failed(filename, path, content_hash, "texto insuficiente")
+            errors += 1
+            continue
         
-        # Guardar metadata
-        metadata_dict[filename] = {
+        # Se cataloga al publicarse en el próximo checkpoint
+        pending_books.setdefault(profile.shard, {})[filename] = {
             'title': title,
             'author': author,
-            'filename': filename,
-            'num_chunks': len(chunks),
+            'num_chunks': num_chunks,
+            'topics': topics,
             'indexed_at': datetime.now().isoformat(),
-            'topics': topics
+            'content_hash': content_hash,
+            'duplicate_chunks': writer.duplicates - duplicates_before
         }
         
-        print(f"   ✅ {len(chunks)} chunks")
+        journal.mark_embedded(filename, path, content_hash, num_chunks)
+        
+        duplicates = writer.duplicates - duplicates_before
+        print(f"   ✅ {num_chunks} chunks" + (f" ({duplicates} casi-duplicados sin re-embeber)" if duplicates else ""))
         indexed += 1
+        books_since_checkpoint += 1
+        chunks_since_checkpoint += num_chunks
         
     except Exception as e:
         print(f"   ❌ Error: {str(e)[:80]}")
+        writer.rollback(savepoint)
+        journal.mark_failed(filename, path, content_hash, str(e))
         errors += 1
+    
+    if books_since_checkpoint >= CHECKPOINT_EVERY_BOOKS or chunks_since_checkpoint >= CHECKPOINT_EVERY_CHUNKS:
+        checkpoint()
+        books_since_checkpoint = 0
+        chunks_since_checkpoint = 0
 
 print()
 print("="*70)
 print("💾 GUARDANDO DATOS...")
 print("="*70)
 
-# Guardar vectorstore
-if vectorstore:
-    vectorstore.save_local(VECTORSTORE_PATH)
-    print(f"✅ Vectorstore guardado en: {VECTORSTORE_PATH}")
+# Último checkpoint (la app detecta la generación nueva sin reiniciar)
+checkpoint()
+# Escritores sin libros publicables (solo fallos): se liberan sus fragmentos
+for writer in writers.values():
+    writer.close()
+writers.clear()
+if REBUILD:
+    # Lo reconstruido sin ningún libro publicado se vacía; en la reconstrucción
+    # completa también se retira el índice único anterior
+    rebuilt = [ONLY_SHARD] if ONLY_SHARD else store.shard_names() + [LEGACY_SHARD]
+    for shard in rebuilt:
+        if shard not in published_shards:
+            store.clear(shard)
+current = store.current()
+for shard, index in (current.shards if current is not None else []):
+    print(f"✅ Fragmento {shard} guardado (generación {index.name}, {index.ntotal} vectores)")
+print(f"✅ Catálogo actualizado en: {CATALOG_PATH}")
+journal.close()
 
-# Guardar metadata
-with open(METADATA_PATH, 'w', encoding='utf-8') as f:
-    json.dump(metadata_dict, f, indent=2, ensure_ascii=False)
-print(f"✅ Metadata guardada en: {METADATA_PATH}")
+# Sabiduría por tema de la generación final (la app la sirve sin embeddings)
+if indexed:
+    try:
+        from services.knowledge_library import KnowledgeLibrary
+        KnowledgeLibrary(LIBRARY_PATH, embeddings=embeddings).materialize_topic_wisdom()
+        print("✅ Sabiduría por tema precalculada")
+    except Exception as e:
+        print(f"⚠️ Sabiduría por tema no precalculada: {str(e)[:80]}")
 
 print()
 print("="*70)
 print("🎉 INDEXACIÓN COMPLETADA")
 print("="*70)
 print(f"✅ Indexados: {indexed}/{len(books)}")
+print(f"⏭️ Sin cambios: {skipped}")
 print(f"❌ Errores: {errors}")
-print(f"📊 Total en biblioteca: {len(metadata_dict)}")
+print(f"📊 Total en biblioteca: {catalog.count()}")
 print()
 print("💡 Los libros están listos para usar en la app")
 print("="*70)
@@ -0,0 +1,228 @@
+"""
+⏱️ BENCHMARK DE PARSEO DE FILINGS - BeautifulSoup vs lxml (una pasada)
+Compara el parseo anterior de SECAnalyzer (html.parser + get_text + regex
+sin compilar + segundo parseo para el texto limpio) con parse_filing_html
+sobre 10-Ks de tamaño real: tiempo y pico de memoria (RSS máximo), cada
+método en su propio proceso para que un pico no contamine al otro.
+
+Sin --file genera un 10-K sintético con la forma de un .htm de EDGAR con
+inline XBRL (índice, Items, cientos de tablas, cabecera ix oculta).
+
+Uso:
+    python scripts/benchmark_filing_parse.py [--file 10k.htm ...] [--size-mb 8] [--runs 3] [--json salida.json]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import resource
+import subprocess
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+METHODS = ['bs4', 'lxml']
+
+ITEMS = [
+    ('1', 'Business'), ('1A', 'Risk Factors'), ('1B', 'Unresolved Staff Comments'),
+    ('2', 'Properties'), ('3', 'Legal Proceedings'), ('5', 'Market for Registrant’s Common Equity'),
+    ('7', 'Management’s Discussion and Analysis of Financial Condition and Results of Operations'),
+    ('7A', 'Quantitative and Qualitative Disclosures About Market Risk'),
+    ('8', 'Financial Statements and Supplementary Data'), ('9A', 'Controls and Procedures'),
+]
+WORDS = (
+    "revenue operating margin customers supply chain regulatory competition cash flows "
+    "liquidity capital expenditures inventory demand pricing segment growth impairment "
+    "goodwill interest rate foreign currency litigation cybersecurity employees"
+).split()
+
+
+# ============================================================================
+# 10-K SINTÉTICO
+# ============================================================================
+
+def _paragraph(rng: random.Random) -> str:
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 140)))
+    return (f'<div style="margin-top:6pt;text-align:justify"><span style="font-family:Times New Roman;'
+            f'font-size:10pt">{words.capitalize()}.</span></div>')
+
+
+def _statement(rng: random.Random, number: int) -> str:
+    rows = []
+    for line in range(rng.randint(15, 35)):
+        cells = "".join(
+            f'<td style="padding:0 1pt"><span>$</span></td><td style="text-align:right">'
+            f'<ix:nonfraction name="us-gaap:Line{line}" contextref="c-{year}" unitref="usd" decimals="-6" scale="6">'
+            f'{rng.randint(100, 99999):,}</ix:nonfraction></td><td></td>'
+            for year in (2023, 2022, 2021)
+        )
+        rows.append(f'<tr><td style="padding-left:8pt"><span>Line item {number}-{line}</span></td>{cells}</tr>')
+    header = ('<tr><td></td><td colspan="9" style="text-align:center">Year Ended December 31,</td></tr>'
+              '<tr><td></td><td colspan="3">2023</td><td colspan="3">2022</td><td colspan="3">2021</td></tr>')
+    return (f'<div><span style="font-weight:700">CONSOLIDATED STATEMENTS OF OPERATIONS {number}</span></div>'
+            f'<div><span>(in millions, except per share data)</span></div>'
+            f'<table style="border-collapse:collapse;width:100%">{header}{"".join(rows)}</table>')
+
+
+def synthetic_10k(size_mb: float, seed: int = 0) -> str:
+    """HTML con la estructura de un 10-K inline XBRL de EDGAR, de unos size_mb MB."""
+    rng = random.Random(seed)
+    target = int(size_mb * 1_000_000)
+    toc = "".join(
+        f'<tr><td>Item {item}.</td><td><a href="#i{item}">{title}</a></td><td>{page}</td></tr>'
+        for page, (item, title) in enumerate(ITEMS, start=3)
+    )
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?><html xmlns:ix="http://www.xbrl.org/2013/inlineXBRL"><head>'
+        '<title>acme-20231231</title><style>.x{color:red}</style></head><body>',
+        '<div style="display:none"><ix:header><ix:hidden>' + 'x' * 200_000 + '</ix:hidden></ix:header></div>',
+        f'<div><span>TABLE OF CONTENTS</span></div><table>{toc}</table>',
+    ]
+    per_item = max(1, target // len(ITEMS))
+    statements = 0
+    for item, title in ITEMS:
+        parts.append(f'<div id="i{item}"><span style="font-weight:700">Item {item}. {title}</span></div>')
+        written = 0
+        while written < per_item:
+            if item in ('7', '8') and rng.random() < 0.25:
+                block = _statement(rng, statements)
+                statements += 1
+            else:
+                block = _paragraph(rng)
+            parts.append(block)
+            written += len(block)
+    parts.append('</body></html>')
+    return "".join(parts)
+
+
+# ============================================================================
+# MÉTODOS
+# ============================================================================
+
+SECTION_PATTERNS = {
+    'business_description': [r'ITEM\s+1\.?\s+BUSINESS', r'Item\s+1\.?\s+Business', r'PART\s+I.*?ITEM\s+1'],
+    'risk_factors': [r'ITEM\s+1A\.?\s+RISK\s+FACTORS', r'Item\s+1A\.?\s+Risk\s+Factors'],
+    'md_and_a': [r'ITEM\s+7\.?\s+MANAGEMENT', r'Item\s+7\.?\s+Management'],
+    'financial_statements': [r'ITEM\s+8\.?\s+FINANCIAL', r'Item\s+8\.?\s+Financial'],
+}
+
+
+def parse_bs4(html: str) -> dict:
+    """Parseo anterior de SECAnalyzer: _parse_sections + _extract_text_clean."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(['script', 'style']):
+        tag.decompose()
+    tables = [
+        [[cell.get_text(strip=True) for cell in row.find_all(['td', 'th'])] for row in table.find_all('tr')]
+        for table in soup.find_all('table')
+    ]
+    text = soup.get_text(separator='\n', strip=True)
+    indices = {}
+    for section, patterns in SECTION_PATTERNS.items():
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                indices[section] = match.start()
+                break
+
+    clean = BeautifulSoup(html, 'html.parser')
+    for tag in clean(['script', 'style', 'table']):
+        tag.decompose()
+    clean_text = re.sub(r'\s+', ' ', clean.get_text(separator=' ', strip=True))
+    return {'chars': len(text) + len(clean_text), 'tables': len(tables), 'sections': sorted(indices)}
+
+
+def parse_lxml(html: str) -> dict:
+    from services.filing_parser import parse_filing_html
+
+    parsed = parse_filing_html(html)
+    return {
+        'chars': len(parsed.text),
+        'tables': parsed.num_tables,
+        'financial_tables': len(parsed.tables),
+        'sections': sorted(parsed.sections),
+    }
+
+
+def _child(method: str, path: str, runs: int) -> dict:
+    """Mide un método en este proceso (lo lanza run_method en un subproceso)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    parse = parse_lxml if method == 'lxml' else parse_bs4
+    # Imports (parser, servicios) fuera de la medida
+    parse('<html><body><p>x</p></body></html>')
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    result = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = parse(html)
+        times.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'method': method,
+        'best_s': round(min(times), 3),
+        'mean_s': round(sum(times) / len(times), 3),
+        # ru_maxrss en KB (Linux): pico de memoria sobre la del HTML ya cargado
+        'peak_mb': round((peak - baseline) / 1024, 1),
+        **result,
+    }
+
+
+def run_method(method: str, path: str, runs: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', method, '--file', path, '--runs', str(runs)],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(paths, runs: int = 3) -> dict:
+    report = {'runs': runs, 'filings': []}
+    for path in paths:
+        entry = {'file': os.path.basename(path), 'size_mb': round(os.path.getsize(path) / 1e6, 2), 'methods': []}
+        for method in METHODS:
+            entry['methods'].append(run_method(method, path, runs))
+        report['filings'].append(entry)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de parseo de filings HTML")
+    parser.add_argument('--file', nargs='*', default=None, help='10-K/10-Q .htm reales (por defecto, uno sintético)')
+    parser.add_argument('--size-mb', type=float, default=8.0, help='Tamaño del 10-K sintético')
+    parser.add_argument('--runs', type=int, default=3, help='Repeticiones por método')
+    parser.add_argument('--json', default=None, help='Guardar informe JSON')
+    parser.add_argument('--child', choices=METHODS, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.file[0], args.runs)))
+        sys.exit(0)
+
+    paths = args.file
+    if not paths:
+        path = os.path.join(tempfile.gettempdir(), f"synthetic_10k_{args.size_mb:g}mb.htm")
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(synthetic_10k(args.size_mb))
+        paths = [path]
+
+    report = run_benchmark(paths, runs=args.runs)
+    print(f"{'Filing':<28}{'MB':>7}{'Método':>8}{'mejor s':>9}{'media s':>9}{'pico MB':>9}{'tablas':>8}  secciones")
+    for entry in report['filings']:
+        for m in entry['methods']:
+            print(f"{entry['file'][:27]:<28}{entry['size_mb']:>7}{m['method']:>8}{m['best_s']:>9}{m['mean_s']:>9}"
+                  f"{m['peak_mb']:>9}{m['tables']:>8}  {', '.join(m['sections'])}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Informe guardado en {args.json}")
@@ -0,0 +1,128 @@
+"""
+📐 BENCHMARK DE COMPRESIÓN - Dimensiones Matryoshka x Cuantización
+Mide, para cada perfil de almacenamiento (dimensiones truncadas y
+float32/float16/int8), memoria por vector, latencia de búsqueda y recall@k
+frente al índice completo en float32, sobre los vectores de la biblioteca.
+
+Consultas: las de benchmark_retrieval.py, las de secciones del Oráculo y
+los temas del comité, más una muestra de chunks indexados como consultas.
+
+Uso:
+    python scripts/benchmark_quantization.py [--k 10] [--dims 1024 512 256] [--json salida.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SECTION_QUERIES
+from services.knowledge_library import KnowledgeLibrary, TOPIC_QUERIES
+from services.vector_store import StorageProfile, QUANTIZATIONS, embed_texts, fit_dimensions
+from scripts.benchmark_retrieval import BENCHMARK_QUERIES, _percentile
+
+
+def _ground_truth(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    import faiss
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    return exact.search(queries, k)[1]
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run_benchmark(lib: KnowledgeLibrary, k: int = 10, dims=None, sample: int = 200, seed: int = 0) -> dict:
+    """Evalúa todos los perfiles y devuelve el informe."""
+    index = lib.store.current()
+    if index is None:
+        raise RuntimeError("La biblioteca no tiene índice. Indexa libros primero.")
+
+    # Referencia: vectores de todos los fragmentos (exactos si son float32 completos)
+    vectors = np.ascontiguousarray(np.vstack([
+        fit_dimensions(shard.index.reconstruct_n(0, shard.ntotal), index.dimension)
+        for _, shard in index.shards
+    ]), dtype=np.float32)
+    full_dim = vectors.shape[1]
+
+    texts = [q for q, _ in BENCHMARK_QUERIES] + list(SECTION_QUERIES.values()) + list(TOPIC_QUERIES.values())
+    queries = fit_dimensions(embed_texts(lib.embeddings, texts), full_dim)
+    rng = np.random.RandomState(seed)
+    if sample and index.ntotal:
+        picks = rng.choice(index.ntotal, size=min(sample, index.ntotal), replace=False)
+        queries = np.vstack([queries, vectors[picks]])
+    k = min(k, index.ntotal)
+    truth = _ground_truth(vectors, queries, k)
+
+    dims = sorted({d for d in (dims or [1024, 512, 256]) if d < full_dim} | {full_dim}, reverse=True)
+    report = {
+        'generation': index.name,
+        'reference_profile': {'dimension': full_dim, 'quantization': index.profile.quantization},
+        'vectors': index.ntotal,
+        'queries': len(queries),
+        'k': k,
+        'profiles': [],
+    }
+
+    for dim in dims:
+        fitted = fit_dimensions(vectors, dim)
+        fitted_queries = fit_dimensions(queries, dim)
+        for quantization in QUANTIZATIONS:
+            profile = StorageProfile(dimensions=dim if dim < full_dim else None, quantization=quantization)
+            built = profile.build_index(dim, training=fitted if profile.needs_training else None)
+            built.add(fitted)
+
+            latencies = []
+            found = []
+            for query in fitted_queries:
+                start = time.perf_counter()
+                _, ids = built.search(query.reshape(1, -1), k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(ids[0])
+
+            bytes_per_vector = built.sa_code_size()
+            report['profiles'].append({
+                'dimension': dim,
+                'quantization': quantization,
+                'bytes_per_vector': bytes_per_vector,
+                'index_mb': round(bytes_per_vector * index.ntotal / 1e6, 2),
+                'compression': round(full_dim * 4 / bytes_per_vector, 1),
+                'p50_ms': round(_percentile(latencies, 50), 3),
+                'p95_ms': round(_percentile(latencies, 95), 3),
+                f'recall@{k}': round(_recall(np.array(found), truth), 4),
+            })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de dimensiones y cuantización")
+    parser.add_argument('--k', type=int, default=10, help='Resultados por consulta')
+    parser.add_argument('--dims', type=int, nargs='*', default=None, help='Dimensiones truncadas a evaluar')
+    parser.add_argument('--sample', type=int, default=200, help='Chunks usados como consultas adicionales')
+    parser.add_argument('--library', default=None, help='Ruta de la biblioteca')
+    parser.add_argument('--json', default=None, help='Guardar informe JSON')
+    args = parser.parse_args()
+
+    report = run_benchmark(KnowledgeLibrary(args.library), k=args.k, dims=args.dims, sample=args.sample)
+    k = report['k']
+
+    print(f"📚 Generación {report['generation']} ({report['vectors']} vectores, "
+          f"{report['queries']} consultas), k={k}\n")
+    print(f"{'Dims':>6}{'Cuant.':>9}{'B/vec':>8}{'MB':>9}{'x':>6}{'p50 ms':>9}{'p95 ms':>9}{'recall':>9}")
+    for p in report['profiles']:
+        print(f"{p['dimension']:>6}{p['quantization']:>9}{p['bytes_per_vector']:>8}{p['index_mb']:>9}"
+              f"{p['compression']:>6}{p['p50_ms']:>9}{p['p95_ms']:>9}{p[f'recall@{k}']:>9}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Informe guardado en {args.json}")
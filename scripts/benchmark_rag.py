@@ -0,0 +1,410 @@
+"""
+🧪 BENCHMARK DEL STACK RAG - Corpus fijo, consultas etiquetadas, embeddings locales
+Indexa un corpus local fijo (scripts/benchmark_corpus) con el pipeline real
+de la biblioteca (troceado, deduplicación, fragmentos, búsqueda híbrida,
+filtros y MMR) y mide, para cada configuración:
+
+- Ingesta: chunks/s y MB/s (extracción + embeddings + publicación)
+- Tamaño del índice en disco (FAISS + docstores)
+- Latencia de consulta p50/p95 (con embedding, sin caché) y de un lote
+- Calidad: recall@k, hit@k y MRR sobre consultas etiquetadas: las
+  SECTION_QUERIES del Oráculo, los temas del comité (TOPIC_QUERIES),
+  consultas exactas/paráfrasis y consultas con filtros de autor/tema
+
+El informe JSON incluye commit, backend y hash del corpus, y --compare
+muestra las diferencias frente a un informe anterior (p.ej. de otro commit).
+
+Uso:
+    python scripts/benchmark_rag.py [--backend hashing] [--chunking 1500:200 2000:300]
+                                    [--quantization float32 int8] [--dims 0 256]
+                                    [--k 5] [--runs 3] [--json salida.json] [--compare base.json]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODELS, SECTION_QUERIES
+from services.embeddings import get_embedding_provider
+from services import knowledge_library, oracle
+from services.knowledge_library import KnowledgeLibrary, LibraryQuery, TOPIC_QUERIES
+from scripts.benchmark_retrieval import _percentile
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_corpus')
+
+# Troceados de producción: biblioteca y Oráculo
+DEFAULT_CHUNKING = [
+    (knowledge_library.CHUNK_SIZE, knowledge_library.CHUNK_OVERLAP),
+    (oracle.CHUNK_SIZE, oracle.CHUNK_OVERLAP),
+]
+
+# Métricas en las que más es mejor (para --compare)
+HIGHER_IS_BETTER = {'recall', 'mrr', 'hit', 'chunks_per_s', 'mb_per_s'}
+
+
+# ============================================================================
+# CORPUS Y CONSULTAS
+# ============================================================================
+
+def load_corpus(corpus_dir: str = CORPUS_DIR) -> dict:
+    """Manifiesto del corpus con las consultas resueltas a texto."""
+    with open(os.path.join(corpus_dir, 'corpus.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    digest = hashlib.sha256()
+    for doc in manifest['documents']:
+        with open(os.path.join(corpus_dir, doc['file']), 'rb') as f:
+            digest.update(f.read())
+    digest.update(json.dumps(manifest['queries'], sort_keys=True).encode('utf-8'))
+
+    queries = []
+    for item in manifest['queries']:
+        if 'section' in item:
+            text, group, label = SECTION_QUERIES[item['section']], 'section', f"section:{item['section']}"
+        elif 'topic' in item:
+            text, group, label = TOPIC_QUERIES[item['topic']], 'topic', f"topic:{item['topic']}"
+        else:
+            text, label = item['query'], item['query']
+            group = 'filtered' if ('filter_author' in item or 'filter_topics' in item) else 'general'
+        queries.append({
+            'label': label,
+            'group': group,
+            'request': LibraryQuery(
+                text,
+                filter_author=item.get('filter_author'),
+                filter_topics=item.get('filter_topics'),
+            ),
+            'expected': [term.lower() for term in item['expected']],
+        })
+
+    return {
+        'dir': corpus_dir,
+        'documents': manifest['documents'],
+        'queries': queries,
+        'sha256': digest.hexdigest()[:16],
+    }
+
+
+class _CorpusFile:
+    """Archivo del corpus con la interfaz de un archivo subido (name + read)."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self.name = os.path.basename(path)
+
+    def read(self) -> bytes:
+        with open(self._path, 'rb') as f:
+            return f.read()
+
+
+def _relevant_texts(index, query: dict) -> set:
+    """Chunks indexados que contienen algún término esperado y pasan los filtros."""
+    request = query['request']
+    relevant = set()
+    for position, (_, shard) in enumerate(index.shards):
+        ids = [index.global_id(position, i) for i in range(shard.ntotal)]
+        texts = index.docstore.get_texts(ids)
+        metadata = index.docstore.get_metadata(ids)
+        sources = index.docstore.get_sources(ids)
+        for vector_id in ids:
+            text = texts.get(vector_id, '')
+            if not any(term in text.lower() for term in query['expected']):
+                continue
+            origins = [metadata.get(vector_id, {})] + sources.get(vector_id, [])
+            if request.filter_author and not any(o.get('author') == request.filter_author for o in origins):
+                continue
+            if request.filter_topics:
+                topics = {t for o in origins for t in (o.get('topics') or [])}
+                if not topics & set(request.filter_topics):
+                    continue
+            relevant.add(text)
+    return relevant
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+@contextmanager
+def _storage_profile(quantization: str, dims: int):
+    """Perfil de almacenamiento de los índices nuevos (config global) durante el bloque."""
+    previous = (MODELS.vector_quantization, MODELS.embedding_dimensions)
+    MODELS.vector_quantization, MODELS.embedding_dimensions = quantization, dims
+    try:
+        yield
+    finally:
+        MODELS.vector_quantization, MODELS.embedding_dimensions = previous
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return 'unknown'
+
+
+def run_config(corpus: dict, embeddings, chunk_size: int, chunk_overlap: int,
+               quantization: str, dims: int, k: int, runs: int) -> dict:
+    """Indexa el corpus en una biblioteca temporal con una configuración y la evalúa."""
+    workdir = tempfile.mkdtemp(prefix='rag-bench-')
+    try:
+        with _storage_profile(quantization, dims):
+            lib = KnowledgeLibrary(
+                os.path.join(workdir, 'library'), embeddings=embeddings,
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            )
+
+            # Ingesta (pipeline real: add_book publica generación y sabiduría por tema)
+            chars = 0
+            chunks = 0
+            start = time.perf_counter()
+            for doc in corpus['documents']:
+                path = os.path.join(corpus['dir'], doc['file'])
+                chars += os.path.getsize(path)
+                n, message = lib.add_book(_CorpusFile(path), doc['title'], doc['author'], doc['topics'])
+                if n == 0:
+                    raise RuntimeError(f"Ingesta fallida de {doc['file']}: {message}")
+                chunks += n
+            ingest_s = time.perf_counter() - start
+
+        index = lib.store.current()
+        requests = [q['request'] for q in corpus['queries']]
+        for request in requests:
+            request.k = k
+
+        # Latencia por consulta (embedding + búsqueda + texto), sin caché
+        latencies = []
+        results = None
+        for _ in range(runs):
+            results = []
+            for request in requests:
+                lib.query_cache.invalidate()
+                start = time.perf_counter()
+                results.append(lib.search_batch([request])[0])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        # Todas las consultas en una sola búsqueda por lotes
+        batch_ms = []
+        for _ in range(runs):
+            lib.query_cache.invalidate()
+            start = time.perf_counter()
+            lib.search_batch(requests)
+            batch_ms.append((time.perf_counter() - start) * 1000)
+
+        # Calidad
+        per_query = []
+        for query, found in zip(corpus['queries'], results):
+            relevant = _relevant_texts(index, query)
+            texts = [r.content for r in found]
+            rank = next((i for i, text in enumerate(texts, start=1) if text in relevant), None)
+            per_query.append({
+                'label': query['label'],
+                'group': query['group'],
+                'relevant': len(relevant),
+                'first_relevant_rank': rank,
+                'recall': len(set(texts) & relevant) / min(k, len(relevant)) if relevant else None,
+            })
+
+        return {
+            'chunk_size': chunk_size,
+            'chunk_overlap': chunk_overlap,
+            'quantization': quantization,
+            'dims': dims or None,
+            'ingest': {
+                'chunks': chunks,
+                'vectors': index.ntotal,
+                'seconds': round(ingest_s, 3),
+                'chunks_per_s': round(chunks / ingest_s, 1) if ingest_s else None,
+                'mb_per_s': round(chars / 1e6 / ingest_s, 3) if ingest_s else None,
+            },
+            'index_bytes': _dir_size(lib.shards_path),
+            'latency': {
+                'p50_ms': round(_percentile(latencies, 50), 2),
+                'p95_ms': round(_percentile(latencies, 95), 2),
+                'batch_ms': round(_percentile(batch_ms, 50), 2),
+            },
+            'quality': _quality(per_query, k),
+            'queries': per_query,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _quality(per_query: list, k: int) -> dict:
+    """recall@k, hit@k y MRR globales y por grupo (solo consultas con relevantes)."""
+    def summarize(rows):
+        rows = [r for r in rows if r['relevant']]
+        if not rows:
+            return {}
+        return {
+            f'recall@{k}': round(sum(r['recall'] for r in rows) / len(rows), 3),
+            f'hit@{k}': round(sum(1 for r in rows if r['first_relevant_rank']) / len(rows), 3),
+            'mrr': round(sum(1 / r['first_relevant_rank'] for r in rows if r['first_relevant_rank']) / len(rows), 3),
+            'queries': len(rows),
+        }
+
+    groups = sorted({r['group'] for r in per_query})
+    return {
+        'all': summarize(per_query),
+        **{group: summarize([r for r in per_query if r['group'] == group]) for group in groups},
+        'unlabeled': [r['label'] for r in per_query if not r['relevant']],
+    }
+
+
+def run_benchmark(backend: str = 'hashing', chunking=None, quantizations=None, dims=None,
+                  k: int = 5, runs: int = 3, corpus_dir: str = CORPUS_DIR) -> dict:
+    """Ejecuta todas las configuraciones (producto cartesiano) y devuelve el informe."""
+    corpus = load_corpus(corpus_dir)
+    embeddings = get_embedding_provider(backend=backend)
+
+    report = {
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'embeddings': embeddings.name,
+        'dimension': embeddings.dimension,
+        'corpus': {
+            'sha256': corpus['sha256'],
+            'documents': len(corpus['documents']),
+            'queries': len(corpus['queries']),
+        },
+        'k': k,
+        'runs': runs,
+        'configs': [],
+    }
+    for (size, overlap), quantization, dim in itertools.product(
+        chunking or DEFAULT_CHUNKING, quantizations or ['float32'], dims or [0]
+    ):
+        report['configs'].append(
+            run_config(corpus, embeddings, size, overlap, quantization, dim, k, runs)
+        )
+    return report
+
+
+# ============================================================================
+# INFORME
+# ============================================================================
+
+def _config_key(config: dict) -> str:
+    return f"{config['chunk_size']}/{config['chunk_overlap']} {config['quantization']} {config['dims'] or 'full'}"
+
+
+def _flat_metrics(config: dict, k: int) -> dict:
+    quality = config['quality']['all']
+    return {
+        'chunks_per_s': config['ingest']['chunks_per_s'],
+        'mb_per_s': config['ingest']['mb_per_s'],
+        'index_kb': round(config['index_bytes'] / 1024, 1),
+        'p50_ms': config['latency']['p50_ms'],
+        'p95_ms': config['latency']['p95_ms'],
+        f'recall@{k}': quality.get(f'recall@{k}'),
+        'mrr': quality.get('mrr'),
+    }
+
+
+def compare_reports(current: dict, baseline: dict) -> list:
+    """Diferencias por configuración común: (config, métrica, base, actual, delta, mejora)."""
+    k = current['k']
+    base_configs = {_config_key(c): c for c in baseline.get('configs', [])}
+    rows = []
+    for config in current['configs']:
+        key = _config_key(config)
+        if key not in base_configs or baseline.get('k') != k:
+            continue
+        now, before = _flat_metrics(config, k), _flat_metrics(base_configs[key], k)
+        for metric, value in now.items():
+            old = before.get(metric)
+            if value is None or old is None:
+                continue
+            delta = value - old
+            better = any(m in metric for m in HIGHER_IS_BETTER) == (delta > 0) if delta else None
+            rows.append((key, metric, old, value, round(delta, 3), better))
+    return rows
+
+
+def print_report(report: dict) -> None:
+    k = report['k']
+    print(f"🧪 Commit {report['commit']} · {report['embeddings']} ({report['dimension']} dims) · "
+          f"corpus {report['corpus']['sha256']} ({report['corpus']['queries']} consultas), k={k}\n")
+    header = f"{'Config':<26}{'chunks/s':>10}{'MB/s':>8}{'KB':>9}{'p50 ms':>9}{'p95 ms':>9}{'lote ms':>9}{'recall':>8}{'MRR':>7}"
+    print(header)
+    for config in report['configs']:
+        m = _flat_metrics(config, k)
+        print(f"{_config_key(config):<26}{m['chunks_per_s']:>10}{m['mb_per_s']:>8}{m['index_kb']:>9}"
+              f"{m['p50_ms']:>9}{m['p95_ms']:>9}{config['latency']['batch_ms']:>9}"
+              f"{m[f'recall@{k}']:>8}{m['mrr']:>7}")
+        groups = {g: q for g, q in config['quality'].items() if g not in ('all', 'unlabeled') and q}
+        print("    " + " · ".join(f"{g}: recall {q[f'recall@{k}']} MRR {q['mrr']}" for g, q in groups.items()))
+        if config['quality']['unlabeled']:
+            print(f"    ⚠️ Sin chunks relevantes: {', '.join(config['quality']['unlabeled'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del stack RAG sobre un corpus fijo")
+    parser.add_argument('--backend', default='hashing', help="Backend de embeddings ('hashing' o 'local': sin red)")
+    parser.add_argument('--chunking', nargs='*', default=None,
+                        help='Troceados tamaño:solapamiento (por defecto, biblioteca y Oráculo)')
+    parser.add_argument('--quantization', nargs='*', default=None, help='float32 / float16 / int8')
+    parser.add_argument('--dims', type=int, nargs='*', default=None, help='Dimensiones Matryoshka (0 = completas)')
+    parser.add_argument('--k', type=int, default=5, help='Resultados por consulta')
+    parser.add_argument('--runs', type=int, default=3, help='Repeticiones por consulta')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='Directorio del corpus (con corpus.json)')
+    parser.add_argument('--json', default=None, help='Guardar informe JSON')
+    parser.add_argument('--compare', default=None, help='Informe JSON anterior con el que comparar')
+    args = parser.parse_args()
+    # Los logs de ingesta/búsqueda alterarían las latencias y taparían el informe
+    logging.disable(logging.INFO)
+
+    chunking = None
+    if args.chunking:
+        chunking = [tuple(int(v) for v in spec.split(':')) for spec in args.chunking]
+
+    report = run_benchmark(
+        backend=args.backend, chunking=chunking, quantizations=args.quantization,
+        dims=args.dims, k=args.k, runs=args.runs, corpus_dir=args.corpus
+    )
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus', {}).get('sha256') != report['corpus']['sha256']:
+            print("\n⚠️ El informe base usa otro corpus o consultas: las métricas de calidad no son comparables")
+        print(f"\n📊 Comparación con {baseline.get('commit', '?')}:")
+        for key, metric, old, new, delta, better in compare_reports(report, baseline):
+            mark = '' if better is None else ('✅' if better else '❌')
+            print(f"  {key:<26}{metric:<12}{old:>10} → {new:<10} ({delta:+}) {mark}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Informe guardado en {args.json}")
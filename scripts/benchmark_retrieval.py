@@ -0,0 +1,123 @@
+"""
+⏱️ BENCHMARK DE RECUPERACIÓN - Vectorial vs BM25 vs Híbrida
+Mide latencia (p50/p95) y calidad (hit@k, MRR) sobre un conjunto fijo de
+consultas etiquetadas contra la biblioteca indexada.
+
+Uso:
+    python scripts/benchmark_retrieval.py [--k 5] [--runs 3] [--json salida.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.knowledge_library import KnowledgeLibrary
+from services.hybrid_search import hybrid_search, HybridWeights, weights_for_query
+from services.vector_store import embed_query
+
+# Consulta -> términos de los que al menos uno debe aparecer en un chunk relevante
+BENCHMARK_QUERIES = [
+    ("goodwill impairment", ["goodwill"]),
+    ("Item 1A Risk Factors", ["risk factor"]),
+    ("margin of safety", ["margin of safety", "margen de seguridad"]),
+    ("Mr. Market", ["mr. market", "señor mercado"]),
+    ("análisis de deuda apalancamiento", ["deuda", "debt", "leverage", "apalancamiento"]),
+    ("economic moat competitive advantage", ["moat", "foso", "ventaja competitiva"]),
+    ("capital allocation share buybacks", ["capital allocation", "buyback", "repurchase", "recompra"]),
+    ("intrinsic value", ["intrinsic value", "valor intrínseco"]),
+    ("float insurance underwriting profit", ["float"]),
+    ("Berkshire 1987", ["1987"]),
+    ("¿cómo protegerse de las pérdidas permanentes de capital?", ["pérdida", "perder", "lose money", "loss"]),
+    ("diversification protection against ignorance", ["diversific"]),
+]
+
+MODES = {
+    'vector': lambda q: HybridWeights(vector=1.0, lexical=0.0),
+    'lexical': lambda q: HybridWeights(vector=0.0, lexical=1.0),
+    'hybrid': weights_for_query,
+}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _first_relevant_rank(texts, expected):
+    for rank, text in enumerate(texts, start=1):
+        lower = (text or "").lower()
+        if any(term in lower for term in expected):
+            return rank
+    return None
+
+
+def run_benchmark(lib: KnowledgeLibrary, k: int = 5, runs: int = 3) -> dict:
+    """Ejecuta las consultas en los tres modos y devuelve el informe."""
+    index = lib.store.current()
+    if index is None:
+        raise RuntimeError("La biblioteca no tiene índice. Indexa libros primero.")
+
+    # Los embeddings de consulta se calculan una vez: se mide la recuperación, no la API
+    query_vectors = {q: embed_query(lib.embeddings, q) for q, _ in BENCHMARK_QUERIES}
+
+    report = {'k': k, 'runs': runs, 'generation': index.name, 'vectors': index.ntotal, 'modes': {}}
+    for mode, weights_fn in MODES.items():
+        latencies = []
+        hits = 0
+        reciprocal_ranks = []
+        per_query = []
+
+        for query, expected in BENCHMARK_QUERIES:
+            weights = weights_fn(query)
+            results = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                results = hybrid_search(
+                    index, lib.embeddings, query, k=k,
+                    weights=weights, query_vector=query_vectors[query]
+                )[:k]
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            index.fill_texts(results)
+            rank = _first_relevant_rank([r.content for r in results], expected)
+            hits += 1 if rank else 0
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+            per_query.append({'query': query, 'first_relevant_rank': rank})
+
+        report['modes'][mode] = {
+            'p50_ms': round(_percentile(latencies, 50), 2),
+            'p95_ms': round(_percentile(latencies, 95), 2),
+            f'hit@{k}': round(hits / len(BENCHMARK_QUERIES), 3),
+            'mrr': round(sum(reciprocal_ranks) / len(reciprocal_ranks), 3),
+            'queries': per_query,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de recuperación de la biblioteca")
+    parser.add_argument('--k', type=int, default=5, help='Resultados por consulta')
+    parser.add_argument('--runs', type=int, default=3, help='Repeticiones por consulta')
+    parser.add_argument('--library', default=None, help='Ruta de la biblioteca')
+    parser.add_argument('--json', default=None, help='Guardar informe JSON')
+    args = parser.parse_args()
+
+    report = run_benchmark(KnowledgeLibrary(args.library), k=args.k, runs=args.runs)
+
+    print(f"📚 Generación {report['generation']} ({report['vectors']} vectores), k={args.k}\n")
+    print(f"{'Modo':<10}{'p50 ms':>10}{'p95 ms':>10}{'hit@k':>10}{'MRR':>10}")
+    for mode, stats in report['modes'].items():
+        print(f"{mode:<10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats[f'hit@{args.k}']:>10}{stats['mrr']:>10}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Informe guardado en {args.json}")
@@ -0,0 +1,167 @@
+"""
+⏱️ BENCHMARK DEL ALMACÉN XBRL (companyfacts)
+Carga companyfacts sintéticos (o el companyfacts.zip / JSONs reales de
+EDGAR con --path) en un XbrlFactStore temporal y mide:
+
+- Carga: hechos por segundo y tamaño de la base
+- Consulta típica del comparador: una métrica de 50 tickers en 15 años
+- Corte transversal del screener: una métrica de todos los emisores en un año
+
+Los emisores sintéticos tienen la forma de los reales: cada hecho se
+repite en los tres 10-K que lo comparan (con reexpresiones), trimestres
+de 10-Q y cambio de concepto de ingresos tras ASC 606 (2018).
+
+Uso:
+    python scripts/benchmark_xbrl_facts.py [--companies 200] [--concepts 250] [--path companyfacts.zip] [--runs 20]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.xbrl_facts import XbrlFactStore  # noqa: E402
+
+FIRST_YEAR = 2009
+LAST_YEAR = 2024
+
+
+# ============================================================================
+# COMPANYFACTS SINTÉTICOS
+# ============================================================================
+
+def _fact(start, end, value, form, fy, fp, filed, frame=None):
+    fact = {'end': end, 'val': value, 'accn': f"0000000000-{fy % 100:02d}-{random.randint(0, 999999):06d}",
+            'fy': fy, 'fp': fp, 'form': form, 'filed': filed}
+    if start:
+        fact['start'] = start
+    if frame:
+        fact['frame'] = frame
+    return fact
+
+
+def _duration_facts(rng: random.Random, base: float) -> list:
+    """Ejercicios (en los tres 10-K que los comparan) y trimestres (10-Q)."""
+    facts = []
+    for year in range(FIRST_YEAR, LAST_YEAR + 1):
+        value = base * (1.07 ** (year - FIRST_YEAR))
+        for lag in range(3):
+            report = year + lag
+            if report > LAST_YEAR:
+                break
+            # Reexpresión ocasional en los comparativos posteriores
+            restated = value * (1 + (0.01 if lag and rng.random() < 0.1 else 0))
+            facts.append(_fact(f"{year - 1}-10-01", f"{year}-09-30", round(restated), '10-K', report, 'FY',
+                               f"{report}-11-0{lag + 1}", f"CY{year}" if lag == 0 else None))
+        for quarter, (start, end) in enumerate([("10-01", "12-31"), ("01-01", "03-31"), ("04-01", "06-30")], start=1):
+            start_year = year - 1 if quarter == 1 else year
+            facts.append(_fact(f"{start_year}-{start}", f"{start_year}-{end}", round(value / 4), '10-Q', year,
+                               f"Q{quarter}", f"{start_year}-{end[:2]}-28"))
+    return facts
+
+
+def _instant_facts(base: float) -> list:
+    facts = []
+    for year in range(FIRST_YEAR, LAST_YEAR + 1):
+        for lag in range(2):
+            report = year + lag
+            if report <= LAST_YEAR:
+                facts.append(_fact(None, f"{year}-09-30", round(base * (1.05 ** (year - FIRST_YEAR))), '10-K',
+                                   report, 'FY', f"{report}-11-01"))
+    return facts
+
+
+def synthetic_company(number: int, concepts: int, seed: int = 0) -> dict:
+    rng = random.Random(seed * 100_003 + number)
+    random.seed(seed * 100_003 + number)
+    revenue = rng.uniform(1e8, 4e11)
+    old, new = [], []
+    for fact in _duration_facts(rng, revenue):
+        (old if fact['end'] < "2018-06-30" else new).append(fact)
+    us_gaap = {
+        'SalesRevenueNet': {'label': 'Sales Revenue, Net', 'units': {'USD': old}},
+        'RevenueFromContractWithCustomerExcludingAssessedTax': {'label': 'Revenue', 'units': {'USD': new}},
+        'NetIncomeLoss': {'label': 'Net Income (Loss)', 'units': {'USD': _duration_facts(rng, revenue * 0.12)}},
+        'Assets': {'label': 'Assets', 'units': {'USD': _instant_facts(revenue * 1.5)}},
+    }
+    for extra in range(max(0, concepts - len(us_gaap))):
+        if extra % 3 == 0:
+            facts = _instant_facts(rng.uniform(1e6, 1e10))
+        else:
+            facts = _duration_facts(rng, rng.uniform(1e6, 1e10))
+        us_gaap[f"SyntheticConcept{extra}"] = {'label': f"Concept {extra}", 'units': {'USD': facts}}
+    return {'cik': 1_000_000 + number, 'entityName': f"Company {number} Inc.", 'facts': {'us-gaap': us_gaap}}
+
+
+# ============================================================================
+# MEDIDAS
+# ============================================================================
+
+def _timed(fn, runs: int):
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(times), max(times)
+
+
+def run_benchmark(companies: int, concepts: int, runs: int, path: str = None) -> dict:
+    folder = tempfile.mkdtemp(prefix='xbrl_bench_')
+    store = XbrlFactStore(os.path.join(folder, 'companyfacts.sqlite'))
+
+    start = time.perf_counter()
+    if path:
+        loaded = store.ingest_path(path)
+        tickers = store.companies()['cik'].astype(str).tolist()
+        # Sin tabla de tickers: el CIK hace de ticker
+        conn = store._connect()
+        with conn:
+            conn.execute("UPDATE companies SET ticker = CAST(cik AS TEXT) WHERE ticker IS NULL")
+    else:
+        loaded = 0
+        for number in range(companies):
+            store.ingest(synthetic_company(number, concepts), ticker=f"T{number:04d}")
+            loaded += 1
+        tickers = [f"T{number:04d}" for number in range(companies)]
+    ingest_s = time.perf_counter() - start
+    facts = store._connect().execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+    sample = tickers[:50]
+    frame, series_ms, series_max = _timed(lambda: store.frame(sample, 'revenue', years=15, end_year=LAST_YEAR), runs)
+    cross, cross_ms, cross_max = _timed(lambda: store.cross_section('revenue', LAST_YEAR - 1), runs)
+
+    return {
+        'companies': loaded,
+        'facts': facts,
+        'ingest_s': round(ingest_s, 1),
+        'facts_per_s': round(facts / ingest_s),
+        'db_mb': round(os.path.getsize(store.path) / 1e6, 1),
+        'revenue_50x15_ms': round(series_ms, 2),
+        'revenue_50x15_max_ms': round(series_max, 2),
+        'revenue_50x15_shape': list(frame.shape),
+        'cross_section_ms': round(cross_ms, 2),
+        'cross_section_max_ms': round(cross_max, 2),
+        'cross_section_n': len(cross),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del almacén XBRL companyfacts")
+    parser.add_argument('--companies', type=int, default=200, help='Emisores sintéticos')
+    parser.add_argument('--concepts', type=int, default=250, help='Conceptos por emisor sintético')
+    parser.add_argument('--path', default=None, help='companyfacts.zip, JSON o directorio reales')
+    parser.add_argument('--runs', type=int, default=20, help='Repeticiones por consulta')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.companies, args.concepts, args.runs, args.path)
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        print(f"{key:<{width}}  {value}")
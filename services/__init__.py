@@ -27,6 +27,7 @@ from .knowledge_library import (
 )
 from .report_renderer import HTMLReportRenderer
 from .sec_analyzer import SECAnalyzer, SECFiling, format_filing_date, get_filing_icon
+from .xbrl_facts import XbrlFactStore, METRICS as XBRL_METRICS
 from .screener_service import ScreenerService
 from .macro_service import MacroService, MacroDashboard
 
@@ -62,6 +63,8 @@ __all__ = [
     'SECFiling',
     'format_filing_date',
     'get_filing_icon',
+    'XbrlFactStore',
+    'XBRL_METRICS',
     
     # Screener (Discovery)
     'ScreenerService',
@@ -0,0 +1,346 @@
+"""
+✂️ EXTRACCIÓN Y CHUNKING EN STREAMING
+Pipeline de generadores: página → chunk → embedding.
+
+Características:
+- Extracción página a página (PDF, EPUB, TXT, HTML, MOBI): nunca se
+  construye el texto completo del libro en memoria
+- Chunking incremental con solapamiento que cruza fronteras de página
+- Cada chunk registra las páginas que abarca (page_start/page_end)
+- Memoria pico acotada a unas pocas páginas + un chunk
+"""
+
+import os
+import zlib
+import logging
+from typing import Iterator, Iterable, List, Optional
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", " "]
+
+# Tamaño de "página" para formatos sin paginación (TXT)
+TEXT_PAGE_CHARS = 4000
+
+
+@dataclass
+class PageText:
+    """Texto de una página (o sección, en formatos sin páginas)."""
+    page_number: int
+    text: str
+
+
+@dataclass
+class Chunk:
+    """Fragmento listo para embeddings."""
+    text: str
+    index: int
+    page_start: int
+    page_end: int
+    # Sección del documento (p.ej. Item de un 10-K) y posición del chunk en ella
+    section: Optional[str] = None
+    section_position: int = 0
+
+
+# ============================================================================
+# EXTRACCIÓN POR PÁGINAS
+# ============================================================================
+
+def iter_pdf_pages(file_path: str) -> Iterator[PageText]:
+    """Páginas de un PDF, liberando la caché de pdfplumber tras cada una."""
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        for number, page in enumerate(pdf.pages, start=1):
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                logger.warning(f"Página {number} ilegible: {e}")
+                text = ""
+            finally:
+                # pdfplumber retiene los objetos parseados de cada página
+                if hasattr(page, 'close'):
+                    page.close()
+                else:
+                    page.flush_cache()
+            if text:
+                yield PageText(number, text)
+
+
+def iter_txt_pages(file_path: str) -> Iterator[PageText]:
+    """Texto plano en bloques de ~TEXT_PAGE_CHARS (cortando en saltos de línea)."""
+    for encoding in ('utf-8', 'latin-1'):
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                number = 0
+                block: List[str] = []
+                size = 0
+                for line in f:
+                    block.append(line)
+                    size += len(line)
+                    if size >= TEXT_PAGE_CHARS:
+                        number += 1
+                        yield PageText(number, ''.join(block))
+                        block, size = [], 0
+                if block:
+                    yield PageText(number + 1, ''.join(block))
+            return
+        except UnicodeDecodeError:
+            logger.info(f"{file_path} no es {encoding}, reintentando")
+            continue
+        except Exception as e:
+            logger.error(f"Error leyendo txt: {e}")
+            return
+
+
+def read_html_text(file_path: str) -> str:
+    """Extrae texto de HTML con soporte para múltiples encodings."""
+    from bs4 import BeautifulSoup
+
+    # Probar múltiples encodings (las Cartas de Buffett suelen ser cp1252/latin-1)
+    content = None
+    for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                content = f.read()
+            break
+        except (UnicodeDecodeError, LookupError):
+            continue
+
+    # Último recurso: leer como bytes e ignorar errores
+    if content is None:
+        try:
+            with open(file_path, 'rb') as f:
+                content = f.read().decode('utf-8', errors='ignore')
+        except Exception as e:
+            logger.error(f"Error leyendo HTML (todos los encodings fallaron): {e}")
+            return ""
+
+    try:
+        soup = BeautifulSoup(content, 'html.parser')
+        for tag in soup(['script', 'style', 'nav', 'footer', 'header']):
+            tag.decompose()
+        return soup.get_text(separator='\n', strip=True)
+    except Exception as e:
+        logger.error(f"Error parseando HTML: {e}")
+        return ""
+
+
+def iter_html_pages(file_path: str) -> Iterator[PageText]:
+    """Un HTML es una sola 'página' (hay que parsearlo completo igualmente)."""
+    text = read_html_text(file_path)
+    if text:
+        yield PageText(1, text)
+
+
+def iter_epub_pages(file_path: str) -> Iterator[PageText]:
+    """Cada documento HTML del EPUB (capítulo/sección) es una 'página'."""
+    try:
+        from ebooklib import epub
+        from bs4 import BeautifulSoup
+    except ImportError:
+        logger.warning("ebooklib no instalado. Instala con: pip install ebooklib")
+        return
+
+    try:
+        book = epub.read_epub(file_path)
+        number = 0
+        for item in book.get_items():
+            if item.get_type() == 9:  # ITEM_DOCUMENT (HTML content)
+                content = item.get_content().decode('utf-8', errors='ignore')
+                text = BeautifulSoup(content, 'html.parser').get_text(separator='\n', strip=True)
+                if text:
+                    number += 1
+                    yield PageText(number, text)
+        logger.info(f"EPUB extraído: {number} secciones")
+    except Exception as e:
+        logger.error(f"Error extrayendo EPUB: {e}")
+
+
+def iter_mobi_pages(file_path: str) -> Iterator[PageText]:
+    """
+    MOBI: intenta mobi-python (→ HTML); si no, texto visible del binario.
+    """
+    try:
+        try:
+            import mobi
+            tempdir, _ = mobi.extract(file_path)
+
+            # El archivo extraído suele ser HTML
+            for root, _, files in os.walk(tempdir):
+                for f in files:
+                    if f.endswith('.html') or f.endswith('.htm'):
+                        yield from iter_html_pages(os.path.join(root, f))
+                        return
+        except ImportError:
+            logger.warning("mobi no instalado. Usando fallback...")
+
+        with open(file_path, 'rb') as f:
+            text = f.read().decode('utf-8', errors='ignore')
+        clean_text = ''.join(c for c in text if c.isprintable() or c in '\n\r\t')
+        if clean_text:
+            yield PageText(1, clean_text)
+    except Exception as e:
+        logger.error(f"Error extrayendo MOBI: {e}")
+
+
+def iter_document_pages(file_path: str, filename: Optional[str] = None) -> Iterator[PageText]:
+    """Páginas de un documento según su extensión."""
+    ext = os.path.splitext(filename or file_path)[1].lower()
+
+    if ext == '.pdf':
+        try:
+            yield from iter_pdf_pages(file_path)
+        except Exception as e:
+            logger.error(f"Error extrayendo PDF: {e}")
+    elif ext in ['.html', '.htm']:
+        yield from iter_html_pages(file_path)
+    elif ext == '.epub':
+        yield from iter_epub_pages(file_path)
+    elif ext == '.mobi':
+        yield from iter_mobi_pages(file_path)
+    else:
+        yield from iter_txt_pages(file_path)
+
+
+# ============================================================================
+# CHUNKING INCREMENTAL
+# ============================================================================
+
+class StreamingChunker:
+    """
+    Divide un flujo de páginas en chunks de ~chunk_size caracteres.
+
+    Corta preferentemente en el primer separador disponible (párrafo,
+    línea, frase, palabra) dentro de la segunda mitad del chunk, igual que
+    RecursiveCharacterTextSplitter, pero sin necesitar el texto completo:
+    solo mantiene en memoria lo no emitido + el solapamiento.
+
+    Con anchor_period > 0 los cortes prefieren "anclas": separadores de
+    primer nivel cuyo texto siguiente cumple hash % anchor_period == 0.
+    Al depender del contenido y no de dónde empezó el chunk, dos versiones
+    de un documento vuelven a cortar en los mismos puntos poco después de
+    cada cambio y comparten casi todos sus chunks.
+    """
+
+    # Caracteres tras el separador que deciden si es un ancla
+    ANCHOR_SPAN = 64
+
+    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 200, separators: List[str] = None,
+                 anchor_period: int = 0):
+        if chunk_overlap >= chunk_size // 2:
+            raise ValueError("chunk_overlap debe ser menor que chunk_size / 2")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.anchor_period = anchor_period
+
+    def _anchor_point(self, buffer: str, min_pos: int) -> int:
+        """Último ancla en [min_pos, chunk_size], o -1."""
+        separator = self.separators[0]
+        pos = buffer.rfind(separator, min_pos, self.chunk_size)
+        while pos != -1:
+            end = pos + len(separator)
+            if zlib.crc32(buffer[end:end + self.ANCHOR_SPAN].encode('utf-8')) % self.anchor_period == 0:
+                return end
+            pos = buffer.rfind(separator, min_pos, pos)
+        return -1
+
+    def _split_point(self, buffer: str) -> int:
+        """Posición de corte <= chunk_size, en el separador de mayor nivel posible."""
+        window = buffer[:self.chunk_size]
+        min_pos = self.chunk_size // 2
+        if self.anchor_period:
+            anchor = self._anchor_point(buffer, min_pos)
+            if anchor != -1:
+                return anchor
+        for separator in self.separators:
+            if not separator:
+                continue
+            pos = window.rfind(separator, min_pos)
+            if pos != -1:
+                return pos + len(separator)
+        return self.chunk_size
+
+    def _overlap_start(self, buffer: str, end: int) -> int:
+        """Inicio del siguiente chunk: end - overlap, avanzado hasta un límite de palabra."""
+        start = max(end - self.chunk_overlap, 0)
+        if 0 < start < end and not buffer[start - 1].isspace():
+            next_space = min(
+                (p for p in (buffer.find(' ', start, end), buffer.find('\n', start, end)) if p != -1),
+                default=-1
+            )
+            start = next_space + 1 if next_space != -1 else end
+        return start if start > 0 else end
+
+    def chunks(self, pages: Iterable[PageText]) -> Iterator[Chunk]:
+        """Genera chunks a medida que llegan las páginas."""
+        buffer = ""
+        # (offset en buffer, número de página) de cada inicio de página en el buffer
+        boundaries: List[List[int]] = []
+        index = 0
+
+        def _emit(end: int) -> Optional[Chunk]:
+            nonlocal buffer, boundaries, index
+            text = buffer[:end].strip()
+            pages_in_chunk = [page for offset, page in boundaries if offset < end] or [boundaries[0][1]]
+            chunk = Chunk(text, index, pages_in_chunk[0], pages_in_chunk[-1]) if text else None
+            if chunk:
+                index += 1
+
+            start = self._overlap_start(buffer, end) if end < len(buffer) else end
+            buffer = buffer[start:]
+            # La página que contiene 'start' pasa a empezar en el offset 0
+            shifted = []
+            for offset, page in boundaries:
+                new_offset = offset - start
+                if new_offset <= 0:
+                    shifted = [[0, page]]
+                else:
+                    shifted.append([new_offset, page])
+            boundaries = shifted
+            return chunk
+
+        # Con anclas, cortar solo cuando todas las del chunk son decidibles
+        # (así los cortes no dependen de cómo llega el texto en páginas)
+        lookahead = self.ANCHOR_SPAN if self.anchor_period else 0
+        # Páginas que ya terminan en salto de línea (bloques de TXT) se unen
+        # tal cual con anclas: el texto no cambia si cambian los bloques
+        joiner_done = "\n" if self.anchor_period else "\n\n"
+
+        for page in pages:
+            if not page.text or not page.text.strip():
+                continue
+            if buffer and not buffer.endswith(joiner_done):
+                buffer += "\n\n"
+            boundaries.append([len(buffer), page.page_number])
+            buffer += page.text
+
+            while len(buffer) > self.chunk_size + lookahead:
+                chunk = _emit(self._split_point(buffer))
+                if chunk:
+                    yield chunk
+
+        # Fin del texto: lo que queda tras un separador es definitivo
+        while self.anchor_period and len(buffer) > self.chunk_size:
+            chunk = _emit(self._split_point(buffer))
+            if chunk:
+                yield chunk
+
+        if buffer.strip() and boundaries:
+            chunk = _emit(len(buffer))
+            if chunk:
+                yield chunk
+
+
+def iter_chunk_batches(chunks: Iterable[Chunk], batch_size: int) -> Iterator[List[Chunk]]:
+    """Agrupa chunks en lotes para la etapa de embeddings."""
+    batch: List[Chunk] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,240 @@
+"""
+🔎 ÍNDICE DE CIKs DE SEC EDGAR
+company_tickers.json (~10k emisores) se guarda en disco y se carga una vez
+por proceso en un diccionario por ticker: resolver un CIK es un acceso a
+memoria, no una descarga y un recorrido lineal.
+
+- Refresco diario condicional (If-None-Match / If-Modified-Since): si SEC
+  responde 304 solo se renueva la marca de tiempo
+- Sin red se sigue usando la última copia en disco: tras un fallo no se
+  reintenta hasta pasados RETRY_AFTER_FAILURE_SECONDS, y la petición se
+  hace fuera del cerrojo (solo un hilo revalida; los demás no esperan)
+- Búsqueda por prefijo de ticker o de nombre (lista ordenada + bisect)
+"""
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+
+# Antigüedad máxima de la copia local antes de revalidarla con SEC
+REFRESH_SECONDS = 24 * 3600
+# Tras una revalidación fallida (sin red, 403, 5xx) se sigue con la copia local
+RETRY_AFTER_FAILURE_SECONDS = 15 * 60
+
+
+@dataclass
+class CompanyEntry:
+    """Emisor de company_tickers.json."""
+    ticker: str
+    cik: str  # 10 dígitos con ceros a la izquierda
+    name: str
+
+
+class CikIndex:
+    """
+    Ticker -> CIK de todos los emisores de EDGAR, persistido en
+    <root>/company_tickers.json con sus cabeceras de validación.
+    Compartido por todas las sesiones del proceso (get_cik_index).
+    """
+
+    def __init__(self, root: str, url: str = COMPANY_TICKERS_URL, refresh_seconds: int = REFRESH_SECONDS):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.path = os.path.join(root, 'company_tickers.json')
+        self.meta_path = os.path.join(root, 'company_tickers.meta.json')
+        self._lock = threading.Lock()
+        # Una sola revalidación en curso; la petición HTTP no toma self._lock
+        self._refresh_lock = threading.Lock()
+        self._by_ticker: Dict[str, CompanyEntry] = {}
+        self._by_cik: Dict[str, str] = {}
+        # (NOMBRE, ticker) y tickers ordenados para las búsquedas por prefijo
+        self._names: List[Tuple[str, str]] = []
+        self._tickers: List[str] = []
+        self._meta: Dict[str, object] = {}
+        self._loaded = False
+        os.makedirs(root, exist_ok=True)
+
+    # =========================================================================
+    # CARGA Y REFRESCO
+    # =========================================================================
+
+    def _ensure_fresh(self, session: Optional[requests.Session]) -> None:
+        with self._lock:
+            if not self._loaded:
+                self._meta = self._read_json(self.meta_path) or {}
+                data = self._read_json(self.path)
+                if data is not None:
+                    self._build(data)
+                self._loaded = True
+            if not self._refresh_due(session):
+                return
+            # Sin copia local hay que esperar a la descarga; con ella no
+            blocking = not self._by_ticker
+
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return
+        try:
+            with self._lock:
+                # Otro hilo pudo revalidar mientras se esperaba
+                if not self._refresh_due(session):
+                    return
+                headers = {}
+                if self._by_ticker:
+                    if self._meta.get('etag'):
+                        headers['If-None-Match'] = self._meta['etag']
+                    if self._meta.get('last_modified'):
+                        headers['If-Modified-Since'] = self._meta['last_modified']
+            self._refresh(session, headers)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_due(self, session: Optional[requests.Session]) -> bool:
+        if session is None:
+            return False
+        now = time.time()
+        if now - float(self._meta.get('failed_at', 0)) < RETRY_AFTER_FAILURE_SECONDS:
+            return False
+        return not self._by_ticker or now - float(self._meta.get('checked_at', 0)) >= self.refresh_seconds
+
+    def _refresh(self, session: requests.Session, headers: Dict[str, str]) -> None:
+        """Revalida la copia local con SEC (descarga solo si ha cambiado)."""
+        data = None
+        try:
+            response = session.get(self.url, headers=headers, timeout=10)
+            if response.status_code == 200:
+                data = response.json()
+            elif response.status_code != 304:
+                logger.error(f"Error obteniendo lista de tickers SEC: {response.status_code}")
+                response = None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"No se pudo revalidar el índice de CIKs ({e}); se usa la copia local")
+            response = None
+        if data is not None:
+            self._write_json(self.path, data)
+
+        with self._lock:
+            if response is None:
+                # No se reintenta en cada consulta (cada intento son varios reintentos con backoff)
+                self._meta['failed_at'] = time.time()
+            else:
+                if data is not None:
+                    self._build(data)
+                    self._meta['etag'] = response.headers.get('ETag')
+                    self._meta['last_modified'] = response.headers.get('Last-Modified')
+                    logger.info(f"Índice de CIKs actualizado: {len(self._by_ticker)} tickers")
+                else:
+                    logger.info("Índice de CIKs sin cambios en SEC (304)")
+                self._meta['checked_at'] = time.time()
+                self._meta.pop('failed_at', None)
+            self._write_json(self.meta_path, self._meta)
+
+    def _build(self, data: Dict) -> None:
+        by_ticker = {}
+        for entry in data.values():
+            ticker = str(entry.get('ticker', '')).upper()
+            if not ticker:
+                continue
+            # El primero gana: SEC lista antes la clase principal de cada emisor
+            by_ticker.setdefault(ticker, CompanyEntry(
+                ticker=ticker,
+                cik=str(entry.get('cik_str', '')).zfill(10),
+                name=str(entry.get('title', ''))
+            ))
+        self._by_ticker = by_ticker
+        by_cik: Dict[str, str] = {}
+        for company in by_ticker.values():
+            by_cik.setdefault(company.cik, company.ticker)
+        self._by_cik = by_cik
+        self._tickers = sorted(by_ticker)
+        self._names = sorted((company.name.upper(), company.ticker) for company in by_ticker.values())
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Copia local ilegible ({path}): {e}")
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: Dict) -> None:
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar {path}: {e}")
+
+    # =========================================================================
+    # CONSULTAS
+    # =========================================================================
+
+    def get(self, ticker: str, session: Optional[requests.Session] = None) -> Optional[CompanyEntry]:
+        """Emisor de un ticker (BRK.B y BRK-B se consideran el mismo)."""
+        self._ensure_fresh(session)
+        ticker = ticker.upper().strip()
+        return self._by_ticker.get(ticker) or self._by_ticker.get(ticker.replace('.', '-'))
+
+    def cik(self, ticker: str, session: Optional[requests.Session] = None) -> Optional[str]:
+        company = self.get(ticker, session)
+        return company.cik if company else None
+
+    def ticker(self, cik: str, session: Optional[requests.Session] = None) -> Optional[str]:
+        """Ticker principal de un CIK (la primera clase que lista SEC)."""
+        self._ensure_fresh(session)
+        return self._by_cik.get(str(cik).zfill(10))
+
+    def search(self, prefix: str, limit: int = 20,
+               session: Optional[requests.Session] = None) -> List[CompanyEntry]:
+        """Emisores cuyo ticker o nombre empieza por `prefix` (tickers primero)."""
+        self._ensure_fresh(session)
+        prefix = prefix.upper().strip()
+        if not prefix:
+            return []
+        found: List[str] = []
+        position = bisect.bisect_left(self._tickers, prefix)
+        while position < len(self._tickers) and len(found) < limit and self._tickers[position].startswith(prefix):
+            found.append(self._tickers[position])
+            position += 1
+        position = bisect.bisect_left(self._names, (prefix, ''))
+        while position < len(self._names) and len(found) < limit and self._names[position][0].startswith(prefix):
+            if self._names[position][1] not in found:
+                found.append(self._names[position][1])
+            position += 1
+        return [self._by_ticker[ticker] for ticker in found]
+
+    def __len__(self) -> int:
+        return len(self._by_ticker)
+
+
+# ============================================================================
+# ÍNDICE POR PROCESO
+# ============================================================================
+
+_INDEXES: Dict[str, CikIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_cik_index(root: str) -> CikIndex:
+    """CikIndex compartido por todas las sesiones del proceso."""
+    key = os.path.realpath(root)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = CikIndex(key)
+        return index
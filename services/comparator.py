@@ -3,14 +3,19 @@
 Compara múltiples acciones lado a lado
 """
 
+import logging
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from typing import List, Dict, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+from config import PATHS
 from services.market_data import MarketDataService, StockFundamentals
+from services.xbrl_facts import get_fact_store
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -21,6 +26,8 @@ class ComparisonResult:
     charts: Dict[str, go.Figure]
     winner: str
     scores: Dict[str, float]
+    # Ingresos anuales de los filings XBRL de SEC: años x tickers
+    history: pd.DataFrame = field(default_factory=pd.DataFrame)
 
 
 class TickerComparator:
@@ -36,11 +43,20 @@ class TickerComparator:
         'revenue_growth': 0.15
     }
     
+    HISTORY_YEARS = 15
+    
     def __init__(self):
         self.market_service = MarketDataService()
     
-    def compare(self, tickers: List[str]) -> Optional[ComparisonResult]:
-        """Compara lista de tickers."""
+    def compare(self, tickers: List[str], load_history: bool = False) -> Optional[ComparisonResult]:
+        """
+        Compara lista de tickers.
+        
+        Args:
+            tickers: Tickers a comparar
+            load_history: Descargar de SEC el companyfacts XBRL de los
+                tickers que no estén en el almacén local
+        """
         if len(tickers) < 2:
             return None
         
@@ -68,15 +84,33 @@ class TickerComparator:
             'valuation': self._create_valuation_chart(fundamentals)
         }
         
+        history = self._revenue_history(list(fundamentals.keys()), load_history)
+        if not history.empty:
+            charts['history'] = self._create_history_chart(history)
+        
         return ComparisonResult(
             tickers=list(fundamentals.keys()),
             fundamentals=fundamentals,
             comparison_table=table,
             charts=charts,
             winner=winner,
-            scores=scores
+            scores=scores,
+            history=history
         )
     
+    def _revenue_history(self, tickers: List[str], load: bool = False) -> pd.DataFrame:
+        """Ingresos anuales de los hechos XBRL de SEC (una consulta para todos los tickers)."""
+        try:
+            if load:
+                from services.sec_analyzer import SECAnalyzer
+                sec = SECAnalyzer()
+                for ticker in tickers:
+                    sec.load_company_facts(ticker)
+            return get_fact_store(PATHS.sec).frame(tickers, 'revenue', years=self.HISTORY_YEARS)
+        except Exception as e:
+            logger.error(f"Error leyendo histórico XBRL: {e}")
+            return pd.DataFrame()
+    
     def _create_comparison_table(self, fundamentals: Dict[str, StockFundamentals]) -> pd.DataFrame:
         """Crea tabla de comparación."""
         data = []
@@ -217,6 +251,30 @@ class TickerComparator:
         return fig
 
 
+    def _create_history_chart(self, history: pd.DataFrame) -> go.Figure:
+        """Evolución de ingresos anuales (SEC XBRL)."""
+        fig = go.Figure()
+        
+        for ticker in history.columns:
+            fig.add_trace(go.Scatter(
+                x=history.index,
+                y=history[ticker] / 1e9,
+                mode='lines+markers',
+                name=ticker
+            ))
+        
+        fig.update_layout(
+            title=f'Ingresos anuales (SEC XBRL, {len(history)} años)',
+            xaxis_title='Ejercicio',
+            yaxis_title='Ingresos ($B)',
+            template='plotly_dark',
+            paper_bgcolor='rgba(0,0,0,0)',
+            height=400
+        )
+        
+        return fig
+
+
 def render_comparison_tab():
     """Renderiza la pestaña de comparación en Streamlit."""
     st.header("📊 Comparativa de Tickers")
@@ -229,11 +287,15 @@ def render_comparison_tab():
     )
     
     tickers = [t.strip().upper() for t in tickers_input.split(",") if t.strip()]
+    load_history = st.checkbox(
+        "🧮 Descargar histórico XBRL de SEC de los tickers que falten",
+        help="Ingresos de hasta 15 ejercicios desde los filings XBRL (una descarga por ticker, luego queda en disco)"
+    )
     
     if len(tickers) >= 2 and st.button("🔍 Comparar", use_container_width=True):
         with st.spinner("Obteniendo datos..."):
             comparator = TickerComparator()
-            result = comparator.compare(tickers)
+            result = comparator.compare(tickers, load_history=load_history)
             
             if result:
                 # Winner
@@ -258,6 +320,9 @@ def render_comparison_tab():
                     st.plotly_chart(result.charts['valuation'], use_container_width=True)
                 
                 st.plotly_chart(result.charts['bars'], use_container_width=True)
+                
+                if 'history' in result.charts:
+                    st.plotly_chart(result.charts['history'], use_container_width=True)
             else:
                 st.error("No se pudieron obtener datos para los tickers")
     elif len(tickers) < 2:
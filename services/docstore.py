@@ -0,0 +1,472 @@
+"""
+🗃️ DOCSTORE SQLITE - Texto y metadata de chunks por vector_id
+Sustituye al docstore pickled de LangChain (index.pkl).
+
+Características:
+- Clave = posición del vector en el índice FAISS (vector_id)
+- Metadata y texto en tablas separadas: filtrar no toca las páginas de texto
+- El texto solo se lee para los k resultados devueltos
+- Sin pickle: abrir el docstore es O(1) respecto al tamaño del corpus
+- Índice léxico invertido (FTS5, ranking BM25) mantenido en cada inserción
+- Firmas MinHash/LSH y procedencia de chunks casi-duplicados
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columnas de metadata con tipo propio; el resto va a 'extra' (JSON)
+METADATA_COLUMNS = ('source', 'author', 'filename', 'chunk_index', 'topics')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    vector_id INTEGER PRIMARY KEY,
+    source TEXT,
+    author TEXT,
+    filename TEXT,
+    chunk_index INTEGER,
+    topics TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS chunk_text (
+    vector_id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_filename ON chunks(filename);
+CREATE INDEX IF NOT EXISTS idx_chunks_author ON chunks(author);
+-- Sección de un filing (Item 1A, 7...): consulta directa sin búsqueda vectorial
+CREATE INDEX IF NOT EXISTS idx_chunks_item ON chunks(json_extract(extra, '$.item'));
+
+-- Casi-duplicados: firma MinHash y bandas LSH de cada vector canónico
+CREATE TABLE IF NOT EXISTS minhash (
+    vector_id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS minhash_bands (
+    band_key INTEGER NOT NULL,
+    vector_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_minhash_bands_key ON minhash_bands(band_key);
+CREATE INDEX IF NOT EXISTS idx_minhash_bands_vector ON minhash_bands(vector_id);
+
+-- Procedencia adicional de un vector canónico (chunks duplicados no embebidos)
+CREATE TABLE IF NOT EXISTS chunk_sources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vector_id INTEGER NOT NULL,
+    source TEXT,
+    author TEXT,
+    filename TEXT,
+    chunk_index INTEGER,
+    topics TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_sources_vector ON chunk_sources(vector_id);
+"""
+
+# Índice invertido sobre chunk_text (external content: el texto no se duplica)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(
+    content,
+    content='chunk_text',
+    content_rowid='vector_id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Palabras vacías (ES/EN) que no aportan a una búsqueda léxica
+LEXICAL_STOPWORDS = {
+    'the', 'and', 'of', 'to', 'in', 'for', 'on', 'is', 'are', 'was', 'what', 'how', 'does',
+    'do', 'it', 'its', 'with', 'by', 'as', 'at', 'or', 'an', 'be', 'this', 'that', 'much',
+    'el', 'la', 'los', 'las', 'de', 'del', 'en', 'un', 'una', 'y', 'o', 'que', 'por', 'con',
+    'para', 'es', 'se', 'su', 'sus', 'al', 'lo', 'como', 'qué', 'cuál', 'cuánto', 'cómo',
+    'hay', 'sobre', 'dice', 'tiene',
+}
+
+# SQLite limita el número de parámetros por consulta
+_MAX_PARAMS = 900
+
+
+def build_match_query(query: str) -> str:
+    """
+    Convierte texto libre en una consulta FTS5 segura.
+
+    Las frases entre comillas se mantienen como frase exacta; el resto se
+    tokeniza y se combina con OR (el ranking BM25 premia los que coinciden más).
+    """
+    terms = []
+    for phrase in re.findall(r'"([^"]+)"', query):
+        tokens = re.findall(r'\w+', phrase.lower())
+        if tokens:
+            terms.append('"' + ' '.join(tokens) + '"')
+
+    remainder = re.sub(r'"[^"]*"', ' ', query)
+    for token in re.findall(r'\w+', remainder.lower()):
+        if token in LEXICAL_STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        quoted = f'"{token}"'
+        if quoted not in terms:
+            terms.append(quoted)
+
+    return ' OR '.join(terms)
+
+
+def _chunked(ids: List[int], size: int = _MAX_PARAMS) -> Iterable[List[int]]:
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+class SQLiteDocstore:
+    """
+    Docstore en SQLite (modo WAL) indexado por vector_id.
+
+    Es append-only: una generación del índice solo consulta vector_ids
+    menores que su ntotal, así que un escritor puede añadir filas mientras
+    los lectores siguen sirviendo la generación anterior.
+    """
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+
+        if not readonly:
+            conn = self._connect()
+            conn.executescript(SCHEMA)
+            conn.commit()
+            self._ensure_fts(conn)
+
+        self.has_fts = self._connect().execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'chunk_fts'"
+        ).fetchone() is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Conexión por hilo (Streamlit atiende cada sesión en un hilo)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            if not self.readonly:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _ensure_fts(self, conn: sqlite3.Connection) -> None:
+        """Crea el índice léxico y lo rellena si el docstore ya tenía chunks."""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunk_fts'").fetchone()
+        if exists:
+            return
+        try:
+            with conn:
+                conn.executescript(FTS_SCHEMA)
+                if conn.execute("SELECT 1 FROM chunk_text LIMIT 1").fetchone():
+                    logger.info(f"Construyendo índice léxico para {self.path}")
+                    conn.execute("INSERT INTO chunk_fts(chunk_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite sin FTS5 ({e}): solo búsqueda vectorial")
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def add(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Añade chunks.
+
+        Args:
+            records: Dicts con 'vector_id', 'content' y 'metadata'
+        """
+        if self.readonly:
+            raise PermissionError("Docstore abierto en solo lectura")
+
+        meta_rows = []
+        text_rows = []
+        for record in records:
+            meta_rows.append((int(record['vector_id']),) + self._metadata_columns(record.get('metadata')))
+            text_rows.append((int(record['vector_id']), record['content']))
+
+        conn = self._connect()
+        with conn:
+            if self.has_fts:
+                # Filas huérfanas de un escritor que murió antes de publicar:
+                # sacarlas del índice léxico antes de reemplazarlas
+                stale = self._existing_texts(conn, [row[0] for row in text_rows])
+                conn.executemany(
+                    "INSERT INTO chunk_fts(chunk_fts, rowid, content) VALUES ('delete', ?, ?)",
+                    stale
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)", meta_rows
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_text VALUES (?, ?)", text_rows
+            )
+            if self.has_fts:
+                conn.executemany(
+                    "INSERT INTO chunk_fts(rowid, content) VALUES (?, ?)", text_rows
+                )
+
+    @staticmethod
+    def _metadata_columns(metadata: Optional[Dict[str, Any]]) -> tuple:
+        """(source, author, filename, chunk_index, topics, extra) de un dict de metadata."""
+        metadata = dict(metadata or {})
+        topics = metadata.pop('topics', None)
+        return (
+            metadata.pop('source', None),
+            metadata.pop('author', None),
+            metadata.pop('filename', None),
+            metadata.pop('chunk_index', None),
+            json.dumps(topics, ensure_ascii=False) if topics is not None else None,
+            json.dumps(metadata, ensure_ascii=False, default=str) if metadata else None,
+        )
+
+    def add_signatures(self, rows: List[tuple]) -> None:
+        """
+        Registra firmas MinHash de vectores canónicos.
+
+        Args:
+            rows: Tuplas (vector_id, firma uint32, claves de banda)
+        """
+        conn = self._connect()
+        with conn:
+            ids = [int(vector_id) for vector_id, _, _ in rows]
+            for batch in _chunked(ids):
+                placeholders = ','.join('?' * len(batch))
+                # Bandas huérfanas de un escritor que murió antes de publicar
+                conn.execute(f"DELETE FROM minhash_bands WHERE vector_id IN ({placeholders})", batch)
+            conn.executemany(
+                "INSERT OR REPLACE INTO minhash VALUES (?, ?)",
+                [(int(vector_id), signature.tobytes()) for vector_id, signature, _ in rows]
+            )
+            conn.executemany(
+                "INSERT INTO minhash_bands VALUES (?, ?)",
+                [(key, int(vector_id)) for vector_id, _, keys in rows for key in keys]
+            )
+
+    def lsh_candidates(self, keys: List[int], below: int) -> List[int]:
+        """vector_ids (< below) que comparten alguna banda LSH."""
+        found = set()
+        conn = self._connect()
+        for batch in _chunked(list(keys)):
+            placeholders = ','.join('?' * len(batch))
+            found.update(r[0] for r in conn.execute(
+                f"SELECT vector_id FROM minhash_bands WHERE band_key IN ({placeholders}) AND vector_id < ?",
+                batch + [int(below)]
+            ))
+        return sorted(found)
+
+    def get_signatures(self, vector_ids: List[int]) -> Dict[int, Any]:
+        """Firmas MinHash (np.uint32) por vector_id."""
+        import numpy as np
+
+        result = {}
+        conn = self._connect()
+        for batch in _chunked([int(i) for i in vector_ids]):
+            placeholders = ','.join('?' * len(batch))
+            for vector_id, blob in conn.execute(
+                f"SELECT vector_id, signature FROM minhash WHERE vector_id IN ({placeholders})", batch
+            ):
+                result[vector_id] = np.frombuffer(blob, dtype=np.uint32)
+        return result
+
+    def delete_signatures_from(self, vector_id: int) -> None:
+        """Descarta firmas de vectores >= vector_id (rollback de un escritor)."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM minhash WHERE vector_id >= ?", (int(vector_id),))
+            conn.execute("DELETE FROM minhash_bands WHERE vector_id >= ?", (int(vector_id),))
+
+    def add_sources(self, rows: List[tuple]) -> None:
+        """
+        Añade procedencia a vectores canónicos.
+
+        Args:
+            rows: Tuplas (vector_id canónico, metadata del chunk duplicado)
+        """
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO chunk_sources (vector_id, source, author, filename, chunk_index, topics, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(int(vector_id),) + self._metadata_columns(metadata) for vector_id, metadata in rows]
+            )
+
+    def last_source_id(self) -> int:
+        row = self._connect().execute("SELECT MAX(id) FROM chunk_sources").fetchone()
+        return row[0] or 0
+
+    def delete_sources_after(self, source_id: int) -> None:
+        """Descarta procedencias añadidas después de `source_id` (rollback de un escritor)."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM chunk_sources WHERE id > ?", (int(source_id),))
+
+    @staticmethod
+    def _existing_texts(conn: sqlite3.Connection, ids: List[int]) -> List[tuple]:
+        rows = []
+        for batch in _chunked(ids):
+            placeholders = ','.join('?' * len(batch))
+            rows.extend(conn.execute(
+                f"SELECT vector_id, content FROM chunk_text WHERE vector_id IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    # =========================================================================
+    # LECTURA
+    # =========================================================================
+
+    @staticmethod
+    def _row_to_metadata(row) -> Dict[str, Any]:
+        vector_id, source, author, filename, chunk_index, topics, extra = row
+        metadata = json.loads(extra) if extra else {}
+        metadata.update({
+            'source': source,
+            'author': author,
+            'filename': filename,
+            'chunk_index': chunk_index,
+            'topics': json.loads(topics) if topics else [],
+        })
+        return metadata
+
+    def get_metadata(self, vector_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Metadata de varios chunks en una sola consulta (sin leer el texto)."""
+        result = {}
+        ids = [int(i) for i in vector_ids if i is not None and i >= 0]
+        conn = self._connect()
+        for batch in _chunked(ids):
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT * FROM chunks WHERE vector_id IN ({placeholders})", batch
+            ).fetchall()
+            for row in rows:
+                result[row[0]] = self._row_to_metadata(row)
+        return result
+
+    def get_sources(self, vector_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """Procedencias adicionales (duplicados) de cada vector canónico."""
+        result: Dict[int, List[Dict[str, Any]]] = {}
+        ids = [int(i) for i in vector_ids if i is not None and i >= 0]
+        conn = self._connect()
+        for batch in _chunked(ids):
+            placeholders = ','.join('?' * len(batch))
+            try:
+                rows = conn.execute(
+                    f"SELECT vector_id, source, author, filename, chunk_index, topics, extra "
+                    f"FROM chunk_sources WHERE vector_id IN ({placeholders}) ORDER BY id", batch
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # Docstore anterior a la deduplicación (abierto solo lectura)
+                return result
+            for row in rows:
+                sources = result.setdefault(row[0], [])
+                metadata = self._row_to_metadata(row)
+                # Una ejecución reanudada puede registrar la misma procedencia dos veces
+                if not any(m['filename'] == metadata['filename'] and m['chunk_index'] == metadata['chunk_index']
+                           and m['source'] == metadata['source'] for m in sources):
+                    sources.append(metadata)
+        return result
+
+    def get_texts(self, vector_ids: List[int]) -> Dict[int, str]:
+        """Texto de varios chunks en una sola consulta."""
+        result = {}
+        ids = [int(i) for i in vector_ids if i is not None and i >= 0]
+        conn = self._connect()
+        for batch in _chunked(ids):
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT vector_id, content FROM chunk_text WHERE vector_id IN ({placeholders})", batch
+            ).fetchall()
+            result.update(dict(rows))
+        return result
+
+    def lexical_search(self, query: str, k: int, below: Optional[int] = None) -> List[tuple]:
+        """
+        Búsqueda léxica BM25 sobre el índice invertido.
+
+        Args:
+            query: Texto libre (frases exactas entre comillas)
+            k: Número máximo de resultados
+            below: Solo vector_ids menores (ntotal de la generación que consulta)
+
+        Returns:
+            Lista de (vector_id, score BM25) de mayor a menor relevancia
+        """
+        match = build_match_query(query)
+        if not self.has_fts or not match:
+            return []
+
+        sql = "SELECT rowid, bm25(chunk_fts) FROM chunk_fts WHERE chunk_fts MATCH ?"
+        params: List[Any] = [match]
+        if below is not None:
+            sql += " AND rowid < ?"
+            params.append(int(below))
+        sql += " ORDER BY bm25(chunk_fts) LIMIT ?"
+        params.append(int(k))
+
+        try:
+            rows = self._connect().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Consulta léxica inválida '{match}': {e}")
+            return []
+        # bm25() devuelve valores negativos (más negativo = más relevante)
+        return [(vid, -score) for vid, score in rows]
+
+    def get_text(self, vector_id: int) -> str:
+        return self.get_texts([vector_id]).get(int(vector_id), "")
+
+    def ids_for_filename(self, filename: str) -> List[int]:
+        rows = self._connect().execute(
+            "SELECT vector_id FROM chunks WHERE filename = ? ORDER BY vector_id", (filename,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def ids_where(self, key: str, values: List[Any], below: Optional[int] = None) -> List[int]:
+        """
+        vector_ids cuyo campo de metadata `key` (columna 'extra') está en
+        `values`, en orden de inserción (orden del documento).
+        """
+        if not values:
+            return []
+        if not key.isidentifier():
+            raise ValueError(f"Campo de metadata inválido: {key}")
+        # Ruta literal: así SQLite usa el índice de expresión (idx_chunks_item)
+        placeholders = ','.join('?' * len(values))
+        sql = f"SELECT vector_id FROM chunks WHERE json_extract(extra, '$.{key}') IN ({placeholders})"
+        params: List[Any] = list(values)
+        if below is not None:
+            sql += " AND vector_id < ?"
+            params.append(int(below))
+        rows = self._connect().execute(sql + " ORDER BY vector_id", params).fetchall()
+        return [r[0] for r in rows]
+
+    def count(self, below: Optional[int] = None) -> int:
+        """Número de chunks (opcionalmente solo los de vector_id < below)."""
+        if below is None:
+            row = self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()
+        else:
+            row = self._connect().execute(
+                "SELECT COUNT(*) FROM chunks WHERE vector_id < ?", (below,)
+            ).fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def remove_docstore_files(path: str) -> None:
+    """Elimina el fichero SQLite y sus auxiliares WAL/SHM."""
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {path + suffix}: {e}")
@@ -0,0 +1,267 @@
+"""
+🗄️ REGISTRO DE DOCUMENTOS DEL ORÁCULO
+Cada 10-K/10-Q ingerido tiene su propio índice persistente, identificado
+por el hash de su contenido: subir un segundo filing no descarta el
+primero y volver a uno anterior no vuelve a calcular embeddings.
+
+- documents.sqlite: un registro por documento (ticker, formulario,
+  estructura detectada, último uso) y el hash de cada uno de sus chunks
+- <doc_id>/: SharedVectorStore del documento (CURRENT + gen-* + docstore)
+- Residencia LRU: como mucho MODELS.resident_documents índices abiertos
+  (mapeados en memoria); el resto se reabre al consultarlo
+"""
+
+import os
+import re
+import json
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .vector_store import SharedVectorStore, VectorIndex
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    ticker TEXT,
+    form_type TEXT,
+    num_chunks INTEGER DEFAULT 0,
+    structure TEXT,
+    ingested_at TEXT,
+    last_used_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_ticker ON documents(ticker);
+CREATE INDEX IF NOT EXISTS idx_documents_last_used ON documents(last_used_at);
+CREATE TABLE IF NOT EXISTS chunks (
+    doc_id TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    vector_id INTEGER NOT NULL,
+    PRIMARY KEY (doc_id, chunk_hash)
+);
+"""
+
+# Identificador: prefijo del SHA-256 del contenido (colisión despreciable a esta escala)
+DOC_ID_LENGTH = 16
+
+# "TSLA-10-K-2023.pdf", "AAPL_10-Q_2024-05-03.txt", "intc-20231230.htm"
+_TICKER_RE = re.compile(r'^([A-Za-z]{1,5}(?:\.[A-Za-z])?)[-_ ]')
+_FORM_RE = re.compile(r'\b(10-K|10-Q|20-F|8-K|S-1|40-F)(/A)?(?![A-Za-z0-9])', re.IGNORECASE)
+
+
+def content_id(data: bytes) -> str:
+    """doc_id de un contenido (bytes del archivo o texto codificado en UTF-8)."""
+    return hashlib.sha256(data).hexdigest()[:DOC_ID_LENGTH]
+
+
+def parse_filename(filename: str) -> Dict[str, Optional[str]]:
+    """Ticker y formulario deducidos del nombre de archivo (si los hay)."""
+    ticker = _TICKER_RE.match(filename)
+    form = _FORM_RE.search(filename.replace('_', ' '))
+    return {
+        'ticker': ticker.group(1).upper() if ticker else None,
+        'form_type': form.group(0).upper() if form else None,
+    }
+
+
+class DocumentRegistry:
+    """
+    Registro de documentos con un índice por documento y residencia LRU.
+    Compartido por todas las sesiones del proceso (get_document_registry).
+    """
+
+    def __init__(self, root: str, embeddings, max_resident: int = 4):
+        self.root = root
+        self.embeddings = embeddings
+        self.max_resident = max(1, max_resident)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # doc_id -> almacén abierto, del menos al más recientemente usado
+        self._resident: 'OrderedDict[str, SharedVectorStore]' = OrderedDict()
+
+        os.makedirs(self.root, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'documents.sqlite'), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # =========================================================================
+    # REGISTRO
+    # =========================================================================
+
+    def register(self, doc_id: str, filename: str, num_chunks: int,
+                 structure: Optional[Dict[str, Any]] = None,
+                 ticker: Optional[str] = None, form_type: Optional[str] = None) -> Dict[str, Any]:
+        """Registra un documento ya indexado en su almacén."""
+        parsed = parse_filename(filename)
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    doc_id, filename,
+                    (ticker or parsed['ticker'] or '').upper() or None,
+                    form_type or parsed['form_type'],
+                    num_chunks,
+                    json.dumps(structure) if structure else None,
+                    now, now
+                )
+            )
+        return self.get(doc_id)
+
+    def record_chunks(self, doc_id: str, chunks: List[Tuple[str, int]]) -> None:
+        """Hash de contenido -> vector_id de los chunks de un documento."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunks VALUES (?, ?, ?)",
+                [(doc_id, chunk_hash, vector_id) for chunk_hash, vector_id in chunks]
+            )
+    
+    def chunk_ids(self, doc_id: str) -> Dict[str, int]:
+        return {
+            row[0]: row[1] for row in self._connect().execute(
+                "SELECT chunk_hash, vector_id FROM chunks WHERE doc_id = ?", (doc_id,)
+            )
+        }
+    
+    def find_base(self, ticker: Optional[str], form_type: Optional[str] = None,
+                  exclude: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Documento previo del mismo emisor del que reaprovechar chunks (una
+        enmienda 10-K/A parte de su 10-K): mismo formulario si lo hay, si
+        no el usado más recientemente.
+        """
+        if not ticker:
+            return None
+        candidates = [
+            doc for doc in self.list_documents(ticker)
+            if doc['doc_id'] != exclude and self.has_document(doc['doc_id'])
+        ]
+        family = (form_type or '').split('/')[0]
+        same_form = [doc for doc in candidates if family and (doc['form_type'] or '').split('/')[0] == family]
+        return (same_form or candidates or [None])[0]
+    
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def has_document(self, doc_id: str) -> bool:
+        """Registrado y con una generación publicada en disco."""
+        return self.get(doc_id) is not None and self.store(doc_id, resident=False).generation is not None
+
+    def list_documents(self, ticker: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Documentos registrados, usados más recientemente primero."""
+        sql = "SELECT * FROM documents"
+        params: List[Any] = []
+        if ticker:
+            sql += " WHERE ticker = ?"
+            params.append(ticker.upper())
+        sql += " ORDER BY last_used_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [self._row_to_dict(row) for row in self._connect().execute(sql, params)]
+
+    def tickers(self) -> Dict[str, int]:
+        """Tickers con su número de documentos."""
+        return {
+            row[0]: row[1] for row in self._connect().execute(
+                "SELECT ticker, COUNT(*) FROM documents WHERE ticker IS NOT NULL GROUP BY ticker ORDER BY ticker"
+            )
+        }
+
+    def touch(self, doc_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE documents SET last_used_at = ? WHERE doc_id = ?", (datetime.now().isoformat(), doc_id))
+
+    def remove(self, doc_id: str) -> bool:
+        """Elimina el documento del registro y su índice del disco."""
+        with self._lock:
+            store = self._resident.pop(doc_id, None)
+        if store is not None:
+            store.release()
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount > 0
+            conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+        shutil.rmtree(os.path.join(self.root, doc_id), ignore_errors=True)
+        return removed
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        doc = dict(row)
+        doc['structure'] = json.loads(doc['structure']) if doc.get('structure') else None
+        return doc
+
+    # =========================================================================
+    # ÍNDICES (residencia LRU)
+    # =========================================================================
+
+    def store(self, doc_id: str, resident: bool = True) -> SharedVectorStore:
+        """
+        Almacén del documento. Con resident=True pasa a ser el más reciente
+        y, si se supera max_resident, se libera el menos usado.
+        """
+        with self._lock:
+            store = self._resident.get(doc_id)
+            if store is not None:
+                self._resident.move_to_end(doc_id)
+                return store
+            store = SharedVectorStore(os.path.join(self.root, doc_id), self.embeddings)
+            if not resident:
+                return store
+            self._resident[doc_id] = store
+            evicted = []
+            while len(self._resident) > self.max_resident:
+                evicted.append(self._resident.popitem(last=False))
+        for old_id, old_store in evicted:
+            old_store.release()
+            logger.info(f"Documento {old_id} liberado de memoria (LRU, máx. {self.max_resident})")
+        return store
+
+    def index(self, doc_id: str) -> Optional[VectorIndex]:
+        """Generación activa del índice del documento (la abre si no está residente)."""
+        return self.store(doc_id).current()
+
+    def resident(self) -> List[str]:
+        """doc_ids residentes, del menos al más recientemente usado."""
+        with self._lock:
+            return list(self._resident)
+
+
+# ============================================================================
+# REGISTRO POR PROCESO
+# ============================================================================
+
+_REGISTRIES: Dict[str, DocumentRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_document_registry(root: str, embeddings, max_resident: int = 4) -> DocumentRegistry:
+    """DocumentRegistry compartido por todas las sesiones del proceso."""
+    key = os.path.realpath(root)
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(key)
+        if registry is None:
+            registry = _REGISTRIES[key] = DocumentRegistry(key, embeddings, max_resident)
+        return registry
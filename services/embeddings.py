@@ -0,0 +1,263 @@
+"""
+🧬 EMBEDDINGS - Proveedores intercambiables
+Interfaz común para calcular embeddings con distintos backends.
+
+Backends:
+- openai:   API de OpenAI (text-embedding-3-*), el comportamiento histórico
+- local:    Modelo sentence-transformers en disco (CPU, sin red, sin coste)
+- hashing:  Proyección por hashing de n-gramas (sin dependencias, fallback)
+
+Todos devuelven matrices float32 normalizadas, calculan en lotes y en
+paralelo, y exponen `name`/`dimension` para que cada índice registre qué
+modelo produjo sus vectores (índices de modelos distintos no se mezclan).
+"""
+
+import os
+import re
+import zlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Dimensiones conocidas de modelos OpenAI
+OPENAI_DIMENSIONS = {
+    'text-embedding-3-large': 3072,
+    'text-embedding-3-small': 1536,
+    'text-embedding-ada-002': 1536,
+}
+
+
+class EmbeddingMismatchError(ValueError):
+    """El índice fue construido con un modelo de embeddings distinto."""
+
+
+class EmbeddingProvider(ABC):
+    """
+    Proveedor de embeddings.
+
+    Las subclases implementan `_embed_batch`; la clase base reparte los
+    textos en lotes de `batch_size` y los procesa con `max_workers` hilos
+    conservando el orden.
+    """
+
+    backend: str = ''
+
+    def __init__(self, batch_size: int = 64, max_workers: int = 4):
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Identificador estable del modelo (se guarda en el índice)."""
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Dimensión de los vectores producidos."""
+
+    @abstractmethod
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embeddings de un lote (matriz n x dimension)."""
+
+    @staticmethod
+    def _normalize(matrix) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embeddings de documentos en lotes paralelos."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_workers == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+
+        return self._normalize(np.vstack(results))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embedding de una consulta (vector 1-D)."""
+        return self.embed_documents([text])[0]
+
+    def info(self) -> Dict[str, Any]:
+        """Metadata que se registra en cada índice."""
+        return {'embedding_model': self.name, 'dimension': self.dimension, 'backend': self.backend}
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings vía API de OpenAI (requiere OPENAI_API_KEY)."""
+
+    backend = 'openai'
+
+    def __init__(self, model: str, batch_size: int = 256, max_workers: int = 4):
+        super().__init__(batch_size=batch_size, max_workers=max_workers)
+        from langchain_openai import OpenAIEmbeddings
+
+        self.model = model
+        self._client = OpenAIEmbeddings(model=model, chunk_size=batch_size)
+        self._dimension = OPENAI_DIMENSIONS.get(model)
+
+    @property
+    def name(self) -> str:
+        return f"openai:{self.model}"
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self._client.embed_query("dimension probe"))
+        return self._dimension
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._client.embed_documents(texts), dtype=np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._normalize(self._client.embed_query(text))[0]
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """Modelo local sentence-transformers en CPU (pip install sentence-transformers)."""
+
+    backend = 'local'
+
+    def __init__(self, model_path: str, batch_size: int = 64, max_workers: int = 2):
+        super().__init__(batch_size=batch_size, max_workers=max_workers)
+        from sentence_transformers import SentenceTransformer
+
+        self.model_path = model_path
+        self._model = SentenceTransformer(model_path, device='cpu')
+        self._dimension = self._model.get_sentence_embedding_dimension()
+
+    @property
+    def name(self) -> str:
+        return f"local:{os.path.basename(os.path.normpath(self.model_path))}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Proyección por hashing de unigramas y bigramas (feature hashing con signo).
+
+    No captura sinónimos como un modelo neuronal, pero es determinista,
+    instantánea, no necesita red ni dependencias y sirve de fallback
+    offline y de backend para benchmarks reproducibles.
+    """
+
+    backend = 'hashing'
+    _TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+    def __init__(self, dimension: int = 512, batch_size: int = 256, max_workers: int = 4):
+        super().__init__(batch_size=batch_size, max_workers=max_workers)
+        self._dimension = dimension
+
+    @property
+    def name(self) -> str:
+        return f"hashing:{self._dimension}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _features(self, text: str) -> List[str]:
+        tokens = self._TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self._dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                sign = 1.0 if (h >> 31) & 1 else -1.0
+                matrix[row, h % self._dimension] += sign
+        # tf sublineal: atenúa términos muy repetidos
+        return np.sign(matrix) * np.log1p(np.abs(matrix))
+
+
+# ============================================================================
+# FACTORY
+# ============================================================================
+
+_PROVIDERS: Dict[str, EmbeddingProvider] = {}
+_PROVIDERS_LOCK = threading.Lock()
+
+
+def _resolve_backend(backend: str) -> str:
+    """'auto' = OpenAI si hay API key, modelo local si existe, si no hashing."""
+    from config import MODELS
+
+    if backend != 'auto':
+        return backend
+    if os.getenv('OPENAI_API_KEY'):
+        return 'openai'
+    if MODELS.local_embedding_model and os.path.exists(MODELS.local_embedding_model):
+        return 'local'
+    return 'hashing'
+
+
+def get_embedding_provider(backend: Optional[str] = None, model: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Devuelve el proveedor configurado (una instancia por proceso).
+
+    Args:
+        backend: 'openai' | 'local' | 'hashing' | 'auto' (por defecto MODELS.embedding_backend)
+        model: Modelo OpenAI o ruta del modelo local (por defecto, el de config)
+    """
+    from config import MODELS
+
+    backend = _resolve_backend(backend or MODELS.embedding_backend)
+    if backend == 'openai':
+        model = model or MODELS.embedding_model
+    elif backend == 'local':
+        model = model or MODELS.local_embedding_model
+    else:
+        model = str(model or MODELS.hashing_dimension)
+
+    key = f"{backend}:{model}"
+    with _PROVIDERS_LOCK:
+        provider = _PROVIDERS.get(key)
+        if provider is None:
+            if backend == 'openai':
+                provider = OpenAIEmbeddingProvider(
+                    model, batch_size=MODELS.embedding_batch_size, max_workers=MODELS.embedding_workers
+                )
+            elif backend == 'local':
+                if not model:
+                    raise ValueError("Backend 'local' requiere MODELS.local_embedding_model (ruta del modelo)")
+                provider = SentenceTransformerProvider(model, max_workers=MODELS.embedding_workers)
+            elif backend == 'hashing':
+                provider = HashingEmbeddingProvider(int(model), max_workers=MODELS.embedding_workers)
+            else:
+                raise ValueError(f"Backend de embeddings desconocido: {backend}")
+            _PROVIDERS[key] = provider
+            logger.info(f"Proveedor de embeddings: {provider.name} ({provider.dimension} dims)")
+        return provider
@@ -0,0 +1,237 @@
+"""
+🗃️ CACHÉ LOCAL DE FILINGS DE SEC
+Un filing publicado no cambia: el documento principal se descarga una vez,
+se guarda comprimido por número de accession y los análisis siguientes lo
+leen de disco sin tocar la red.
+
+- filings/<accession>/<documento>.zst: HTML comprimido con zstd (gzip si
+  el paquete zstandard no está instalado; se leen ambos formatos)
+- submissions/CIK<cik>.json.gz: JSON de submissions con su ETag y
+  Last-Modified; pasado SUBMISSIONS_TTL se revalida con una petición
+  condicional (304 = se sigue usando la copia local); si SEC falla se
+  sigue con la copia local sin reintentar durante RETRY_AFTER_FAILURE_SECONDS;
+  las páginas de filings antiguos (filings.files) se guardan sin revalidar
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+import requests
+
+try:
+    import zstandard
+except ImportError:  # gzip de la biblioteca estándar
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SEC_EDGAR_SUBMISSIONS = "https://data.sec.gov/submissions/CIK{cik}.json"
+SEC_EDGAR_SUBMISSIONS_PAGE = "https://data.sec.gov/submissions/{name}"
+
+# Segundos durante los que la lista de filings de un emisor se da por vigente
+SUBMISSIONS_TTL = 3600
+# Tras una revalidación fallida (sin red, 403, 5xx) se sigue con la copia local
+RETRY_AFTER_FAILURE_SECONDS = 15 * 60
+
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def _safe(name: str) -> str:
+    return _UNSAFE_RE.sub('_', name)
+
+
+def compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+class FilingCache:
+    """
+    Documentos de filings y submissions de EDGAR en disco.
+    Compartido por todas las sesiones del proceso (get_filing_cache).
+    """
+
+    def __init__(self, root: str, submissions_ttl: int = SUBMISSIONS_TTL):
+        self.root = root
+        self.submissions_ttl = submissions_ttl
+        os.makedirs(os.path.join(self.root, 'filings'), exist_ok=True)
+        os.makedirs(os.path.join(self.root, 'submissions'), exist_ok=True)
+
+    # =========================================================================
+    # DOCUMENTOS (inmutables, por accession)
+    # =========================================================================
+
+    def _document_base(self, accession: str, document: str) -> str:
+        return os.path.join(self.root, 'filings', _safe(accession.replace('-', '')), _safe(document))
+
+    def has_document(self, accession: str, document: str) -> bool:
+        return self._document_path(accession, document) is not None
+
+    def _document_path(self, accession: str, document: str) -> Optional[str]:
+        base = self._document_base(accession, document)
+        if zstandard is not None and os.path.exists(f"{base}.zst"):
+            return f"{base}.zst"
+        if os.path.exists(f"{base}.gz"):
+            return f"{base}.gz"
+        return None
+
+    def get_document(self, accession: str, document: str) -> Optional[str]:
+        """HTML del documento, o None si no está en caché."""
+        path = self._document_path(accession, document)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if path.endswith('.zst'):
+                raw = zstandard.ZstdDecompressor().decompress(data)
+            else:
+                raw = gzip.decompress(data)
+            return raw.decode('utf-8')
+        except Exception as e:
+            logger.warning(f"Filing en caché ilegible ({path}): {e}")
+            return None
+
+    def put_document(self, accession: str, document: str, text: str) -> str:
+        """Guarda el documento (escritura atómica). Devuelve la ruta."""
+        base = self._document_base(accession, document)
+        path = f"{base}.zst" if zstandard is not None else f"{base}.gz"
+        self._write(path, compress(text.encode('utf-8')))
+        return path
+
+    # =========================================================================
+    # SUBMISSIONS (revalidación condicional)
+    # =========================================================================
+
+    def _submissions_paths(self, cik: str):
+        base = os.path.join(self.root, 'submissions', f"CIK{str(cik).zfill(10)}")
+        return f"{base}.json.gz", f"{base}.meta.json"
+
+    def submissions(self, cik: str, session: requests.Session, timeout: int = 15) -> Dict:
+        """
+        JSON de submissions de un emisor: de disco si es reciente; si no,
+        petición condicional a SEC. Sin red se usa la copia local.
+
+        Raises:
+            requests.RequestException si no hay copia local y SEC falla
+        """
+        data_path, meta_path = self._submissions_paths(cik)
+        meta = self._read_meta(meta_path)
+        cached = self._read_submissions(data_path) if meta else None
+        now = time.time()
+        if cached is not None and (now - meta.get('checked_at', 0) < self.submissions_ttl
+                                   or now - meta.get('failed_at', 0) < RETRY_AFTER_FAILURE_SECONDS):
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        url = SEC_EDGAR_SUBMISSIONS.format(cik=str(cik).zfill(10))
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and cached is not None:
+                data = cached
+            else:
+                response.raise_for_status()
+                data = response.json()
+                self._write(data_path, gzip.compress(json.dumps(data).encode('utf-8'), compresslevel=GZIP_LEVEL))
+                meta = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }
+        except requests.exceptions.RequestException as e:
+            if cached is None:
+                raise
+            logger.warning(f"No se pudo revalidar submissions de CIK {cik} ({e}); se usa la copia local")
+            # Cada intento son varios reintentos con backoff: no se repite en cada consulta
+            meta['failed_at'] = time.time()
+            self._write(meta_path, json.dumps(meta).encode('utf-8'))
+            return cached
+        meta['checked_at'] = time.time()
+        meta.pop('failed_at', None)
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+        return data
+
+    def submissions_page(self, name: str, session: requests.Session, timeout: int = 15) -> Dict:
+        """
+        Página de filings antiguos de un emisor (filings.files del JSON de
+        submissions, p.ej. CIK0000320193-submissions-001.json). Cubren un
+        rango de fechas cerrado: se descargan una vez y no se revalidan.
+        """
+        path = os.path.join(self.root, 'submissions', f"{_safe(name)}.gz")
+        cached = self._read_submissions(path)
+        if cached is not None:
+            return cached
+        response = session.get(SEC_EDGAR_SUBMISSIONS_PAGE.format(name=name), timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        self._write(path, gzip.compress(json.dumps(data).encode('utf-8'), compresslevel=GZIP_LEVEL))
+        return data
+
+    @staticmethod
+    def _read_meta(path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _read_submissions(path: str) -> Optional[Dict]:
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Submissions en caché ilegibles ({path}): {e}")
+            return None
+
+    def _write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, int]:
+        """Documentos en caché y bytes que ocupan (comprimidos)."""
+        documents = 0
+        size = 0
+        for folder, _, files in os.walk(os.path.join(self.root, 'filings')):
+            for name in files:
+                if name.endswith(('.zst', '.gz')):
+                    documents += 1
+                    size += os.path.getsize(os.path.join(folder, name))
+        return {'documents': documents, 'bytes': size}
+
+
+# ============================================================================
+# CACHÉ POR PROCESO
+# ============================================================================
+
+_CACHES: Dict[str, FilingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_filing_cache(root: str) -> FilingCache:
+    """FilingCache compartida por todas las sesiones del proceso."""
+    key = os.path.realpath(root)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = FilingCache(key)
+        return cache
@@ -0,0 +1,127 @@
+"""
+🧾 PARSER DE FILINGS HTML (una sola pasada)
+Un 10-K de EDGAR (5-15 MB de HTML / inline XBRL) se parsea una vez con
+lxml (libxml2, en C) y de ese árbol salen juntos:
+
+- Texto por bloques (un párrafo/div por línea), con las tablas en su sitio
+  como filas "a | b | c"
+- Tablas de estados financieros tipadas (financial_tables.parse_table)
+- Secciones por Item con un único regex compilado para todos los Items
+  (filing_sections.find_headings), descartando las entradas del índice
+
+Sustituye a BeautifulSoup + html.parser (Python puro) y a las varias
+pasadas de regex sin compilar sobre el texto completo.
+"""
+
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Union
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from .filing_sections import find_headings
+from .financial_tables import FinancialTable, parse_table
+
+logger = logging.getLogger(__name__)
+
+# Elementos que empiezan línea en el texto extraído
+BLOCK_TAGS = (
+    'p', 'div', 'br', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'section', 'article', 'center', 'pre', 'blockquote', 'dt', 'dd', 'title', 'table'
+)
+
+# Texto previo a cada tabla que se examina para su título y escala
+TABLE_CONTEXT_CHARS = 600
+
+# Marcador de la posición de una tabla en el texto (carácter de uso privado de Unicode)
+_TABLE_MARK = '\ue000T{}\ue000'
+_TABLE_MARK_RE = re.compile('\ue000T(\\d+)\ue000')
+_HIDDEN_XPATH = "//*[contains(translate(@style, ' ', ''), 'display:none')]"
+
+
+@dataclass
+class ParsedFiling:
+    """Resultado de la pasada única sobre el HTML de un filing."""
+    text: str
+    # (offset en text, item, título) de los encabezados reales de Item
+    headings: List[Tuple[int, str, str]] = field(default_factory=list)
+    tables: List[FinancialTable] = field(default_factory=list)
+    num_tables: int = 0
+
+    @property
+    def sections(self) -> Dict[str, str]:
+        """Texto de cada Item (un Item repetido acumula todos sus tramos)."""
+        sections: Dict[str, List[str]] = {}
+        bounds = [offset for offset, _, _ in self.headings] + [len(self.text)]
+        for position, (offset, item, _) in enumerate(self.headings):
+            sections.setdefault(item, []).append(self.text[offset:bounds[position + 1]].strip())
+        return {item: "\n".join(parts) for item, parts in sections.items()}
+
+    def section(self, item: str) -> str:
+        return self.sections.get(item, "")
+
+
+def _cell_text(cell) -> str:
+    return ' '.join(cell.text_content().split())
+
+
+def parse_filing_html(content: Union[str, bytes]) -> ParsedFiling:
+    """
+    Texto, tablas y secciones de un filing HTML en una sola pasada de parseo.
+
+    Args:
+        content: HTML del documento (str o bytes; los .htm de EDGAR con
+            inline XBRL empiezan por una declaración <?xml encoding=...?>)
+    """
+    if isinstance(content, str):
+        # lxml rechaza str con declaración de encoding: se le pasan bytes
+        content = content.encode('utf-8')
+    parser = lxml_html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True, huge_tree=True)
+    try:
+        root = lxml_html.document_fromstring(content, parser=parser)
+    except (etree.ParserError, ValueError) as e:
+        logger.warning(f"HTML vacío o ilegible: {e}")
+        return ParsedFiling(text="")
+
+    # Fuera scripts, estilos y la cabecera oculta de inline XBRL (ix:header)
+    etree.strip_elements(root, 'script', 'style', 'head', with_tail=False)
+    for hidden in root.xpath(_HIDDEN_XPATH):
+        hidden.drop_tree()
+
+    # Tablas: celdas leídas del árbol y un marcador en su lugar
+    table_rows: List[List[List[str]]] = []
+    for table in list(root.iter('table')):
+        if table.getparent() is None or any(ancestor.tag == 'table' for ancestor in table.iterancestors()):
+            continue
+        rows = [[_cell_text(cell) for cell in row.iter('td', 'th')] for row in table.iter('tr')]
+        marker = etree.Element('pre')
+        marker.text = '\n' + _TABLE_MARK.format(len(table_rows))
+        marker.tail = table.tail
+        table.getparent().replace(table, marker)
+        table_rows.append(rows)
+
+    # Un bloque por línea: salto de línea tras cada elemento de bloque
+    for element in root.iter(*BLOCK_TAGS):
+        element.tail = '\n' + (element.tail or '')
+    raw = etree.tostring(root, method='text', encoding='unicode')
+    del root
+
+    lines = (' '.join(line.split()) for line in raw.split('\n'))
+    text = '\n'.join(line for line in lines if line)
+
+    # Tablas tipadas (con el texto previo como contexto) y su texto en el sitio del marcador
+    tables: List[FinancialTable] = []
+
+    def render(match: re.Match) -> str:
+        number = int(match.group(1))
+        rows = table_rows[number]
+        parsed = parse_table(rows, context=text[max(0, match.start() - TABLE_CONTEXT_CHARS):match.start()])
+        if parsed is not None:
+            tables.append(parsed)
+        body = "\n".join(" | ".join(cell for cell in row if cell) for row in rows if any(row))
+        return f"--- Table {number + 1} ---\n{body}" if body else ""
+
+    text = _TABLE_MARK_RE.sub(render, text)
+    return ParsedFiling(text=text, headings=find_headings(text), tables=tables, num_tables=len(table_rows))
@@ -0,0 +1,225 @@
+"""
+📑 SECCIONES DE UN 10-K (ITEMS)
+Detecta los encabezados "Item 1A. Risk Factors", "Item 7. Management's
+Discussion..." en el flujo de páginas y trocea dentro de cada Item, de
+modo que cada chunk lleva su sección y su posición en ella.
+
+- Los encabezados del índice (table of contents) se descartan: líneas
+  que acaban en número de página o rachas de encabezados casi sin texto
+  entre ellos
+- También las remisiones que el PDF parte al inicio de línea ("Item 1A,
+  Risk Factors, of this report..."): tras el número hace falta un
+  separador, el fin de línea o el título del Item (ITEM_TITLE_WORDS)
+- Funciona en streaming: una página cada vez
+- SECTION_ITEMS traduce las secciones de SECTION_QUERIES a Items, para
+  responderlas con una consulta de metadata en vez de una búsqueda vectorial
+- Muchos emisores dejan el Item 8 como remisión al Item 15 ("included in
+  Part IV, Item 15(a)(1)"): los estados financieros se buscan en ambos, y
+  unos Items que solo contienen una remisión no cuentan como encontrados
+"""
+
+import re
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .chunking import Chunk, PageText, StreamingChunker
+
+# Items de un 10-K (Regulation S-K) en orden
+FILING_ITEMS = [
+    '1', '1A', '1B', '1C', '2', '3', '4', '5', '6', '7', '7A', '8', '9', '9A', '9B', '9C',
+    '10', '11', '12', '13', '14', '15', '16'
+]
+
+# Items con nombre de sección propio
+TRACKED_ITEMS = {
+    '1': 'business',
+    '1A': 'risks',
+    '7': 'mda',
+    '7A': 'market_risk',
+    '8': 'financials',
+}
+
+# Sección pedida (claves de SECTION_QUERIES) -> (Items donde está, ordenar por similitud)
+# Sin ranking se devuelve el Item en orden de documento
+SECTION_ITEMS: Dict[str, Tuple[Tuple[str, ...], bool]] = {
+    'business': (('1',), False),
+    'risks': (('1A',), False),
+    'mda': (('7',), False),
+    'market_risk': (('7A',), False),
+    'financials': (('8', '15'), False),
+    'guidance': (('7',), True),
+    'balance': (('8', '15'), True),
+    'income': (('8', '15'), True),
+    'cashflow': (('8', '15'), True),
+    'segments': (('8', '15'), True),
+    'debt': (('8', '15', '7A'), True),
+    'rnd': (('1', '7'), True),
+}
+
+# Items que entre todos tienen menos texto son una remisión a otra parte
+# del filing (el Item 8 de PYPL ocupa 317 caracteres), no la sección
+CROSS_REFERENCE_CHARS = 1000
+
+_HEADING_RE = re.compile(
+    r'^[ \t\xa0]*item[ \t\xa0]+(\d{1,2}[a-c]?)\b[ \t\xa0]*([.:\-–—])?[ \t\xa0]*(.{0,120}?)[ \t\xa0]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+# Primera palabra del título de cada Item (10-K y 10-Q): un encabezado sin
+# separador tras el número ("ITEM 7A QUANTITATIVE...") solo cuenta si el
+# título empieza como el del Item
+ITEM_TITLE_WORDS: Dict[str, Tuple[str, ...]] = {
+    '1': ('business', 'financial', 'legal'),
+    '1A': ('risk',),
+    '1B': ('unresolved',),
+    '1C': ('cybersecurity',),
+    '2': ('properties', 'management', 'unregistered'),
+    '3': ('legal', 'quantitative', 'defaults'),
+    '4': ('mine', 'submission', 'controls', 'removed', 'reserved', '[reserved]'),
+    '5': ('market', 'other'),
+    '6': ('selected', 'reserved', '[reserved]', 'exhibits'),
+    '7': ('management',),
+    '7A': ('quantitative',),
+    '8': ('financial',),
+    '9': ('changes',),
+    '9A': ('controls',),
+    '9B': ('other',),
+    '9C': ('disclosure',),
+    '10': ('directors',),
+    '11': ('executive',),
+    '12': ('security',),
+    '13': ('certain',),
+    '14': ('principal',),
+    '15': ('exhibits',),
+    '16': ('form',),
+}
+_FIRST_WORD_RE = re.compile(r"[\[\]\w]+")
+# Línea de índice: "Risk Factors ........ 12" o "Risk Factors 12"
+_TOC_LINE_RE = re.compile(r'(?:\.{3,}|[ \t\xa0])\d{1,3}$')
+# Rachas de TOC_RUN encabezados separados por menos de TOC_GAP caracteres:
+# entradas del índice (en el cuerpo, como mucho dos o tres Items seguidos son
+# de una línea, p.ej. "Item 4. Mine Safety Disclosures - Not applicable")
+TOC_GAP = 120
+TOC_RUN = 4
+
+_VALID_ITEMS = set(FILING_ITEMS)
+
+
+def is_cross_reference(texts: Iterable[str]) -> bool:
+    """True si el texto de unos Items es solo una remisión (ver CROSS_REFERENCE_CHARS)."""
+    return sum(len(text.strip()) for text in texts) < CROSS_REFERENCE_CHARS
+
+
+@dataclass
+class SectionSpan:
+    """Dónde está un Item en el documento."""
+    item: str
+    title: str
+    page_start: int
+    page_end: int
+    chunks: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'item': self.item,
+            'section': TRACKED_ITEMS.get(self.item),
+            'title': self.title,
+            'pages': [self.page_start, self.page_end],
+            'chunks': self.chunks,
+        }
+
+
+def _is_heading(item: str, separator: Optional[str], title: str) -> bool:
+    """
+    Encabezado real: separador (".", ":" o guion) o fin de línea tras el
+    número, o un título que empieza como el del Item. Las remisiones partidas
+    por el salto de línea del PDF ("Item 1A, Risk Factors, of this report",
+    "Item 15(a)(1) of this Form 10-K") no lo son.
+    """
+    if item not in _VALID_ITEMS:
+        return False
+    if not title:
+        return True
+    if title[0] in ',;(' or title[0].islower():
+        return False
+    if separator:
+        return True
+    word = _FIRST_WORD_RE.match(title)
+    return word is not None and word.group(0).lower().startswith(ITEM_TITLE_WORDS.get(item, ()))
+
+
+def find_headings(text: str) -> List[Tuple[int, str, str]]:
+    """(offset, item, título) de los encabezados de Item reales de un texto."""
+    matches = [
+        m for m in _HEADING_RE.finditer(text)
+        if _is_heading(m.group(1).upper(), m.group(2), m.group(3))
+    ]
+
+    # Entradas con número de página y rachas de encabezados pegados
+    toc = {position for position, m in enumerate(matches) if _TOC_LINE_RE.search(m.group(3).strip())}
+    run = [0] if matches else []
+    for position in range(1, len(matches) + 1):
+        if position < len(matches) and matches[position].start() - matches[position - 1].end() < TOC_GAP:
+            run.append(position)
+            continue
+        # El último de la racha puede ser el primer encabezado real tras el índice
+        if len(run) >= TOC_RUN:
+            toc.update(run[:-1])
+        run = [position]
+
+    return [
+        (match.start(), match.group(1).upper(), match.group(3).strip())
+        for position, match in enumerate(matches) if position not in toc
+    ]
+
+
+@dataclass
+class SectionTracker:
+    """Sigue el Item en curso a lo largo del flujo de páginas."""
+    item: Optional[str] = None
+    spans: Dict[str, SectionSpan] = field(default_factory=dict)
+
+    def split(self, page: PageText) -> List[Tuple[Optional[str], PageText]]:
+        """Trozos de la página con el Item al que pertenecen."""
+        segments = []
+        position = 0
+        for offset, item, title in find_headings(page.text):
+            if page.text[position:offset].strip():
+                segments.append((self.item, PageText(page.page_number, page.text[position:offset])))
+            self.item = item
+            position = offset
+            # Un Item repetido (encabezado de página) no reinicia su tramo
+            if item not in self.spans:
+                self.spans[item] = SectionSpan(item, title, page.page_number, page.page_number)
+        if page.text[position:].strip():
+            segments.append((self.item, PageText(page.page_number, page.text[position:])))
+        for item, _ in segments:
+            if item is not None:
+                self.spans[item].page_end = page.page_number
+        return segments
+
+    def segments(self, pages: Iterable[PageText]) -> Iterator[Tuple[Optional[str], PageText]]:
+        for page in pages:
+            yield from self.split(page)
+
+
+def iter_section_chunks(pages: Iterable[PageText], chunker: StreamingChunker,
+                        tracker: Optional[SectionTracker] = None) -> Iterator[Chunk]:
+    """
+    Chunks que nunca cruzan un Item: índice global, `section` = Item (None
+    antes del primero) y `section_position` = posición dentro del Item.
+    """
+    tracker = tracker or SectionTracker()
+    index = 0
+    positions: Dict[Optional[str], int] = {}
+    for item, group in groupby(tracker.segments(pages), key=lambda segment: segment[0]):
+        for chunk in chunker.chunks(page for _, page in group):
+            # Un Item puede reaparecer (encabezados repetidos): la posición sigue
+            chunk.section_position = positions.get(item, 0)
+            positions[item] = chunk.section_position + 1
+            chunk.section = item
+            chunk.index = index
+            index += 1
+            if item is not None:
+                tracker.spans[item].chunks += 1
+            yield chunk
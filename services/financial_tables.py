@@ -0,0 +1,506 @@
+"""
+📊 TABLAS FINANCIERAS TIPADAS
+Las tablas de los estados financieros (balance, resultados, flujos de caja)
+se convierten en cifras tipadas en vez de texto "a | b | c" para embeber:
+
+- Celdas normalizadas: "$ 1,234" -> 1234, "(567)" -> -567, "—" -> 0, "12.5%"
+- Escala y unidad detectadas ("in millions, except per share data")
+- Periodos como columnas (año fiscal o fecha de cierre y duración)
+- Almacén long-format en SQLite (una fila por línea y periodo, particionado
+  por filing): "Total revenue" de 2023 es una consulta, sin búsqueda
+  vectorial ni LLM
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    doc_id TEXT NOT NULL,
+    table_id INTEGER NOT NULL,
+    ticker TEXT,
+    page INTEGER,
+    title TEXT,
+    scale INTEGER,
+    currency TEXT,
+    periods TEXT,
+    stored_at TEXT,
+    PRIMARY KEY (doc_id, table_id)
+);
+CREATE INDEX IF NOT EXISTS idx_tables_ticker ON tables(ticker);
+CREATE TABLE IF NOT EXISTS facts (
+    doc_id TEXT NOT NULL,
+    table_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    line_item TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    parent TEXT,
+    period TEXT NOT NULL,
+    duration TEXT,
+    reported REAL NOT NULL,
+    scale INTEGER NOT NULL,
+    value REAL NOT NULL,
+    unit TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_facts_item_period ON facts(item_key, period);
+CREATE INDEX IF NOT EXISTS idx_facts_doc_item ON facts(doc_id, item_key);
+"""
+
+# Escala declarada en el encabezado del estado financiero
+_SCALE_RE = re.compile(
+    r'\b(?:in|amounts\s+in|dollars\s+in|expressed\s+in)\s+(?:u\.?s\.?\s+)?(?:\$\s*)?'
+    r'(thousands|millions|billions)\b',
+    re.IGNORECASE
+)
+SCALES = {'thousands': 1_000, 'millions': 1_000_000, 'billions': 1_000_000_000}
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+# "December 31, 2023", "Sept. 30, 2023", "2023" (y "December 31," sin año en otra fila)
+_PERIOD_RE = re.compile(
+    r'(?:\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2}),?\s*)?\b((?:19|20)\d{2})\b',
+    re.IGNORECASE
+)
+_MONTH_DAY_RE = re.compile(r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})\b', re.IGNORECASE)
+_DURATION_RE = re.compile(
+    r'\b(three|six|nine|twelve)\s+months\s+ended|\b((?:fiscal\s+)?years?)\s+ended',
+    re.IGNORECASE
+)
+_DURATIONS = {'three': '3M', 'six': '6M', 'nine': '9M', 'twelve': '12M'}
+
+# Una cifra de celda: "$ (1,234.5)", "-12", "12.5 %", o un guion (cero/nil en los filings)
+_VALUE_RE = re.compile(
+    r'(\()?\s*\$?\s*([-−])?\s*(\d[\d,]*(?:\.\d+)?)\s*(%)?\s*(\))?|(?<![\w.])[—–-]{1,2}(?![\w.])'
+)
+_YEAR_RE = re.compile(r'(?<![\d,.$(])(?:19|20)\d{2}(?![\d,.%)])')
+_LETTERS_RE = re.compile(r'[A-Za-z]')
+_FOOTNOTE_RE = re.compile(r'\(\s*\d{1,2}\s*\)|\*+')
+_STATEMENT_TITLE_RE = re.compile(
+    r"consolidated\s+(?:balance\s+sheets?|statements?\s+of\s+[a-z'’ ]+?)(?=\s*[\n(]|$)|"
+    r"balance\s+sheets?|statements?\s+of\s+(?:operations|income|cash\s+flows?)",
+    re.IGNORECASE
+)
+_PER_SHARE_RE = re.compile(r'per\s+(?:common\s+|basic\s+|diluted\s+)?share|per\s+unit|\bEPS\b', re.IGNORECASE)
+_SHARES_RE = re.compile(r'\bshares\b', re.IGNORECASE)
+
+# Filas de cabecera que se examinan como mucho antes de la primera fila de datos
+MAX_HEADER_ROWS = 6
+# Por debajo de estas filas con cifras no se considera tabla financiera
+MIN_DATA_ROWS = 2
+
+Row = Sequence[Optional[str]]
+
+
+def parse_value(text: str) -> Optional[Tuple[float, bool]]:
+    """
+    Cifra de una celda: (valor, es_porcentaje). None si no es numérica.
+    Paréntesis o signo menos = negativo; un guion solo = 0.
+    """
+    text = (text or '').replace('\xa0', ' ').strip()
+    if not text or _LETTERS_RE.search(text):
+        return None
+    values = _values(text)
+    return values[0] if len(values) == 1 else None
+
+
+def _values(text: str) -> List[Tuple[float, bool]]:
+    values = []
+    for match in _VALUE_RE.finditer(text):
+        if match.group(3) is None:
+            values.append((0.0, False))
+            continue
+        number = float(match.group(3).replace(',', ''))
+        if match.group(1) or match.group(2) or match.group(5):
+            number = -number
+        values.append((number, bool(match.group(4))))
+    return values
+
+
+def normalize_item(label: str) -> str:
+    """Clave de búsqueda de una línea: minúsculas, sin notas ni puntuación."""
+    label = _FOOTNOTE_RE.sub(' ', label.lower())
+    return ' '.join(re.sub(r'[^a-z0-9&]+', ' ', label).split())
+
+
+def detect_scale(context: str) -> int:
+    """
+    Multiplicador declarado ("in millions" -> 1e6); 1 si no se declara.
+    Con varias declaraciones manda la última (la más cercana a la tabla).
+    """
+    matches = _SCALE_RE.findall(context or '')
+    return SCALES[matches[-1].lower()] if matches else 1
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+
+@dataclass
+class Period:
+    """Columna de una tabla: fecha de cierre (o año fiscal) y duración."""
+    label: str
+    duration: Optional[str] = None
+
+    @property
+    def column(self) -> str:
+        return f"{self.label} ({self.duration})" if self.duration else self.label
+
+
+@dataclass
+class TableRow:
+    label: str
+    values: List[float]
+    unit: Optional[str]
+    parent: Optional[str] = None
+
+
+@dataclass
+class FinancialTable:
+    """Tabla de un estado financiero con cifras tipadas (tal como se publican)."""
+    periods: List[Period]
+    rows: List[TableRow]
+    scale: int = 1
+    currency: Optional[str] = None
+    title: Optional[str] = None
+    page: Optional[int] = None
+
+    def row_scale(self, row: TableRow) -> int:
+        """Escala de una fila: los porcentajes y el dato por acción no se escalan."""
+        if row.unit == '%' or (row.unit and row.unit.endswith('/share')):
+            return 1
+        return self.scale
+
+    def to_frame(self, normalized: bool = True) -> pd.DataFrame:
+        """Líneas como índice, periodos como columnas (valores ya escalados)."""
+        data = [
+            [value * (self.row_scale(row) if normalized else 1) for value in row.values]
+            for row in self.rows
+        ]
+        return pd.DataFrame(
+            data,
+            index=pd.Index([row.label for row in self.rows], name='line_item'),
+            columns=[period.column for period in self.periods]
+        )
+
+
+def _cells(row: Row) -> List[str]:
+    return [' '.join(str(cell).replace('\xa0', ' ').split()) if cell else '' for cell in row]
+
+
+def _split_row(cells: List[str]) -> Tuple[str, str]:
+    """Etiqueta (primera celda con texto) y texto de las celdas de valor."""
+    label_cells = [i for i, cell in enumerate(cells) if _LETTERS_RE.search(cell)]
+    label = cells[label_cells[0]] if label_cells else ''
+    # Celdas de valor contiguas se unen: SEC parte "(1,234" y ")" o "$" y "5"
+    return label, ' '.join(cell for cell in cells if not _LETTERS_RE.search(cell))
+
+
+def _header_periods(header_rows: List[List[str]]) -> List[Period]:
+    """Periodos de las filas de cabecera (la que más tenga), con mes/día y duración de las demás."""
+    best: List[re.Match] = []
+    month_day = None
+    durations: List[str] = []
+    for cells in header_rows:
+        text = ' '.join(cells)
+        matches = list(_PERIOD_RE.finditer(text))
+        if len(matches) > len(best):
+            best = matches
+        if not matches and month_day is None:
+            found = _MONTH_DAY_RE.search(text)
+            month_day = (found.group(1), found.group(2)) if found else None
+        for match in _DURATION_RE.finditer(text):
+            durations.append(_DURATIONS[match.group(1).lower()] if match.group(1) else '12M')
+    periods = []
+    for match in best:
+        month, day = (match.group(1), match.group(2)) if match.group(1) else (month_day or (None, None))
+        year = int(match.group(3))
+        if month:
+            try:
+                label = datetime(year, _MONTHS[month[:3].lower()], int(day)).date().isoformat()
+            except ValueError:
+                label = str(year)
+        else:
+            label = str(year)
+        periods.append(Period(label))
+    # "Three Months Ended | Nine Months Ended" sobre cuatro fechas: dos por duración
+    if durations and periods and len(periods) % len(durations) == 0:
+        group = len(periods) // len(durations)
+        for position, period in enumerate(periods):
+            period.duration = durations[position // group]
+    return periods
+
+
+def _is_header(values: List[Tuple[float, bool]], value_text: str) -> bool:
+    """Fila sin cifras o cuyas únicas cifras son años ("2023 | 2022")."""
+    return not values or len(_YEAR_RE.findall(value_text)) == len(values)
+
+
+def _share_unit(text: Optional[str]) -> Optional[str]:
+    """
+    'shares' (número de acciones), 'per_share' (importe por acción) o None.
+    "Shares used in computing net income per share" es un número de acciones.
+    """
+    if not text:
+        return None
+    if _SHARES_RE.search(text):
+        return 'shares'
+    if _PER_SHARE_RE.search(text):
+        return 'per_share'
+    return None
+
+
+def parse_table(rows: Iterable[Row], context: str = '', page: Optional[int] = None) -> Optional[FinancialTable]:
+    """
+    Tabla de estado financiero tipada a partir de sus filas de celdas.
+
+    Args:
+        rows: Celdas por fila (pdfplumber.extract_tables o <tr> de un HTML)
+        context: Texto alrededor de la tabla (título, "in millions...")
+        page: Página de origen (para citar)
+
+    Returns:
+        None si no tiene periodos en la cabecera o cifras alineadas con ellos
+    """
+    rows = [_cells(row) for row in rows if row]
+    rows = [cells for cells in rows if any(cells)]
+    header_rows: List[List[str]] = []
+    body_start = len(rows)
+    for position, cells in enumerate(rows[:MAX_HEADER_ROWS + 1]):
+        _, value_text = _split_row(cells)
+        if not _is_header(_values(value_text), value_text):
+            body_start = position
+            break
+        header_rows.append(cells)
+    periods = _header_periods(header_rows)
+    if not periods:
+        return None
+
+    table_text = ' '.join(' '.join(cells) for cells in header_rows)
+    scope = f"{table_text} {context}"
+    dollars = '$' in scope or any('$' in cell for cells in rows for cell in cells)
+    table = FinancialTable(
+        periods=periods,
+        rows=[],
+        scale=detect_scale(table_text) if _SCALE_RE.search(table_text) else detect_scale(context),
+        currency='USD' if dollars or re.search(r'\bdollars?\b', scope, re.IGNORECASE) else None,
+        page=page
+    )
+    titles = _STATEMENT_TITLE_RE.findall(table_text) or _STATEMENT_TITLE_RE.findall(context or '')
+    table.title = ' '.join(titles[-1].split()) if titles else None
+
+    # "Current assets:" justo antes de la primera fila de datos
+    parent = None
+    if header_rows:
+        last = ' '.join(header_rows[-1])
+        if _LETTERS_RE.search(last) and not (_PERIOD_RE.search(last) or _MONTH_DAY_RE.search(last)
+                                             or _DURATION_RE.search(last) or _SCALE_RE.search(last)):
+            parent = last.rstrip(':').strip()
+    for cells in rows[body_start:]:
+        label, value_text = _split_row(cells)
+        values = _values(value_text)
+        if not label:
+            continue
+        if not values:
+            # "Current assets:" agrupa las líneas siguientes
+            parent = label.rstrip(':').strip()
+            continue
+        if len(values) != len(periods):
+            # Celdas vacías o columnas de subtotal: sin alineación fiable
+            continue
+        # "Basic"/"Diluted" bajo "Net income per share:" heredan la unidad del padre
+        share_unit = _share_unit(label) or _share_unit(parent) or _share_unit(table.title)
+        if all(is_percent for _, is_percent in values):
+            unit = '%'
+        elif share_unit == 'per_share':
+            unit = f"{table.currency or 'USD'}/share"
+        elif share_unit == 'shares':
+            unit = 'shares'
+        else:
+            unit = table.currency
+        table.rows.append(TableRow(label, [value for value, _ in values], unit, parent))
+        if label.lower().startswith('total'):
+            parent = None
+
+    if len(table.rows) < MIN_DATA_ROWS:
+        return None
+    return table
+
+
+# ============================================================================
+# ALMACÉN
+# ============================================================================
+
+class FinancialTableStore:
+    """
+    Cifras de las tablas financieras de cada filing en formato largo
+    (doc_id, línea, periodo, valor). Compartido por todas las sesiones del
+    proceso (get_table_store).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def replace(self, doc_id: str, tables: List[FinancialTable], ticker: Optional[str] = None) -> int:
+        """Sustituye las tablas de un filing. Devuelve las cifras guardadas."""
+        now = datetime.now().isoformat()
+        ticker = ticker.upper() if ticker else None
+        table_rows = []
+        fact_rows = []
+        for table_id, table in enumerate(tables):
+            table_rows.append((
+                doc_id, table_id, ticker, table.page, table.title, table.scale, table.currency,
+                json.dumps([[period.label, period.duration] for period in table.periods]), now
+            ))
+            for row_number, row in enumerate(table.rows):
+                scale = table.row_scale(row)
+                key = normalize_item(row.label)
+                for period, value in zip(table.periods, row.values):
+                    fact_rows.append((
+                        doc_id, table_id, row_number, row.label, key, row.parent,
+                        period.label, period.duration, value, scale, value * scale, row.unit
+                    ))
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM tables WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM facts WHERE doc_id = ?", (doc_id,))
+            conn.executemany("INSERT INTO tables VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", table_rows)
+            conn.executemany("INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", fact_rows)
+        return len(fact_rows)
+
+    def remove(self, doc_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM tables WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM facts WHERE doc_id = ?", (doc_id,))
+
+    def tables(self, doc_id: str) -> List[Dict[str, Any]]:
+        """Tablas de un filing (título, página, escala, periodos)."""
+        result = []
+        for row in self._connect().execute(
+            "SELECT table_id, page, title, scale, currency, periods FROM tables WHERE doc_id = ? ORDER BY table_id",
+            (doc_id,)
+        ):
+            table = dict(row)
+            table['periods'] = [Period(label, duration).column for label, duration in json.loads(table['periods'])]
+            result.append(table)
+        return result
+
+    def query(self, line_item: str, period: Optional[str] = None,
+              doc_id: Optional[str] = None, ticker: Optional[str] = None,
+              exact: bool = False) -> pd.DataFrame:
+        """
+        Cifras de una línea (p.ej. "total revenue") en formato largo.
+
+        Args:
+            line_item: Nombre de la línea; se compara normalizado. Sin
+                coincidencia exacta (y exact=False) se buscan las que lo contienen
+            period: Año fiscal ("2023") o fecha de cierre ("2023-12-31");
+                un año también selecciona las fechas de ese año
+            doc_id / ticker: Filing concreto o todos los de un ticker
+        """
+        key = normalize_item(line_item)
+        where = []
+        params: List[Any] = []
+        if doc_id:
+            where.append("f.doc_id = ?")
+            params.append(doc_id)
+        if ticker:
+            where.append("t.ticker = ?")
+            params.append(ticker.upper())
+        if period:
+            if len(period) == 4:
+                where.append("(f.period = ? OR f.period LIKE ?)")
+                params.extend([period, f"{period}-%"])
+            else:
+                where.append("f.period = ?")
+                params.append(period)
+        sql = (
+            "SELECT f.doc_id, t.ticker, f.table_id, t.title, t.page, f.line_item, f.parent, "
+            "f.period, f.duration, f.reported, f.scale, f.value, f.unit "
+            "FROM facts f JOIN tables t ON t.doc_id = f.doc_id AND t.table_id = f.table_id "
+            "WHERE f.item_key {} ?" + "".join(f" AND {clause}" for clause in where) +
+            " ORDER BY f.doc_id, f.table_id, f.row, f.period DESC"
+        )
+        conn = self._connect()
+        rows = conn.execute(sql.format('='), [key] + params).fetchall()
+        if not rows and not exact:
+            rows = conn.execute(sql.format('LIKE'), [f"%{key}%"] + params).fetchall()
+        columns = [
+            'doc_id', 'ticker', 'table_id', 'title', 'page', 'line_item', 'parent',
+            'period', 'duration', 'reported', 'scale', 'value', 'unit'
+        ]
+        return pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+    def value(self, doc_id: str, line_item: str, period: str,
+              duration: Optional[str] = None) -> Optional[float]:
+        """Cifra exacta (ya escalada) de una línea y periodo; None si no está o es ambigua."""
+        facts = self.query(line_item, period, doc_id=doc_id)
+        if duration is not None:
+            facts = facts[facts['duration'] == duration]
+        values = set(facts['value'])
+        if len(values) != 1:
+            return None
+        return values.pop()
+
+    def frame(self, doc_id: str, table_id: int) -> pd.DataFrame:
+        """Tabla en formato ancho: líneas x periodos (valores escalados)."""
+        facts = pd.read_sql_query(
+            "SELECT row, line_item, period, duration, value FROM facts WHERE doc_id = ? AND table_id = ?",
+            self._connect(), params=(doc_id, table_id)
+        )
+        if facts.empty:
+            return pd.DataFrame()
+        facts['column'] = [
+            Period(period, duration).column for period, duration in zip(facts['period'], facts['duration'])
+        ]
+        wide = facts.pivot(index='row', columns='column', values='value')
+        wide = wide[list(dict.fromkeys(facts['column']))]
+        wide.index = pd.Index(facts.drop_duplicates('row').set_index('row')['line_item'].loc[wide.index], name='line_item')
+        wide.columns.name = None
+        return wide
+
+
+# ============================================================================
+# ALMACÉN POR PROCESO
+# ============================================================================
+
+_STORES: Dict[str, FinancialTableStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_table_store(root: str) -> FinancialTableStore:
+    """FinancialTableStore de <root>/tables.sqlite compartido por el proceso."""
+    key = os.path.realpath(root)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = FinancialTableStore(os.path.join(key, 'tables.sqlite'))
+        return store
@@ -0,0 +1,237 @@
+"""
+🔀 BÚSQUEDA HÍBRIDA - BM25 + Vectorial con Reciprocal Rank Fusion
+La búsqueda semántica falla con términos exactos ("goodwill impairment",
+"Item 1A", tickers, cifras); la léxica falla con paráfrasis. Se ejecutan
+ambas en paralelo y se combinan por rango (RRF), con pesos por consulta.
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .vector_store import VectorIndex, SearchHit, embed_texts
+
+logger = logging.getLogger(__name__)
+
+# Constante estándar de RRF (Cormack et al.): amortigua el peso del rango 1
+RRF_K = 60
+
+# Pool compartido: embedding+FAISS en un hilo, BM25 (SQLite) en otro
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hybrid-search')
+
+# Señales de consulta "exacta": frases entre comillas, cifras, Items de 10-K, tickers
+_EXACT_PATTERNS = [
+    re.compile(r'"[^"]+"'),
+    re.compile(r'\d'),
+    re.compile(r'\bitem\s+\d+[a-c]?\b', re.IGNORECASE),
+    re.compile(r'\b[A-Z]{2,5}\b'),
+]
+
+
+@dataclass
+class HybridWeights:
+    """Peso de cada ranking en la fusión."""
+    vector: float = 1.0
+    lexical: float = 1.0
+
+
+def weights_for_query(query: str) -> HybridWeights:
+    """
+    Pesos por defecto según la forma de la consulta.
+
+    - Consultas con términos exactos o muy cortas → más peso léxico
+    - Preguntas largas en lenguaje natural → más peso semántico
+    """
+    exact_signals = sum(1 for pattern in _EXACT_PATTERNS if pattern.search(query))
+    num_words = len(query.split())
+
+    lexical = 0.6 + 0.4 * exact_signals
+    if num_words <= 3:
+        lexical += 0.3
+    elif num_words > 12:
+        lexical -= 0.2
+
+    return HybridWeights(vector=1.0, lexical=round(max(lexical, 0.2), 2))
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[int]],
+    weights: Dict[str, float],
+    k: int = RRF_K
+) -> List[Tuple[int, float]]:
+    """
+    Combina rankings: score(d) = Σ w_r / (k + rango_r(d)).
+
+    Returns:
+        Lista de (vector_id, score) ordenada de mayor a menor
+    """
+    scores: Dict[int, float] = {}
+    for name, ranking in rankings.items():
+        weight = weights.get(name, 1.0)
+        if weight <= 0:
+            continue
+        for rank, vector_id in enumerate(ranking, start=1):
+            scores[vector_id] = scores.get(vector_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def mmr_select(
+    candidate_vectors: np.ndarray,
+    relevance: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.7
+) -> List[int]:
+    """
+    Maximal Marginal Relevance vectorizado sobre los candidatos.
+
+    score(d) = λ·relevancia(d) − (1−λ)·max_{s∈seleccionados} cos(d, s)
+
+    Args:
+        candidate_vectors: Matriz (n, d) normalizada de los candidatos
+        relevance: Relevancia de cada candidato (se reescala a [0, 1])
+        k: Número de candidatos a elegir
+        lambda_mult: 1.0 = solo relevancia, 0.0 = solo diversidad
+
+    Returns:
+        Posiciones de los candidatos elegidos, en orden de selección
+    """
+    n = len(candidate_vectors)
+    if n == 0:
+        return []
+    k = min(k, n)
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+
+    similarity = candidate_vectors @ candidate_vectors.T
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    selected: List[int] = []
+    for step in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity if step else relevance.copy()
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+    return selected
+
+
+def hybrid_search(
+    index: VectorIndex,
+    embeddings,
+    query: str,
+    k: int,
+    weights: Optional[HybridWeights] = None,
+    fetch_k: Optional[int] = None,
+    query_vector: Optional[np.ndarray] = None
+) -> List[SearchHit]:
+    """
+    Búsqueda híbrida sobre una generación del índice.
+
+    Args:
+        index: Generación activa
+        embeddings: Proveedor de embeddings de la consulta
+        query: Consulta de texto
+        k: Número de resultados que usará el llamador
+        weights: Pesos vector/léxico (por defecto, weights_for_query)
+        fetch_k: Candidatos por ranking antes de fusionar
+        query_vector: Embedding ya calculado (evita recalcularlo)
+
+    Returns:
+        Candidatos fusionados (hasta fetch_k, para poder filtrar después),
+        como SearchHit sin texto y con score = score RRF
+    """
+    return hybrid_search_batch(
+        index, embeddings, [query], [k],
+        weights=[weights] if weights is not None else None,
+        fetch_k=fetch_k,
+        query_vectors=query_vector
+    )[0]
+
+
+def hybrid_search_batch(
+    index: VectorIndex,
+    embeddings,
+    queries: List[str],
+    ks: List[int],
+    weights: Optional[List[Optional[HybridWeights]]] = None,
+    fetch_k: Optional[int] = None,
+    query_vectors: Optional[np.ndarray] = None
+) -> List[List[SearchHit]]:
+    """
+    Búsqueda híbrida de N consultas en una sola pasada: un lote de
+    embeddings, una búsqueda FAISS matricial y las N búsquedas BM25 en
+    paralelo mientras tanto.
+
+    Args:
+        queries: Consultas de texto
+        ks: Resultados que usará el llamador para cada consulta
+        weights: Pesos por consulta (None = weights_for_query)
+        fetch_k: Candidatos por ranking (por defecto, según el mayor k)
+        query_vectors: Matriz (N, d) de embeddings ya calculados
+
+    Returns:
+        Una lista de candidatos fusionados por consulta (ver hybrid_search)
+    """
+    if not queries:
+        return []
+    weights = [w or weights_for_query(q) for w, q in zip(weights or [None] * len(queries), queries)]
+    fetch_k = fetch_k or max(max(ks) * 4, 20)
+
+    def _lexical_ranking(query: str, w: HybridWeights) -> List[Tuple[int, float]]:
+        if w.lexical <= 0:
+            return []
+        return index.docstore.lexical_search(query, fetch_k, below=index.ntotal)
+
+    lexical_futures = [_EXECUTOR.submit(_lexical_ranking, q, w) for q, w in zip(queries, weights)]
+
+    # Vectorial: solo las consultas con peso > 0, en un único lote
+    vector_positions = [i for i, w in enumerate(weights) if w.vector > 0]
+    vector_hits: List[List[SearchHit]] = [[] for _ in queries]
+    if vector_positions:
+        if query_vectors is None:
+            matrix = embed_texts(embeddings, [queries[i] for i in vector_positions])
+        else:
+            matrix = np.asarray(query_vectors, dtype=np.float32).reshape(len(queries), -1)[vector_positions]
+        for position, hits in zip(vector_positions, index.search(matrix, fetch_k)):
+            vector_hits[position] = hits
+
+    lexical_hits = []
+    for future in lexical_futures:
+        try:
+            lexical_hits.append(future.result())
+        except Exception as e:
+            logger.warning(f"Búsqueda léxica fallida, solo vectorial: {e}")
+            lexical_hits.append([])
+
+    fused_all = [
+        reciprocal_rank_fusion(
+            {
+                'vector': [hit.vector_id for hit in vector_hits[i]],
+                'lexical': [vector_id for vector_id, _ in lexical_hits[i]],
+            },
+            {'vector': weights[i].vector, 'lexical': weights[i].lexical}
+        )[:fetch_k]
+        for i in range(len(queries))
+    ]
+
+    # Metadata de los candidatos solo léxicos, en una consulta para todo el lote
+    known = {hit.vector_id: hit.metadata for hits in vector_hits for hit in hits}
+    missing = sorted({vector_id for fused in fused_all for vector_id, _ in fused if vector_id not in known})
+    if missing:
+        known.update(index.docstore.get_metadata(missing))
+
+    return [
+        [
+            SearchHit(vector_id=vector_id, score=score, metadata=known.get(vector_id, {}))
+            for vector_id, score in fused
+        ]
+        for fused in fused_all
+    ]
@@ -0,0 +1,165 @@
+"""
+📒 DIARIO DE INDEXACIÓN - Ejecuciones reanudables
+Registra el estado de cada archivo de una indexación por lotes para que
+una ejecución interrumpida (error de API, desconexión de Colab) retome
+desde el último checkpoint en lugar de empezar de cero.
+
+Estados:
+- embedded:  vectores añadidos al escritor, aún no publicados
+- done:      publicados en una generación (checkpoint confirmado)
+- failed:    extracción/embedding fallido (se reintenta en la siguiente ejecución)
+
+Un archivo 'done' cuyo hash de contenido no ha cambiado se omite.
+"""
+
+import os
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filename TEXT PRIMARY KEY,
+    path TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    mtime REAL,
+    status TEXT NOT NULL,
+    num_chunks INTEGER DEFAULT 0,
+    generation TEXT,
+    error TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_status ON files(status);
+"""
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    """Hash SHA-256 del contenido, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexJournal:
+    """
+    Diario SQLite de una biblioteca (un archivo por biblioteca).
+
+    Cada cambio de estado se confirma al momento: el diario refleja
+    exactamente lo que sobrevivió a una interrupción.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+        # Una ejecución que murió antes del checkpoint deja archivos 'embedded'
+        # cuyos vectores nunca se publicaron: vuelven a estar pendientes
+        with self._conn:
+            lost = self._conn.execute(
+                "UPDATE files SET status = 'failed', error = 'interrumpido antes del checkpoint' "
+                "WHERE status = 'embedded'"
+            ).rowcount
+        if lost:
+            logger.info(f"Diario: {lost} archivos sin checkpoint se reindexarán")
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT * FROM files WHERE filename = ?", (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def content_hash(self, filename: str, path: str) -> str:
+        """
+        Hash del archivo. Si tamaño y mtime coinciden con lo registrado se
+        reutiliza el hash guardado (evita releer GBs de PDFs en cada ejecución).
+        """
+        stat = os.stat(path)
+        entry = self.get(filename)
+        if entry and entry['content_hash'] and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['content_hash']
+        return file_sha256(path)
+
+    def is_current(self, filename: str, content_hash: str) -> bool:
+        """True si el archivo ya está publicado con este mismo contenido."""
+        entry = self.get(filename)
+        return bool(entry and entry['status'] == 'done' and entry['content_hash'] == content_hash)
+
+    def _upsert(self, filename: str, path: str, content_hash: str, status: str,
+                num_chunks: int = 0, generation: Optional[str] = None, error: Optional[str] = None) -> None:
+        stat = os.stat(path) if os.path.exists(path) else None
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    filename, path, content_hash,
+                    stat.st_size if stat else None,
+                    stat.st_mtime if stat else None,
+                    status, num_chunks, generation, error,
+                    datetime.now().isoformat()
+                )
+            )
+
+    def mark_embedded(self, filename: str, path: str, content_hash: str, num_chunks: int) -> None:
+        self._upsert(filename, path, content_hash, 'embedded', num_chunks=num_chunks)
+
+    def mark_failed(self, filename: str, path: str, content_hash: Optional[str], error: str) -> None:
+        self._upsert(filename, path, content_hash, 'failed', error=error[:500])
+
+    def mark_done(self, filename: str, path: str, content_hash: str, num_chunks: int,
+                  generation: Optional[str] = None) -> None:
+        self._upsert(filename, path, content_hash, 'done', num_chunks=num_chunks, generation=generation)
+
+    def checkpoint(self, generation: Optional[str], filenames: Optional[List[str]] = None) -> int:
+        """
+        Confirma los archivos 'embedded' como publicados en `generation`.
+
+        Args:
+            filenames: Solo estos archivos (los de un fragmento); None = todos
+        """
+        sql = ("UPDATE files SET status = 'done', generation = ?, error = NULL, updated_at = ? "
+               "WHERE status = 'embedded'")
+        params: List[Any] = [generation, datetime.now().isoformat()]
+        if filenames is not None:
+            if not filenames:
+                return 0
+            sql += f" AND filename IN ({','.join('?' * len(filenames))})"
+            params.extend(filenames)
+        with self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def pending(self) -> List[str]:
+        """Archivos embebidos pero aún no publicados."""
+        return [row[0] for row in self._conn.execute("SELECT filename FROM files WHERE status = 'embedded'")]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            row[0]: row[1]
+            for row in self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status")
+        }
+
+    def reset(self) -> None:
+        """Olvida todo el historial (reconstrucción completa)."""
+        with self._conn:
+            self._conn.execute("DELETE FROM files")
+
+    def forget(self, filenames: List[str]) -> None:
+        """Olvida el historial de unos archivos (reconstrucción de un fragmento)."""
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE filename = ?", [(f,) for f in filenames])
+
+    def close(self) -> None:
+        self._conn.close()
@@ -4,21 +4,54 @@ Sistema RAG ampliado para integrar libros de inversión y conocimiento permanent
 Permite que la IA cruce información del 10-K con principios de los grandes inversores.
 
 Características:
-- Vectorstore persistente separado del documento activo
+- Vectorstore persistente separado del documento activo, fragmentado por
+  colección (cartas, libros, 10-K, general) y consultado en paralelo
 - Búsqueda híbrida: documento + biblioteca
 - Citas de fuentes (Buffett, Graham, etc.)
 """
 
 import os
+import json
 import logging
-from typing import Optional, List, Dict, Tuple
+import threading
+from typing import Optional, List, Dict, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime
 
+import numpy as np
 import streamlit as st
 
+from .library_catalog import LibraryCatalog
+
 logger = logging.getLogger(__name__)
 
+# Chunks por llamada al proveedor de embeddings durante la ingesta
+EMBED_BATCH_SIZE = 64
+
+# Troceado de los libros (caracteres)
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+
+# Temas canónicos del comité → consulta a la biblioteca
+TOPIC_QUERIES = {
+    'debt': "análisis de deuda apalancamiento leverage debt",
+    'moat': "ventaja competitiva moat economic moat competitive advantage",
+    'valuation': "valoración intrinsic value margin of safety",
+    'management': "calidad directiva management integrity capital allocation",
+    'risk': "riesgo risk management downside protection",
+    'growth': "crecimiento growth sustainable profitable growth",
+    'dividends': "dividendos dividend policy capital return",
+    'cycles': "ciclos económicos economic cycles timing",
+}
+
+# Sabiduría precalculada por tema, junto a cada generación del índice
+TOPIC_WISDOM_FILE = 'topic_wisdom.json'
+TOPIC_WISDOM_K = 3
+
+# (ruta del vectorstore, generación) -> {tema: contexto}; compartido por las sesiones
+_TOPIC_WISDOM: Dict[Tuple[str, str], Dict[str, str]] = {}
+_TOPIC_WISDOM_LOCK = threading.Lock()
+
 
 @dataclass
 class BookInfo:
@@ -38,6 +71,22 @@ class SearchResult:
     source: str  # Título del libro
     author: str
     relevance_score: float
+    also_in: List[str] = field(default_factory=list)  # Otras fuentes con el mismo pasaje
+
+
+@dataclass
+class LibraryQuery:
+    """Una consulta de search_batch, con su propio k y filtros."""
+    query: str
+    k: int = 5
+    filter_author: Optional[str] = None
+    filter_topics: Optional[List[str]] = None
+    lexical_weight: Optional[float] = None  # None = automático según la consulta
+    diversity: float = 0.3
+    
+    @property
+    def cache_params(self) -> tuple:
+        return (self.k, self.filter_author, tuple(self.filter_topics or ()), self.lexical_weight, self.diversity)
 
 
 class KnowledgeLibrary:
@@ -53,101 +102,114 @@ class KnowledgeLibrary:
     La IA puede consultar esta biblioteca para enriquecer el análisis.
     """
     
-    def __init__(self, library_path: str = None):
+    def __init__(self, library_path: str = None, embeddings=None,
+                 chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
         """
         Args:
             library_path: Ruta donde persistir la biblioteca
+            embeddings: Proveedor de embeddings (por defecto, el configurado)
+            chunk_size: Tamaño de chunk al indexar libros (caracteres)
+            chunk_overlap: Solapamiento entre chunks consecutivos
         """
         from config import PATHS
         self.library_path = library_path or os.path.join(PATHS.base, 'knowledge_library')
-        self.vectorstore_path = os.path.join(self.library_path, 'vectorstore')
+        self.vectorstore_path = os.path.join(self.library_path, 'vectorstore')  # Índice único anterior
+        self.shards_path = os.path.join(self.library_path, 'shards')
         self.metadata_path = os.path.join(self.library_path, 'metadata.json')
+        self.catalog_path = os.path.join(self.library_path, 'catalog.sqlite')
         
         os.makedirs(self.library_path, exist_ok=True)
-        os.makedirs(self.vectorstore_path, exist_ok=True)
+        os.makedirs(self.shards_path, exist_ok=True)
         
-        self._vectorstore = None
-        self._embeddings = None
-        self._books: Dict[str, BookInfo] = {}
+        self._embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._store = None
+        self.catalog = LibraryCatalog(self.catalog_path)
         
         self._load_metadata()
     
     @property
     def embeddings(self):
-        """Lazy loading de embeddings."""
+        """Lazy loading del proveedor de embeddings configurado (MODELS.embedding_backend)."""
         if self._embeddings is None:
             try:
-                from langchain_openai import OpenAIEmbeddings
-                from config import MODELS
-                self._embeddings = OpenAIEmbeddings(model=MODELS.embedding_model)
+                from .embeddings import get_embedding_provider
+                self._embeddings = get_embedding_provider()
             except Exception as e:
                 logger.error(f"Error cargando embeddings: {e}")
         return self._embeddings
     
+    @property
+    def store(self):
+        """Índice fragmentado compartido por todas las sesiones del proceso."""
+        if self._store is None:
+            from .library_shards import get_sharded_store
+            self._store = get_sharded_store(self.shards_path, self.embeddings, legacy_root=self.vectorstore_path)
+        return self._store
+    
+    @property
+    def query_cache(self):
+        """Caché de consultas compartido por las sesiones que usan esta biblioteca."""
+        from .query_cache import get_query_cache
+        return get_query_cache(self.vectorstore_path)
+    
+    def cache_stats(self) -> Dict:
+        """Aciertos del caché de consultas y latencia ahorrada."""
+        return self.query_cache.stats()
+    
+    @property
+    def _index(self):
+        """Vista sobre la generación activa de cada fragmento (solo lectura)."""
+        return self.store.current()
+    
     @property
     def is_loaded(self) -> bool:
         """Verifica si hay libros en la biblioteca."""
-        return len(self._books) > 0 and self._vectorstore is not None
+        return self.catalog.count() > 0 and self._index is not None
     
     @property
     def book_count(self) -> int:
         """Número de libros indexados."""
-        return len(self._books)
+        return self.catalog.count()
     
     @property
     def books(self) -> List[BookInfo]:
         """Lista de libros indexados."""
-        return list(self._books.values())
+        return self.list_books()
+    
+    def list_books(self, author: str = None, topic: str = None, limit: int = None) -> List[BookInfo]:
+        """Libros del catálogo, filtrados por autor/tema (consulta indexada)."""
+        return [
+            BookInfo(
+                title=row['title'],
+                author=row['author'],
+                filename=row['filename'],
+                num_chunks=row['num_chunks'],
+                indexed_at=row['indexed_at'],
+                topics=row['topics']
+            )
+            for row in self.catalog.list_books(author=author, topic=topic, limit=limit)
+        ]
     
     def _load_metadata(self):
-        """Carga metadata de libros indexados."""
-        import json
-        
-        if os.path.exists(self.metadata_path):
-            try:
-                with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for filename, info in data.items():
-                        self._books[filename] = BookInfo(**info)
-                logger.info(f"Cargados {len(self._books)} libros de metadata")
-            except Exception as e:
-                logger.error(f"Error cargando metadata: {e}")
+        """Abre el catálogo (importando un metadata.json antiguo la primera vez)."""
+        try:
+            self.catalog.import_metadata_json(self.metadata_path)
+            logger.info(f"Catálogo con {self.catalog.count()} libros")
+        except Exception as e:
+            logger.error(f"Error cargando catálogo: {e}")
         
         # Cargar vectorstore si existe
         self._load_vectorstore()
     
-    def _save_metadata(self):
-        """Guarda metadata de libros."""
-        import json
-        
-        data = {
-            filename: {
-                'title': info.title,
-                'author': info.author,
-                'filename': info.filename,
-                'num_chunks': info.num_chunks,
-                'indexed_at': info.indexed_at,
-                'topics': info.topics
-            }
-            for filename, info in self._books.items()
-        }
-        
-        with open(self.metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    
     def _load_vectorstore(self):
-        """Carga el vectorstore desde disco."""
-        if not os.path.exists(os.path.join(self.vectorstore_path, 'index.faiss')):
-            return
-        
+        """Abre el índice compartido (solo la primera sesión del proceso lo lee de disco)."""
         try:
-            from langchain_community.vectorstores import FAISS
-            self._vectorstore = FAISS.load_local(
-                self.vectorstore_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            logger.info("Vectorstore de biblioteca cargado")
+            index = self.store.current()
+            if index is not None:
+                logger.info(f"Vectorstore de biblioteca disponible ({len(index.shards)} fragmentos: "
+                            f"{', '.join(shard for shard, _ in index.shards)})")
         except Exception as e:
             logger.error(f"Error cargando vectorstore: {e}")
     
@@ -161,6 +223,9 @@ class KnowledgeLibrary:
         """
         Añade un libro a la biblioteca.
         
+        Solo se publica una generación nueva de su fragmento (ver
+        library_shards.shard_for); el resto de colecciones no se tocan.
+        
         Args:
             file: Archivo subido (PDF, TXT, EPUB)
             title: Título del libro
@@ -171,12 +236,14 @@ class KnowledgeLibrary:
             Tuple (num_chunks, message)
         """
         import tempfile
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-        from langchain_community.vectorstores import FAISS
-        from langchain.schema import Document
+        from .chunking import StreamingChunker, iter_document_pages, iter_chunk_batches
+        from .library_shards import shard_for
         
         filename = file.name
         topics = topics or []
+        shard = shard_for(filename, topics)
+        tmp_path = None
+        writer = None
         
         try:
             # Guardar archivo temporalmente
@@ -184,267 +251,253 @@ class KnowledgeLibrary:
                 tmp.write(file.read())
                 tmp_path = tmp.name
             
-            # Extraer texto
-            text = self._extract_text(tmp_path, filename)
-            
-            if not text or len(text) < 100:
-                return 0, "❌ No se pudo extraer texto del archivo."
-            
-            # Crear chunks con metadata
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1500,
-                chunk_overlap=200,
+            # Pipeline en streaming: páginas → chunks → lotes de embeddings.
+            # Nunca se materializa el texto completo del libro.
+            chunker = StreamingChunker(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
                 separators=["\n\n", "\n", ". ", " "]
             )
+            chunks = chunker.chunks(iter_document_pages(tmp_path, filename))
             
-            chunks = splitter.split_text(text)
-            
-            # Crear documentos con metadata rica
-            documents = []
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        'source': title,
-                        'author': author,
-                        'filename': filename,
-                        'chunk_index': i,
-                        'topics': topics
-                    }
+            writer = self.store.writer(shard, dedup=True)
+            num_chunks = 0
+            num_chars = 0
+            for batch in iter_chunk_batches(chunks, EMBED_BATCH_SIZE):
+                # Metadata rica por chunk (va al docstore SQLite, no al pickle)
+                writer.add_texts(
+                    [chunk.text for chunk in batch],
+                    [
+                        {
+                            'source': title,
+                            'author': author,
+                            'filename': filename,
+                            'chunk_index': chunk.index,
+                            'topics': topics,
+                            'page_start': chunk.page_start,
+                            'page_end': chunk.page_end
+                        }
+                        for chunk in batch
+                    ]
                 )
-                documents.append(doc)
+                num_chunks += len(batch)
+                num_chars += sum(len(chunk.text) for chunk in batch)
             
-            # Añadir a vectorstore
-            if self._vectorstore is None:
-                self._vectorstore = FAISS.from_documents(
-                    documents,
-                    self.embeddings
-                )
-            else:
-                self._vectorstore.add_documents(documents)
+            if num_chars < 100:
+                return 0, "❌ No se pudo extraer texto del archivo."
             
-            # Persistir
-            self._vectorstore.save_local(self.vectorstore_path)
+            # Persistir (las demás sesiones cambian de generación en su próxima búsqueda)
+            generation = writer.commit()
+            self.catalog.record_generation(
+                generation, writer.ntotal, writer.model_info.get('embedding_model'), shard=shard
+            )
             
-            # Guardar metadata
-            self._books[filename] = BookInfo(
+            # Precalcular la sabiduría por tema de la generación nueva
+            try:
+                self._topic_wisdom()
+            except Exception as e:
+                logger.warning(f"Sabiduría por tema no precalculada: {e}")
+            
+            # Registrar en el catálogo (transacción propia, sin reescribir el resto)
+            self.catalog.upsert_book(
+                filename=filename,
                 title=title,
                 author=author,
-                filename=filename,
-                num_chunks=len(chunks),
-                topics=topics
+                num_chunks=num_chunks,
+                topics=topics,
+                generation=generation,
+                duplicate_chunks=writer.duplicates,
+                shard=shard
             )
-            self._save_metadata()
-            
-            # Limpiar temporal
-            os.unlink(tmp_path)
             
-            logger.info(f"Libro '{title}' añadido con {len(chunks)} chunks")
-            return len(chunks), f"✅ '{title}' añadido con {len(chunks)} fragmentos."
+            logger.info(f"Libro '{title}' añadido con {num_chunks} chunks (fragmento {shard})")
+            return num_chunks, f"✅ '{title}' añadido con {num_chunks} fragmentos."
             
         except Exception as e:
             logger.error(f"Error añadiendo libro: {e}")
             return 0, f"❌ Error: {str(e)}"
-    
-    def _extract_text(self, file_path: str, filename: str) -> str:
-        """Extrae texto de diferentes formatos."""
-        ext = os.path.splitext(filename)[1].lower()
-        
-        if ext == '.pdf':
-            return self._extract_pdf(file_path)
-        elif ext in ['.txt', '.md']:
-            return self._extract_txt(file_path)
-        elif ext in ['.html', '.htm']:
-            return self._extract_html(file_path)
-        elif ext == '.epub':
-            return self._extract_epub(file_path)
-        elif ext == '.mobi':
-            return self._extract_mobi(file_path)
-        else:
-            return self._extract_txt(file_path)
-    
-    def _extract_pdf(self, file_path: str) -> str:
-        """Extrae texto de PDF."""
-        try:
-            import pdfplumber
-            text_parts = []
-            
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
-            
-            return "\n\n".join(text_parts)
-        except Exception as e:
-            logger.error(f"Error extrayendo PDF: {e}")
-            return ""
-    
-    def _extract_txt(self, file_path: str) -> str:
-        """Extrae texto de archivo de texto."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except:
-            try:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    return f.read()
-            except Exception as e:
-                logger.error(f"Error leyendo txt: {e}")
-                return ""
-    
-    def _extract_html(self, file_path: str) -> str:
-        """Extrae texto de HTML con soporte para múltiples encodings."""
-        from bs4 import BeautifulSoup
-        
-        # Probar múltiples encodings (las Cartas de Buffett suelen ser cp1252/latin-1)
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        content = None
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                break  # Si funciona, salimos del bucle
-            except (UnicodeDecodeError, LookupError):
-                continue
-        
-        # Último recurso: leer como bytes e ignorar errores
-        if content is None:
-            try:
-                with open(file_path, 'rb') as f:
-                    content = f.read().decode('utf-8', errors='ignore')
-            except Exception as e:
-                logger.error(f"Error leyendo HTML (todos los encodings fallaron): {e}")
-                return ""
-        
-        try:
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Eliminar scripts y estilos
-            for tag in soup(['script', 'style', 'nav', 'footer', 'header']):
-                tag.decompose()
-            
-            text = soup.get_text(separator='\n', strip=True)
-            return text
-        except Exception as e:
-            logger.error(f"Error parseando HTML: {e}")
-            return ""
-    
-    def _extract_epub(self, file_path: str) -> str:
-        """Extrae texto de EPUB."""
-        try:
-            from ebooklib import epub
-            from bs4 import BeautifulSoup
-            
-            book = epub.read_epub(file_path)
-            text_parts = []
-            
-            for item in book.get_items():
-                if item.get_type() == 9:  # ITEM_DOCUMENT (HTML content)
-                    content = item.get_content().decode('utf-8', errors='ignore')
-                    soup = BeautifulSoup(content, 'html.parser')
-                    text = soup.get_text(separator='\n', strip=True)
-                    if text:
-                        text_parts.append(text)
-            
-            logger.info(f"EPUB extraído: {len(text_parts)} secciones")
-            return "\n\n".join(text_parts)
-            
-        except ImportError:
-            logger.warning("ebooklib no instalado. Instala con: pip install ebooklib")
-            return ""
-        except Exception as e:
-            logger.error(f"Error extrayendo EPUB: {e}")
-            return ""
-    
-    def _extract_mobi(self, file_path: str) -> str:
-        """
-        Extrae texto de MOBI.
-        MOBI es más complejo - intenta convertir a EPUB primero o usar mobi-python.
-        """
-        try:
-            # Intento 1: Usar mobi-python si está disponible
-            try:
-                import mobi
-                tempdir, filepath = mobi.extract(file_path)
-                
-                # El archivo extraído suele ser HTML
-                for root, dirs, files in os.walk(tempdir):
-                    for f in files:
-                        if f.endswith('.html') or f.endswith('.htm'):
-                            html_path = os.path.join(root, f)
-                            return self._extract_html(html_path)
-                
-            except ImportError:
-                logger.warning("mobi no instalado. Usando fallback...")
-            
-            # Intento 2: Leer como binario y extraer texto visible
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                # Buscar texto ASCII/UTF-8 en el binario
-                text = content.decode('utf-8', errors='ignore')
-                # Limpiar caracteres no imprimibles
-                clean_text = ''.join(c for c in text if c.isprintable() or c in '\n\r\t')
-                return clean_text
-                
-        except Exception as e:
-            logger.error(f"Error extrayendo MOBI: {e}")
-            return ""
+        finally:
+            # Sin commit (error o texto insuficiente) se libera el fragmento
+            if writer is not None:
+                writer.close()
+            # Limpiar temporal
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
     
     def search(
         self,
         query: str,
         k: int = 5,
         filter_author: str = None,
-        filter_topics: List[str] = None
+        filter_topics: List[str] = None,
+        lexical_weight: float = None,
+        diversity: float = 0.3,
+        query_vector: np.ndarray = None
     ) -> List[SearchResult]:
         """
-        Busca en la biblioteca de conocimiento.
+        Busca en la biblioteca de conocimiento (híbrida: BM25 + vectorial).
         
         Args:
             query: Consulta de búsqueda
             k: Número de resultados
             filter_author: Filtrar por autor (opcional)
             filter_topics: Filtrar por temas (opcional)
+            lexical_weight: Peso del ranking BM25 frente al vectorial (1.0).
+                None = automático según la consulta; 0 = solo vectorial
+            diversity: Peso de la diversidad en la selección final (MMR).
+                0 = solo relevancia
+            query_vector: Embedding de la consulta ya calculado (opcional)
             
         Returns:
             Lista de SearchResult
         """
-        if self._vectorstore is None:
-            return []
+        request = LibraryQuery(query, k, filter_author, filter_topics, lexical_weight, diversity)
+        return self.search_batch([request], query_vectors=query_vector)[0]
+    
+    def search_batch(
+        self,
+        queries: List[Union[str, 'LibraryQuery']],
+        query_vectors: np.ndarray = None,
+        index=None
+    ) -> List[List[SearchResult]]:
+        """
+        Ejecuta N búsquedas en una sola ida y vuelta: un lote de embeddings
+        para las consultas no cacheadas y una búsqueda FAISS matricial.
         
-        try:
-            # Búsqueda con scores
-            results = self._vectorstore.similarity_search_with_score(query, k=k*2)
+        Args:
+            queries: Consultas (texto o LibraryQuery con k y filtros propios)
+            query_vectors: Matriz (N, d) de embeddings ya calculados (opcional)
+            index: Generación a consultar (por defecto, la activa)
             
-            search_results = []
-            for doc, score in results:
-                # Aplicar filtros
-                if filter_author and doc.metadata.get('author') != filter_author:
-                    continue
-                
-                if filter_topics:
-                    doc_topics = doc.metadata.get('topics', [])
-                    if not any(t in doc_topics for t in filter_topics):
-                        continue
-                
-                result = SearchResult(
-                    content=doc.page_content,
-                    source=doc.metadata.get('source', 'Unknown'),
-                    author=doc.metadata.get('author', 'Unknown'),
-                    relevance_score=1 - score  # Convertir distancia en relevancia
+        Returns:
+            Una lista de SearchResult por consulta, en el mismo orden
+        """
+        requests = [q if isinstance(q, LibraryQuery) else LibraryQuery(q) for q in queries]
+        try:
+            return self._search_batch(requests, query_vectors, index)
+        except Exception as e:
+            logger.error(f"Error buscando en biblioteca: {e}")
+            return [[] for _ in requests]
+    
+    def _search_batch(
+        self,
+        requests: List['LibraryQuery'],
+        query_vectors: np.ndarray = None,
+        index=None
+    ) -> List[List[SearchResult]]:
+        """search_batch sin capturar errores (embeddings, FAISS)."""
+        from .vector_store import embed_texts
+        
+        index = index or self._index
+        if index is None or not requests:
+            return [[] for _ in requests]
+        
+        given = {}
+        if query_vectors is not None:
+            rows = np.asarray(query_vectors, dtype=np.float32).reshape(len(requests), -1)
+            given = {r.query: row for r, row in zip(requests, rows)}
+        
+        def embed(texts: List[str]) -> np.ndarray:
+            if given:
+                return np.vstack([given[t] for t in texts])
+            return embed_texts(self.embeddings, texts)
+        
+        # Caché semántico compartido (se invalida solo al cambiar de generación)
+        return self.query_cache.get_or_compute_many(
+            index.name,
+            [r.query for r in requests],
+            [r.cache_params for r in requests],
+            embed_fn=embed,
+            compute_fn=lambda positions, vectors: self._run_search_batch(
+                index, [requests[i] for i in positions], vectors
+            )
+        )
+    
+    def _run_search_batch(
+        self,
+        index,
+        requests: List['LibraryQuery'],
+        query_vectors: np.ndarray
+    ) -> List[List[SearchResult]]:
+        """Búsqueda híbrida por lotes + filtros + MMR sobre una generación."""
+        from .hybrid_search import hybrid_search_batch, weights_for_query, HybridWeights
+        
+        weights = []
+        for r in requests:
+            w = weights_for_query(r.query)
+            if r.lexical_weight is not None:
+                w = HybridWeights(vector=w.vector, lexical=r.lexical_weight)
+            weights.append(w)
+        
+        # Búsqueda con scores (solo metadata; el texto se lee al final)
+        all_hits = hybrid_search_batch(
+            index, self.embeddings,
+            [r.query for r in requests], [r.k for r in requests],
+            weights=weights, query_vectors=query_vectors
+        )
+        
+        # Procedencia de los chunks deduplicados, en una consulta para todo el lote
+        sources = index.docstore.get_sources(
+            sorted({hit.vector_id for hits in all_hits for hit in hits})
+        )
+        selected = [self._select(index, r, hits, sources) for r, hits in zip(requests, all_hits)]
+        
+        # Texto bajo demanda: solo de los resultados finales
+        index.fill_texts([hit for hits in selected for hit in hits])
+        
+        return [
+            [
+                SearchResult(
+                    content=hit.content,
+                    source=hit.metadata.get('source') or 'Unknown',
+                    author=hit.metadata.get('author') or 'Unknown',
+                    relevance_score=hit.score,  # Score RRF (fusión BM25 + vectorial)
+                    also_in=list(dict.fromkeys(
+                        s['source'] for s in sources.get(hit.vector_id, [])
+                        if s.get('source') and s['source'] != hit.metadata.get('source')
+                    ))
                 )
-                search_results.append(result)
-                
-                if len(search_results) >= k:
-                    break
+                for hit in hits
+            ]
+            for hits in selected
+        ]
+    
+    @staticmethod
+    def _select(index, request: 'LibraryQuery', hits: list, sources: Dict[int, List[Dict]]) -> list:
+        """Filtros de autor/tema (sobre cualquier fuente del chunk) y selección MMR."""
+        from .hybrid_search import mmr_select
+        
+        k, diversity = request.k, request.diversity
+        
+        # Pool de candidatos filtrados para la selección con diversidad
+        pool_size = k * 3 if diversity > 0 else k
+        candidates = []
+        for hit in hits:
+            origins = [hit.metadata] + sources.get(hit.vector_id, [])
             
-            return search_results
+            # Aplicar filtros (sobre cualquiera de sus fuentes)
+            if request.filter_author and not any(o.get('author') == request.filter_author for o in origins):
+                continue
             
-        except Exception as e:
-            logger.error(f"Error buscando en biblioteca: {e}")
-            return []
+            if request.filter_topics:
+                doc_topics = {t for o in origins for t in (o.get('topics') or [])}
+                if not any(t in doc_topics for t in request.filter_topics):
+                    continue
+            
+            candidates.append(hit)
+            if len(candidates) >= pool_size:
+                break
+        
+        if diversity > 0 and len(candidates) > k:
+            order = mmr_select(
+                index.reconstruct([hit.vector_id for hit in candidates]),
+                np.array([hit.score for hit in candidates]),
+                k,
+                lambda_mult=1 - diversity
+            )
+            return [candidates[i] for i in order]
+        return candidates[:k]
+
     
     def search_with_context(
         self,
@@ -457,15 +510,30 @@ class KnowledgeLibrary:
         Returns:
             Texto formateado con citas
         """
-        results = self.search(query, k=k)
-        
+        return self._format_context(self.search(query, k=k))
+    
+    def search_with_context_batch(
+        self,
+        queries: List[str],
+        k: int = 3
+    ) -> List[str]:
+        """search_with_context para N consultas en una sola búsqueda por lotes."""
+        return [
+            self._format_context(results)
+            for results in self.search_batch([LibraryQuery(q, k=k) for q in queries])
+        ]
+    
+    @staticmethod
+    def _format_context(results: List[SearchResult]) -> str:
+        """Formatea resultados como contexto con citas."""
         if not results:
             return ""
         
         formatted_parts = []
         for r in results:
+            also = f" [también en: {', '.join(r.also_in[:3])}]" if r.also_in else ""
             formatted_parts.append(
-                f"📖 **{r.source}** ({r.author}):\n\"{r.content[:500]}...\""
+                f"📖 **{r.source}** ({r.author}){also}:\n\"{r.content[:500]}...\""
             )
         
         return "\n\n---\n\n".join(formatted_parts)
@@ -475,6 +543,8 @@ class KnowledgeLibrary:
         Obtiene sabiduría relevante de la biblioteca sobre un tema.
         
         Útil para enriquecer el análisis con perspectivas de grandes inversores.
+        Los temas canónicos (TOPIC_QUERIES) se sirven precalculados desde
+        memoria, sin embeddings ni búsqueda.
         
         Args:
             topic: Tema a buscar (ej: 'debt analysis', 'competitive moat')
@@ -482,46 +552,130 @@ class KnowledgeLibrary:
         Returns:
             Contexto formateado
         """
-        # Mapeo de temas a queries específicas
-        topic_queries = {
-            'debt': "análisis de deuda apalancamiento leverage debt",
-            'moat': "ventaja competitiva moat economic moat competitive advantage",
-            'valuation': "valoración intrinsic value margin of safety",
-            'management': "calidad directiva management integrity capital allocation",
-            'risk': "riesgo risk management downside protection",
-            'growth': "crecimiento growth sustainable profitable growth",
-            'dividends': "dividendos dividend policy capital return",
-            'cycles': "ciclos económicos economic cycles timing",
-        }
-        
-        query = topic_queries.get(topic.lower(), topic)
-        return self.search_with_context(query, k=3)
+        key = topic.lower()
+        if key in TOPIC_QUERIES:
+            wisdom = self._topic_wisdom()
+            if key in wisdom:
+                return wisdom[key]
+        
+        query = TOPIC_QUERIES.get(key, topic)
+        return self.search_with_context(query, k=TOPIC_WISDOM_K)
+    
+    def get_wisdom_for_topics(self, topics: List[str]) -> Dict[str, str]:
+        """
+        get_wisdom_for_topic para varios temas: los canónicos salen del
+        precálculo y el resto se resuelve en una única búsqueda por lotes.
+        """
+        precomputed = self._topic_wisdom()
+        wisdom = {t: precomputed[t.lower()] for t in topics if t.lower() in precomputed}
+        
+        pending = [t for t in topics if t not in wisdom]
+        contexts = self.search_with_context_batch(
+            [TOPIC_QUERIES.get(t.lower(), t) for t in pending], k=TOPIC_WISDOM_K
+        )
+        wisdom.update(zip(pending, contexts))
+        return {t: wisdom[t] for t in topics}
+    
+    def _topic_wisdom(self) -> Dict[str, str]:
+        """
+        Sabiduría precalculada de la generación activa: memoria → disco
+        (topic_wisdom.json de la generación) → cálculo (y se persiste).
+        """
+        index = self._index
+        if index is None:
+            return {}
+        
+        cache_key = (self.vectorstore_path, index.name)
+        wisdom = _TOPIC_WISDOM.get(cache_key)
+        if wisdom is not None:
+            return wisdom
+        
+        with _TOPIC_WISDOM_LOCK:
+            wisdom = _TOPIC_WISDOM.get(cache_key)
+            if wisdom is None:
+                wisdom = self._load_topic_wisdom(index)
+                if wisdom is None:
+                    try:
+                        wisdom = self.materialize_topic_wisdom(index)
+                    except Exception as e:
+                        # Sin cachear: la próxima llamada lo reintenta
+                        logger.warning(f"Sabiduría por tema no precalculada: {e}")
+                        return {}
+                # Solo la generación activa de cada biblioteca queda en memoria
+                for stale in [k for k in _TOPIC_WISDOM if k[0] == self.vectorstore_path]:
+                    del _TOPIC_WISDOM[stale]
+                _TOPIC_WISDOM[cache_key] = wisdom
+        return wisdom
+    
+    @staticmethod
+    def _load_topic_wisdom(index) -> Optional[Dict[str, str]]:
+        path = os.path.join(index.path, TOPIC_WISDOM_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Precalculado con otra lista de temas: recalcular
+            if data.get('generation') == index.name and set(data.get('topics', {})) == set(TOPIC_QUERIES):
+                return data['topics']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Sabiduría precalculada ilegible ({path}): {e}")
+        return None
+    
+    def materialize_topic_wisdom(self, index=None) -> Dict[str, str]:
+        """
+        Calcula la sabiduría de todos los temas canónicos para una generación
+        (una sola búsqueda por lotes) y la guarda en index.path.
+        
+        Se llama al indexar. El fichero registra la generación y
+        _load_topic_wisdom solo lo usa si coincide con la activa (con
+        fragmentos, index.path es la raíz común a todas las generaciones),
+        así que nunca sirve resultados de un índice anterior.
+        
+        Raises:
+            Exception: si la búsqueda falla (p.ej. embeddings); no se
+                persiste nada y la próxima llamada lo reintenta
+        """
+        index = index or self._index
+        if index is None:
+            return {}
+        
+        topics = list(TOPIC_QUERIES)
+        results = self._search_batch(
+            [LibraryQuery(TOPIC_QUERIES[t], k=TOPIC_WISDOM_K) for t in topics], index=index
+        )
+        wisdom = {topic: self._format_context(r) for topic, r in zip(topics, results)}
+        
+        path = os.path.join(index.path, TOPIC_WISDOM_FILE)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'generation': index.name, 'created_at': datetime.now().isoformat(), 'topics': wisdom},
+                    f, indent=2, ensure_ascii=False
+                )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"No se pudo persistir la sabiduría precalculada: {e}")
+        
+        logger.info(f"Sabiduría por tema precalculada para la generación {index.name}")
+        return wisdom
     
     def remove_book(self, filename: str) -> bool:
         """Elimina un libro de la biblioteca."""
-        if filename not in self._books:
-            return False
-        
-        # Por ahora, solo eliminamos de metadata
+        # Por ahora, solo eliminamos del catálogo
         # Reconstruir vectorstore sería costoso
-        del self._books[filename]
-        self._save_metadata()
+        if not self.catalog.remove_book(filename):
+            return False
         
-        logger.info(f"Libro {filename} eliminado de metadata")
+        logger.info(f"Libro {filename} eliminado del catálogo")
         return True
     
     def clear_library(self):
         """Limpia toda la biblioteca."""
-        import shutil
-        
-        self._books = {}
-        self._vectorstore = None
-        
-        if os.path.exists(self.vectorstore_path):
-            shutil.rmtree(self.vectorstore_path)
-            os.makedirs(self.vectorstore_path)
+        self.store.clear()
+        self.catalog.clear()
         
-        self._save_metadata()
         logger.info("Biblioteca limpiada")
 
 
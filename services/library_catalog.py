@@ -0,0 +1,279 @@
+"""
+🗂️ CATÁLOGO DE LA BIBLIOTECA - SQLite (WAL)
+Sustituye a metadata.json: cada libro se registra en su propia transacción
+en lugar de reescribir el archivo completo, así que la app, la página de
+indexación y los scripts pueden actualizarlo a la vez sin pisarse.
+
+Tablas:
+- books:        un registro por archivo indexado
+- book_topics:  temas de cada libro (indexada por tema)
+- generations:  generaciones publicadas de cada fragmento del índice
+
+Cada libro registra el fragmento (colección) del índice en que vive.
+
+Los chunks viven en el docstore SQLite del índice (indexado por filename);
+el catálogo guarda el recuento y la generación en que se publicaron.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    filename TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT,
+    num_chunks INTEGER DEFAULT 0,
+    duplicate_chunks INTEGER DEFAULT 0,
+    indexed_at TEXT,
+    content_hash TEXT,
+    generation TEXT,
+    shard TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_books_author ON books(author);
+CREATE INDEX IF NOT EXISTS idx_books_indexed_at ON books(indexed_at);
+
+CREATE TABLE IF NOT EXISTS book_topics (
+    filename TEXT NOT NULL REFERENCES books(filename) ON DELETE CASCADE,
+    topic TEXT NOT NULL,
+    PRIMARY KEY (filename, topic)
+);
+CREATE INDEX IF NOT EXISTS idx_book_topics_topic ON book_topics(topic);
+
+CREATE TABLE IF NOT EXISTS generations (
+    name TEXT PRIMARY KEY,
+    ntotal INTEGER,
+    embedding_model TEXT,
+    published_at TEXT,
+    shard TEXT
+);
+"""
+
+# Columnas añadidas a catálogos existentes (tabla, columna, tipo)
+MIGRATIONS = [
+    ('books', 'shard', 'TEXT'),
+    ('generations', 'shard', 'TEXT'),
+]
+
+
+class LibraryCatalog:
+    """
+    Catálogo transaccional de libros. Conexión por hilo; cada escritura es
+    una transacción corta (busy_timeout cubre escritores concurrentes).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        for table, column, sql_type in MIGRATIONS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_books_shard ON books(shard)")
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # =========================================================================
+    # MIGRACIÓN
+    # =========================================================================
+
+    def import_metadata_json(self, metadata_path: str) -> int:
+        """
+        Importa un metadata.json antiguo si el catálogo está vacío.
+
+        Returns:
+            Número de libros importados
+        """
+        if not os.path.exists(metadata_path) or self.count():
+            return 0
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error leyendo {metadata_path}: {e}")
+            return 0
+
+        for filename, info in data.items():
+            self.upsert_book(
+                filename=filename,
+                title=info.get('title', filename),
+                author=info.get('author'),
+                num_chunks=info.get('num_chunks', 0),
+                topics=info.get('topics', []),
+                indexed_at=info.get('indexed_at'),
+            )
+        logger.info(f"Catálogo: {len(data)} libros importados de {metadata_path}")
+        return len(data)
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def upsert_book(
+        self,
+        filename: str,
+        title: str,
+        author: Optional[str],
+        num_chunks: int,
+        topics: Optional[List[str]] = None,
+        indexed_at: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        generation: Optional[str] = None,
+        duplicate_chunks: int = 0,
+        shard: Optional[str] = None
+    ) -> None:
+        """Registra (o actualiza) un libro y sus temas en una transacción."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO books (filename, title, author, num_chunks, duplicate_chunks, "
+                "indexed_at, content_hash, generation, shard) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    filename, title, author, num_chunks, duplicate_chunks,
+                    indexed_at or datetime.now().isoformat(), content_hash, generation, shard
+                )
+            )
+            conn.execute("DELETE FROM book_topics WHERE filename = ?", (filename,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO book_topics VALUES (?, ?)",
+                [(filename, topic) for topic in (topics or [])]
+            )
+
+    def remove_book(self, filename: str) -> bool:
+        conn = self._connect()
+        with conn:
+            return conn.execute("DELETE FROM books WHERE filename = ?", (filename,)).rowcount > 0
+
+    def record_generation(self, name: Optional[str], ntotal: int, embedding_model: Optional[str],
+                          shard: Optional[str] = None) -> None:
+        if not name:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generations (name, ntotal, embedding_model, published_at, shard) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (name, ntotal, embedding_model, datetime.now().isoformat(), shard)
+            )
+
+    def clear(self, shard: Optional[str] = None) -> None:
+        """Vacía el catálogo, o solo los libros y generaciones de un fragmento."""
+        conn = self._connect()
+        with conn:
+            if shard is None:
+                conn.execute("DELETE FROM book_topics")
+                conn.execute("DELETE FROM books")
+                conn.execute("DELETE FROM generations")
+                return
+            # book_topics se borra en cascada
+            conn.execute("DELETE FROM books WHERE shard = ?", (shard,))
+            conn.execute("DELETE FROM generations WHERE shard = ?", (shard,))
+
+    # =========================================================================
+    # LECTURA
+    # =========================================================================
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def has_book(self, filename: str) -> bool:
+        return self._connect().execute(
+            "SELECT 1 FROM books WHERE filename = ?", (filename,)
+        ).fetchone() is not None
+
+    def list_books(
+        self,
+        author: Optional[str] = None,
+        topic: Optional[str] = None,
+        limit: Optional[int] = None,
+        shard: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Libros (filtrados por autor/tema/fragmento con índice), más recientes primero."""
+        sql = "SELECT b.* FROM books b"
+        params: List[Any] = []
+        if topic:
+            sql += " JOIN book_topics t ON t.filename = b.filename AND t.topic = ?"
+            params.append(topic)
+        conditions = []
+        if author:
+            conditions.append("b.author = ?")
+            params.append(author)
+        if shard:
+            conditions.append("b.shard = ?")
+            params.append(shard)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY b.indexed_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = [dict(r) for r in conn.execute(sql, params)]
+        finally:
+            conn.row_factory = None
+        topics = self._topics_for([r['filename'] for r in rows])
+        for row in rows:
+            row['topics'] = topics.get(row['filename'], [])
+        return rows
+
+    def _topics_for(self, filenames: List[str]) -> Dict[str, List[str]]:
+        result: Dict[str, List[str]] = {}
+        conn = self._connect()
+        for i in range(0, len(filenames), 900):
+            batch = filenames[i:i + 900]
+            placeholders = ','.join('?' * len(batch))
+            for filename, topic in conn.execute(
+                f"SELECT filename, topic FROM book_topics WHERE filename IN ({placeholders})", batch
+            ):
+                result.setdefault(filename, []).append(topic)
+        return result
+
+    def shards(self) -> Dict[str, int]:
+        """Fragmentos con su número de libros (NULL = índice anterior a la fragmentación)."""
+        return dict(self._connect().execute(
+            "SELECT shard, COUNT(*) FROM books GROUP BY shard ORDER BY COUNT(*) DESC"
+        ).fetchall())
+
+    def topics(self) -> Dict[str, int]:
+        """Temas con su número de libros."""
+        return dict(self._connect().execute(
+            "SELECT topic, COUNT(*) FROM book_topics GROUP BY topic ORDER BY COUNT(*) DESC"
+        ).fetchall())
+
+    def latest_generation(self) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT name, ntotal, embedding_model, published_at FROM generations "
+            "ORDER BY published_at DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('name', 'ntotal', 'embedding_model', 'published_at'), row))
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,373 @@
+"""
+🧩 BIBLIOTECA FRAGMENTADA - Un índice por colección
+Cartas de Buffett, libros de inversión, 10-K y resto viven en índices
+independientes (cada uno con sus generaciones y su docstore): añadir un
+10-K publica una generación nueva solo de su fragmento y las demás
+colecciones ni se reescriben ni se recargan.
+
+Las búsquedas se reparten en paralelo entre los fragmentos y se fusionan
+por score (top-k). ShardedIndex expone la misma interfaz que VectorIndex,
+así que la búsqueda híbrida, MMR y el caché de consultas no distinguen
+entre una biblioteca fragmentada y un índice único.
+
+Layout:
+    knowledge_library/
+        shards/<fragmento>/   -> SharedVectorStore (CURRENT + gen-* + docstore)
+        vectorstore/          -> índice único anterior (solo lectura hasta un --rebuild)
+"""
+
+import os
+import logging
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .vector_store import SearchHit, SharedVectorStore, VectorIndex, IndexWriter, fit_dimensions, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+# Fragmentos de la biblioteca (la clasificación de index_biblioteca.py)
+BUFFETT_LETTERS = 'buffett_letters'
+INVESTMENT_BOOKS = 'investment_books'
+SEC_FILINGS = 'sec_filings'
+GENERAL = 'general'
+SHARDS = (BUFFETT_LETTERS, INVESTMENT_BOOKS, SEC_FILINGS, GENERAL)
+
+# Índice único anterior a la fragmentación: se consulta como un fragmento más
+LEGACY_SHARD = 'legacy'
+
+# Temas que ubican un libro subido a mano en su colección
+_SHARD_TOPICS = {
+    BUFFETT_LETTERS: {'buffett', 'annual letters'},
+    SEC_FILINGS: {'sec filings', '10-k'},
+    INVESTMENT_BOOKS: {
+        'investment books', 'value investing', 'technical analysis',
+        'macroeconomics', 'behavioral finance',
+    },
+}
+
+# Ids globales: fragmento en los bits altos, vector_id del fragmento en los bajos
+_SHARD_ID_BITS = 40
+_LOCAL_ID_MASK = (1 << _SHARD_ID_BITS) - 1
+
+# Pool del reparto entre fragmentos (separado del de la búsqueda híbrida,
+# que ya lo usa desde sus propios hilos)
+_FANOUT = ThreadPoolExecutor(max_workers=8, thread_name_prefix='shard-fanout')
+
+
+# ============================================================================
+# CLASIFICACIÓN
+# ============================================================================
+
+@dataclass
+class BookProfile:
+    """Título, autor, temas y fragmento deducidos del nombre de archivo."""
+    title: str
+    author: str
+    topics: List[str]
+    shard: str
+
+
+def classify_book(filename: str) -> BookProfile:
+    """Clasificación de los archivos de 1_BIBLIOTECA por su nombre."""
+    name = os.path.splitext(filename)[0]
+
+    if "Carta_Buffett" in filename:
+        year = filename.split("_")[-1].split(".")[0]
+        return BookProfile(
+            title=f"Carta a los Accionistas {year}",
+            author="Warren Buffett",
+            topics=['value investing', 'buffett', 'annual letters'],
+            shard=BUFFETT_LETTERS
+        )
+
+    if "Z-Library" in filename:
+        parts = name.replace(" (Z-Library)", "").split(" (")
+        return BookProfile(
+            title=parts[0].strip(),
+            author=parts[1].strip("_)") if len(parts) > 1 else "Unknown",
+            topics=['value investing', 'investment books'],
+            shard=INVESTMENT_BOOKS
+        )
+
+    if any(x in filename.lower() for x in ['tsla', 'intc', 'pypl', '10-k', 'f-2024']):
+        ticker = filename.split("-")[0].upper()
+        return BookProfile(
+            title=f"10-K Filing {ticker}",
+            author=f"{ticker} Inc.",
+            topics=['sec filings', '10-k'],
+            shard=SEC_FILINGS
+        )
+
+    return BookProfile(title=name, author="Unknown", topics=['general'], shard=GENERAL)
+
+
+def shard_for(filename: str, topics: Optional[Iterable[str]] = None) -> str:
+    """Fragmento de un libro: por su nombre y, si no es concluyente, por sus temas."""
+    shard = classify_book(filename).shard
+    if shard != GENERAL:
+        return shard
+    normalized = {t.strip().lower() for t in (topics or [])}
+    for candidate, shard_topics in _SHARD_TOPICS.items():
+        if normalized & shard_topics:
+            return candidate
+    return GENERAL
+
+
+# ============================================================================
+# VISTA FRAGMENTADA (misma interfaz que VectorIndex)
+# ============================================================================
+
+def _split_ids(vector_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """Ids globales → {posición del fragmento: [vector_ids locales]}."""
+    grouped: Dict[int, List[int]] = {}
+    for global_id in vector_ids:
+        grouped.setdefault(int(global_id) >> _SHARD_ID_BITS, []).append(int(global_id) & _LOCAL_ID_MASK)
+    return grouped
+
+
+class ShardedDocstore:
+    """Lecturas del docstore repartidas entre los fragmentos (ids globales)."""
+
+    def __init__(self, view: 'ShardedIndex'):
+        self._view = view
+
+    def _gather(self, vector_ids: List[int], method: str) -> Dict[int, Any]:
+        result: Dict[int, Any] = {}
+        for position, local_ids in _split_ids(vector_ids).items():
+            docstore = self._view.shards[position][1].docstore
+            for local_id, value in getattr(docstore, method)(local_ids).items():
+                result[self._view.global_id(position, local_id)] = value
+        return result
+
+    def get_metadata(self, vector_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        return self._gather(vector_ids, 'get_metadata')
+
+    def get_sources(self, vector_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        return self._gather(vector_ids, 'get_sources')
+
+    def get_texts(self, vector_ids: List[int]) -> Dict[int, str]:
+        return self._gather(vector_ids, 'get_texts')
+
+    def ids_where(self, key: str, values: List[Any], below: Optional[int] = None) -> List[int]:
+        """ids globales por fragmento, en orden de fragmento y de inserción."""
+        return [
+            self._view.global_id(position, vid)
+            for position, (_, index) in enumerate(self._view.shards)
+            for vid in index.docstore.ids_where(key, values, below=index.ntotal)
+        ]
+
+    def lexical_search(self, query: str, k: int, below: Optional[int] = None) -> List[tuple]:
+        """
+        BM25 en todos los fragmentos en paralelo, fusionado por score.
+
+        `below` se ignora: cada fragmento se limita a su propia generación.
+        """
+        futures = [
+            (position, _FANOUT.submit(index.docstore.lexical_search, query, k, index.ntotal))
+            for position, (_, index) in enumerate(self._view.shards)
+        ]
+        merged = []
+        for position, future in futures:
+            merged.extend((self._view.global_id(position, vid), score) for vid, score in future.result())
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return merged[:k]
+
+
+class ShardedIndex:
+    """
+    Generaciones activas de todos los fragmentos vistas como un solo índice.
+
+    Inmutable como VectorIndex: si un fragmento publica, ShardedLibraryStore
+    crea una vista nueva (las búsquedas en curso terminan con la anterior).
+    """
+
+    def __init__(self, root: str, shards: List[Tuple[str, VectorIndex]]):
+        self.path = root
+        self.shards = shards
+        # Identidad de la vista: cambia cuando cualquier fragmento publica
+        self.name = '+'.join(f"{shard}@{index.name}" for shard, index in shards)
+        self.docstore = ShardedDocstore(self)
+
+    @staticmethod
+    def global_id(position: int, vector_id: int) -> int:
+        return (position << _SHARD_ID_BITS) | int(vector_id)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(index.ntotal for _, index in self.shards)
+
+    @property
+    def dimension(self) -> int:
+        return min(index.dimension for _, index in self.shards)
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.shards[0][1].embedding_model
+
+    @property
+    def profile(self):
+        return self.shards[0][1].profile
+
+    @property
+    def generations(self) -> Dict[str, str]:
+        """Generación activa de cada fragmento."""
+        return {shard: index.name for shard, index in self.shards}
+
+    def search(self, query_vectors: np.ndarray, k: int) -> List[List[SearchHit]]:
+        """Búsqueda vectorial en todos los fragmentos en paralelo y top-k por coseno."""
+        futures = [
+            (position, _FANOUT.submit(index.search, query_vectors, k))
+            for position, (_, index) in enumerate(self.shards)
+        ]
+        merged: List[List[SearchHit]] = [[] for _ in range(len(query_vectors))]
+        for position, future in futures:
+            for row, hits in enumerate(future.result()):
+                merged[row].extend(
+                    SearchHit(
+                        vector_id=self.global_id(position, hit.vector_id),
+                        score=hit.score,
+                        metadata=hit.metadata,
+                        content=hit.content
+                    )
+                    for hit in hits
+                )
+        return [sorted(hits, key=lambda h: h.score, reverse=True)[:k] for hits in merged]
+
+    def reconstruct(self, vector_ids: List[int]) -> np.ndarray:
+        """Vectores de los ids globales indicados, en ese orden (dimensión común)."""
+        if not vector_ids:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        rows: Dict[int, np.ndarray] = {}
+        for position, local_ids in _split_ids(vector_ids).items():
+            vectors = self.shards[position][1].reconstruct(local_ids)
+            for local_id, vector in zip(local_ids, fit_dimensions(vectors, self.dimension)):
+                rows[self.global_id(position, local_id)] = vector
+        return np.vstack([rows[int(i)] for i in vector_ids])
+
+    def fill_texts(self, hits: List[SearchHit]) -> List[SearchHit]:
+        """Carga el texto de los hits indicados (una consulta por fragmento)."""
+        missing = [h.vector_id for h in hits if h.content is None]
+        if missing:
+            texts = self.docstore.get_texts(missing)
+            for hit in hits:
+                if hit.content is None:
+                    hit.content = texts.get(hit.vector_id, "")
+        return hits
+
+
+# ============================================================================
+# ALMACÉN FRAGMENTADO
+# ============================================================================
+
+def _same_shards(a: List[Tuple[str, VectorIndex]], b: List[Tuple[str, VectorIndex]]) -> bool:
+    return len(a) == len(b) and all(x[0] == y[0] and x[1] is y[1] for x, y in zip(a, b))
+
+
+class ShardedLibraryStore:
+    """
+    Un SharedVectorStore por fragmento (compartidos por proceso) más el
+    índice único anterior, si existe, como fragmento de solo lectura.
+    """
+
+    def __init__(self, root: str, embeddings, legacy_root: Optional[str] = None):
+        self.root = root
+        self.embeddings = embeddings
+        self.legacy_root = legacy_root
+        self._lock = threading.Lock()
+        self._view: Optional[ShardedIndex] = None
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def shard(self, name: str) -> SharedVectorStore:
+        """Almacén de un fragmento (se crea vacío si no existe)."""
+        return get_shared_store(os.path.join(self.root, name), self.embeddings)
+
+    def shard_names(self) -> List[str]:
+        """Fragmentos existentes en disco."""
+        return sorted(
+            entry for entry in os.listdir(self.root)
+            if not entry.startswith('.') and os.path.isdir(os.path.join(self.root, entry))
+        )
+
+    def _stores(self) -> List[Tuple[str, SharedVectorStore]]:
+        stores = [(name, self.shard(name)) for name in self.shard_names()]
+        if self.legacy_root and os.path.isdir(self.legacy_root):
+            legacy = get_shared_store(self.legacy_root, self.embeddings)
+            if legacy.generation is not None:
+                stores.append((LEGACY_SHARD, legacy))
+        return stores
+
+    @property
+    def has_legacy(self) -> bool:
+        return any(name == LEGACY_SHARD for name, _ in self._stores())
+
+    @property
+    def generation(self) -> Optional[str]:
+        """Identidad de la vista activa (generación de cada fragmento)."""
+        view = self.current()
+        return view.name if view is not None else None
+
+    @property
+    def mismatch(self) -> Optional[str]:
+        """Primer fragmento que no se sirve por usar otro modelo de embeddings."""
+        for _, store in self._stores():
+            if store.mismatch:
+                return store.mismatch
+        return None
+
+    def current(self) -> Optional[ShardedIndex]:
+        """
+        Vista sobre la generación activa de cada fragmento.
+
+        Solo se reconstruye cuando algún fragmento ha publicado; cada
+        fragmento se abre (y se reabre) de forma independiente.
+        """
+        shards = []
+        for name, store in self._stores():
+            index = store.current()
+            if index is not None:
+                shards.append((name, index))
+        if not shards:
+            return None
+
+        view = self._view
+        if view is not None and _same_shards(view.shards, shards):
+            return view
+        with self._lock:
+            if self._view is None or not _same_shards(self._view.shards, shards):
+                self._view = ShardedIndex(self.root, shards)
+            return self._view
+
+    def writer(self, shard: str, reset: bool = False, dedup: bool = False) -> IndexWriter:
+        """Escritor de un solo fragmento: publicar no toca a los demás."""
+        if shard == LEGACY_SHARD:
+            raise ValueError("El índice anterior a la fragmentación es de solo lectura")
+        return self.shard(shard).writer(reset=reset, dedup=dedup)
+
+    def clear(self, shard: Optional[str] = None) -> None:
+        """Vacía un fragmento, o todos (incluido el índice anterior) si no se indica."""
+        for name, store in self._stores():
+            if shard is None or name == shard:
+                store.clear()
+
+
+# ============================================================================
+# REGISTRO POR PROCESO
+# ============================================================================
+
+_SHARDED_STORES: Dict[str, ShardedLibraryStore] = {}
+_SHARDED_STORES_LOCK = threading.Lock()
+
+
+def get_sharded_store(root: str, embeddings, legacy_root: Optional[str] = None) -> ShardedLibraryStore:
+    """ShardedLibraryStore del proceso para una ruta (como get_shared_store)."""
+    key = os.path.realpath(root)
+    with _SHARDED_STORES_LOCK:
+        store = _SHARDED_STORES.get(key)
+        if store is None:
+            store = _SHARDED_STORES[key] = ShardedLibraryStore(key, embeddings, legacy_root)
+        return store
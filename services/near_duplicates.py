@@ -0,0 +1,75 @@
+"""
+🧬 CASI-DUPLICADOS - MinHash + LSH
+Detecta chunks casi idénticos al indexar (cartas de Buffett repetidas,
+ediciones distintas del mismo libro, los textos de sabiduría esenciales)
+para guardar un solo vector canónico por grupo.
+
+- Firma MinHash de 128 permutaciones sobre shingles de 5 palabras
+- LSH de 16 bandas x 8 filas: candidato si coincide alguna banda
+  (P≈0.95 para Jaccard 0.8, P≈0.06 para Jaccard 0.5)
+- Los candidatos se confirman con la Jaccard estimada de la firma completa
+"""
+
+import re
+import zlib
+import hashlib
+from typing import List
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Jaccard estimada a partir de la cual dos chunks son "el mismo"
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class MinHasher:
+    """Firmas MinHash vectorizadas (numpy) con permutaciones fijas por semilla."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+
+    @staticmethod
+    def shingles(text: str) -> List[str]:
+        """Shingles de SHINGLE_SIZE palabras (texto normalizado)."""
+        tokens = _TOKEN_RE.findall(text.lower())
+        if len(tokens) <= SHINGLE_SIZE:
+            return [' '.join(tokens)] if tokens else []
+        return [' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+    def signature(self, text: str) -> np.ndarray:
+        """Firma (num_perm,) uint32 del texto."""
+        shingles = set(self.shingles(text))
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # (a·h + b) mod p, truncado a 32 bits; mínimo por permutación
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """Claves LSH (enteros 64 bits con signo, aptos para SQLite) de cada banda."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=band.to_bytes(2, 'little')).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def estimate_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Jaccard estimada: fracción de permutaciones con el mismo mínimo."""
+    return float(np.mean(sig_a == sig_b))
@@ -1,32 +1,63 @@
 """
 🧠 ORÁCULO V8 - Sistema RAG Mejorado
 Features:
-- Caché de búsquedas
+- Caché semántico de búsquedas (exacto + por similitud de embedding)
 - Logging estructurado
 - Detección de estructura de documentos
 - Extracción inteligente de tablas
+- Registro multi-documento: un índice por filing (hash de contenido),
+  residencia LRU y búsqueda en un documento o en todos los de un ticker
+- Embeddings de SECTION_QUERIES persistidos por modelo: el contexto del
+  comité es una sola búsqueda FAISS sin llamadas de embeddings
+- Chunking por Items del 10-K (1, 1A, 7, 7A, 8): las secciones se leen por
+  metadata, sin búsqueda vectorial
+- Tablas de los estados financieros tipadas y persistidas por filing:
+  cifras exactas por línea y periodo sin búsqueda ni LLM
 """
 
 import os
+import time
 import logging
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Tuple, Iterable, Iterator, Callable
 from dataclasses import dataclass, field
 from datetime import datetime
 
-import streamlit as st
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.docstore.document import Document
-import pdfplumber
-from bs4 import BeautifulSoup
+import numpy as np
+import pandas as pd
 
 from config import PATHS, MODELS, SECTION_QUERIES
+from .vector_store import (
+    get_shared_store, SharedVectorStore, VectorIndex, SearchHit, StorageProfile,
+    embed_texts, embedding_info, fit_dimensions
+)
+from .embeddings import EmbeddingProvider, get_embedding_provider
+from .hybrid_search import hybrid_search_batch
+from .query_cache import SemanticQueryCache, get_query_cache
+from .query_vectors import ConstantQueryVectors, get_constant_vectors
+from .document_registry import DocumentRegistry, get_document_registry, content_id, parse_filename
+from .library_shards import ShardedIndex
+from .pdf_extraction import iter_pdf_pages
+from .filing_parser import parse_filing_html
+from .filing_sections import SectionTracker, SECTION_ITEMS, TRACKED_ITEMS, is_cross_reference, iter_section_chunks
+from .financial_tables import FinancialTable, FinancialTableStore, get_table_store, parse_table
+from .chunking import PageText, StreamingChunker, iter_txt_pages, iter_chunk_batches
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chunks por llamada al proveedor de embeddings durante la ingesta
+EMBED_BATCH_SIZE = 64
+
+# Secciones del contexto financiero del comité
+FINANCIAL_CONTEXT_SECTIONS = ['balance', 'debt', 'rnd', 'mda', 'risks']
+
+# Troceado de los documentos (caracteres)
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 300
+# Cortes anclados al contenido: una enmienda comparte los chunks no modificados
+CHUNK_ANCHOR_PERIOD = 2
+
 
 @dataclass
 class DocumentStructure:
@@ -40,7 +71,15 @@ class DocumentStructure:
     has_mda: bool = False
     has_segments: bool = False
     num_tables: int = 0
+    # Tablas con periodos y cifras reconocidas (en el almacén de tablas)
+    num_financial_tables: int = 0
     num_chunks: int = 0
+    # Chunks copiados de un filing anterior del emisor (sin recalcular embeddings)
+    reused_chunks: int = 0
+    # Items detectados: item -> {section, title, pages, chunks}
+    sections: Dict[str, Dict] = field(default_factory=dict)
+    # Segundos por etapa de la última ingesta (extract_text, extract_tables, index, total)
+    timings: Dict[str, float] = field(default_factory=dict)
     
     def to_dict(self) -> Dict:
         return {
@@ -56,9 +95,34 @@ class DocumentStructure:
             },
             'stats': {
                 'tables': self.num_tables,
-                'chunks': self.num_chunks
-            }
+                'financial_tables': self.num_financial_tables,
+                'chunks': self.num_chunks,
+                'reused_chunks': self.reused_chunks
+            },
+            'items': self.sections,
+            'timings': {stage: round(seconds, 3) for stage, seconds in self.timings.items()}
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DocumentStructure':
+        sections = data.get('sections', {})
+        stats = data.get('stats', {})
+        return cls(
+            filename=data.get('filename', ''),
+            processed_at=data.get('processed_at', datetime.now().isoformat()),
+            has_balance_sheet=sections.get('balance_sheet', False),
+            has_income_statement=sections.get('income_statement', False),
+            has_cash_flow=sections.get('cash_flow', False),
+            has_risk_factors=sections.get('risk_factors', False),
+            has_mda=sections.get('mda', False),
+            has_segments=sections.get('segments', False),
+            num_tables=stats.get('tables', 0),
+            num_financial_tables=stats.get('financial_tables', 0),
+            num_chunks=stats.get('chunks', 0),
+            reused_chunks=stats.get('reused_chunks', 0),
+            sections=data.get('items', {}),
+            timings=data.get('timings', {})
+        )
 
 
 class OraculoV8:
@@ -75,10 +139,11 @@ class OraculoV8:
     
     def __init__(self):
         """Inicializa el Oráculo con configuración desde config.py"""
-        self._embeddings: Optional[OpenAIEmbeddings] = None
-        self._vectorstore: Optional[FAISS] = None
-        self._search_cache: Dict[str, str] = {}
+        self._embeddings: Optional[EmbeddingProvider] = None
+        self._store: Optional[SharedVectorStore] = None
         self._current_structure: Optional[DocumentStructure] = None
+        # Documento del registro sobre el que se busca por defecto
+        self._active_doc_id: Optional[str] = None
         
         # Asegurar directorios
         PATHS.ensure_directories()
@@ -89,18 +154,53 @@ class OraculoV8:
         logger.info("OraculoV8 inicializado correctamente")
     
     @property
-    def embeddings(self) -> OpenAIEmbeddings:
-        """Lazy loading de embeddings"""
+    def embeddings(self) -> EmbeddingProvider:
+        """Lazy loading del proveedor de embeddings configurado"""
         if self._embeddings is None:
-            self._embeddings = OpenAIEmbeddings(
-                model=MODELS.embedding_model
-            )
+            self._embeddings = get_embedding_provider()
         return self._embeddings
     
+    @property
+    def store(self) -> SharedVectorStore:
+        """Índice único anterior al registro de documentos (solo lectura)"""
+        if self._store is None:
+            self._store = get_shared_store(PATHS.vectordb, self.embeddings)
+        return self._store
+    
+    @property
+    def registry(self) -> DocumentRegistry:
+        """Registro de documentos compartido por todas las sesiones del proceso"""
+        return get_document_registry(PATHS.documents, self.embeddings, MODELS.resident_documents)
+    
+    @property
+    def table_store(self) -> FinancialTableStore:
+        """Cifras de las tablas financieras de todos los filings"""
+        return get_table_store(PATHS.documents)
+    
+    @property
+    def section_vectors(self) -> ConstantQueryVectors:
+        """Embeddings de SECTION_QUERIES, calculados una vez por modelo"""
+        return get_constant_vectors(PATHS.query_vectors, self.embeddings, 'sections', SECTION_QUERIES)
+    
+    @property
+    def query_cache(self) -> SemanticQueryCache:
+        """Caché de consultas compartido por las sesiones que usan el documento activo"""
+        return self._target_cache(self._active_doc_id, None)
+    
+    @property
+    def _index(self) -> Optional[VectorIndex]:
+        """Generación activa del documento actual (mapeada en memoria, solo lectura)"""
+        return self._resolve_index(self._active_doc_id, None)
+    
+    @property
+    def active_document(self) -> Optional[Dict]:
+        """Registro del documento activo (None si se usa el índice anterior)"""
+        return self.registry.get(self._active_doc_id) if self._active_doc_id else None
+    
     @property
     def is_loaded(self) -> bool:
         """Verifica si hay datos cargados"""
-        return self._vectorstore is not None
+        return self._index is not None
     
     @property
     def structure(self) -> Optional[DocumentStructure]:
@@ -108,210 +208,356 @@ class OraculoV8:
         return self._current_structure
     
     def _load_vectorstore(self) -> None:
-        """Carga el vectorstore desde disco si existe"""
-        index_path = os.path.join(PATHS.vectordb, "index.faiss")
-        
-        if os.path.exists(index_path):
-            try:
-                self._vectorstore = FAISS.load_local(
-                    PATHS.vectordb,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info(f"Vectorstore cargado desde {PATHS.vectordb}")
-            except Exception as e:
-                logger.error(f"Error cargando vectorstore: {e}")
-                self._vectorstore = None
+        """
+        Activa el documento usado más recientemente; sin registro, abre el
+        índice anterior (solo la primera sesión del proceso lo lee de disco).
+        """
+        try:
+            for doc in self.registry.list_documents(limit=1):
+                if self.activate(doc['doc_id']):
+                    logger.info(f"Documento activo: {doc['filename']} ({doc['doc_id']})")
+                    return
+            if self.store.current() is not None:
+                logger.info(f"Vectorstore disponible desde {PATHS.vectordb} (generación {self.store.generation})")
+        except Exception as e:
+            logger.error(f"Error cargando vectorstore: {e}")
+    
+    # =========================================================================
+    # REGISTRO DE DOCUMENTOS
+    # =========================================================================
     
-    def ingest(self, uploaded_file) -> Tuple[int, DocumentStructure]:
+    def documents(self, ticker: Optional[str] = None) -> List[Dict]:
+        """Documentos ingeridos (de un ticker, si se indica), recientes primero"""
+        return self.registry.list_documents(ticker)
+    
+    def activate(self, doc_id: str) -> bool:
         """
-        Ingesta un documento y lo indexa en el vectorstore.
+        Convierte un documento ya ingerido en el activo sin recalcular nada.
+        
+        Returns:
+            False si el documento no está en el registro
+        """
+        doc = self.registry.get(doc_id)
+        if doc is None or not self.registry.has_document(doc_id):
+            return False
+        self.registry.touch(doc_id)
+        self._active_doc_id = doc_id
+        self._current_structure = (
+            DocumentStructure.from_dict(doc['structure']) if doc['structure']
+            else DocumentStructure(filename=doc['filename'], num_chunks=doc['num_chunks'])
+        )
+        return True
+    
+    def _resolve_index(self, doc_id: Optional[str], ticker: Optional[str]) -> Optional[VectorIndex]:
+        """
+        Índice sobre el que buscar: todos los filings de un ticker (fan-out),
+        un documento concreto o, sin registro, el índice anterior.
+        """
+        if ticker:
+            parts = [
+                (doc['doc_id'], index) for doc in self.registry.list_documents(ticker)
+                if (index := self.registry.index(doc['doc_id'])) is not None
+            ]
+            if not parts:
+                return None
+            if len(parts) == 1:
+                return parts[0][1]
+            return ShardedIndex(PATHS.documents, parts)
+        if doc_id:
+            return self.registry.index(doc_id)
+        return self.store.current()
+    
+    def _target_cache(self, doc_id: Optional[str], ticker: Optional[str]) -> SemanticQueryCache:
+        if ticker:
+            return get_query_cache(f"{PATHS.documents}#{ticker.upper()}")
+        if doc_id:
+            return get_query_cache(os.path.join(PATHS.documents, doc_id))
+        return get_query_cache(PATHS.vectordb)
+    
+    # =========================================================================
+    # INGESTA
+    # =========================================================================
+    
+    def ingest(self, uploaded_file, ticker: Optional[str] = None) -> Tuple[int, DocumentStructure]:
+        """
+        Ingesta un documento en su propio índice del registro y lo activa.
+        
+        La extracción, el chunking y los embeddings se encadenan en streaming
+        (página a página), así que la memoria no crece con el tamaño del PDF.
+        Un documento ya ingerido (mismo contenido) solo se reactiva; una
+        enmienda solo embebe los chunks que cambian respecto al filing
+        anterior del emisor.
         
         Args:
             uploaded_file: Archivo subido via Streamlit
+            ticker: Ticker del emisor (por defecto, deducido del nombre)
             
         Returns:
             Tuple con (número de chunks, estructura del documento)
+        
+        Raises:
+            Exception: si la extracción o el indexado fallan; el documento
+                no queda registrado
         """
         filename = uploaded_file.name
         file_path = os.path.join(PATHS.biblioteca, filename)
+        data = uploaded_file.getbuffer()
+        doc_id = content_id(data)
         
         # Guardar archivo
         with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        logger.info(f"Procesando documento: {filename}")
+            f.write(data)
         
-        # Extraer contenido según tipo
-        text, tables_text, structure = self._extract_content(file_path)
+        if self.activate(doc_id):
+            logger.info(f"Documento ya indexado: {filename} ({doc_id}), sin recalcular embeddings")
+            return self._current_structure.num_chunks, self._current_structure
         
-        # Combinar texto
-        full_text = text
-        if tables_text:
-            full_text += "\n\n=== FINANCIAL TABLES ===\n\n" + tables_text
+        logger.info(f"Procesando documento: {filename} ({doc_id})")
         
-        # Chunking
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,
-            chunk_overlap=300,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = splitter.split_text(full_text)
-        
-        # Crear documentos con metadata
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    'source': filename,
-                    'chunk_id': i,
-                    'total_chunks': len(chunks),
-                    'indexed_at': datetime.now().isoformat()
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
-        
-        # Crear/actualizar vectorstore
-        self._vectorstore = FAISS.from_documents(docs, self.embeddings)
-        self._vectorstore.save_local(PATHS.vectordb)
-        
-        # Actualizar estructura
-        structure.num_chunks = len(chunks)
-        self._current_structure = structure
-        
-        # Limpiar caché de búsquedas
-        self._search_cache.clear()
-        
-        logger.info(f"Documento indexado: {len(chunks)} chunks")
+        # Extraer contenido según tipo (la estructura se completa al consumir las páginas)
+        structure = DocumentStructure(filename=filename)
+        tables: List[FinancialTable] = []
+        pages = self._iter_content_pages(file_path, structure, tables)
+        try:
+            self._build_document(doc_id, pages, {'source': filename}, structure, ticker, tables)
+        except Exception as e:
+            # Sin publicar ni registrar: una nueva subida vuelve a extraer
+            logger.error(f"Error procesando {filename}: {e}")
+            self.registry.remove(doc_id)
+            self.table_store.remove(doc_id)
+            raise
         
-        return len(chunks), structure
+        return structure.num_chunks, structure
     
-    def ingest_text(self, text: str, filename: str) -> int:
+    def ingest_text(self, text: str, filename: str, ticker: Optional[str] = None,
+                    tables: Optional[List[FinancialTable]] = None) -> int:
         """
         Ingesta texto crudo directamente (ej: desde SEC Analyzer).
         
         Args:
             text: Texto a indexar
             filename: Nombre del archivo virtual
+            ticker: Ticker del emisor (por defecto, deducido del nombre)
+            tables: Tablas financieras ya tipadas del filing (SECFiling.tables)
             
         Returns:
             Número de chunks indexados
         """
-        logger.info(f"Procesando texto de SEC: {filename}")
+        doc_id = content_id(text.encode('utf-8'))
+        if self.activate(doc_id):
+            logger.info(f"Texto de SEC ya indexado: {filename} ({doc_id})")
+            return self._current_structure.num_chunks
+        
+        logger.info(f"Procesando texto de SEC: {filename} ({doc_id})")
         
-        # Chunking
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000,
-            chunk_overlap=300,
-            separators=["\n\n", "\n", ". ", " ", ""]
+        # Crear estructura dummy
+        structure = DocumentStructure(filename=filename)
+        structure.num_tables = len(tables or [])
+        self._build_document(
+            doc_id, [PageText(1, text)], {'source': filename, 'type': 'sec_filing'}, structure, ticker, tables
         )
-        chunks = splitter.split_text(text)
-        
-        # Crear documentos
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    'source': filename,
-                    'chunk_id': i,
-                    'total_chunks': len(chunks),
-                    'indexed_at': datetime.now().isoformat(),
-                    'type': 'sec_filing'
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
         
-        # Crear/actualizar vectorstore
-        self._vectorstore = FAISS.from_documents(docs, self.embeddings)
-        self._vectorstore.save_local(PATHS.vectordb)
+        return structure.num_chunks
+    
+    def _build_document(self, doc_id: str, pages: Iterable[PageText], base_metadata: Dict,
+                        structure: DocumentStructure, ticker: Optional[str],
+                        tables: Optional[List[FinancialTable]] = None) -> DocumentStructure:
+        """
+        Indexa las páginas en el almacén del documento, guarda sus tablas
+        financieras (se rellenan al consumir `pages`), lo registra y lo activa.
+        """
+        start = time.perf_counter()
+        parsed = parse_filename(structure.filename)
+        ticker = ticker or parsed['ticker']
+        
+        # Índice propio del documento, troceado por Items y publicado como generación nueva
+        tracker = SectionTracker()
+        structure.num_chunks, structure.reused_chunks = self._index_pages(
+            pages, {**base_metadata, 'doc_id': doc_id}, doc_id,
+            base=self._reuse_base(doc_id, ticker, parsed['form_type']), tracker=tracker
+        )
+        structure.sections = {item: span.to_dict() for item, span in tracker.spans.items()}
+        structure.has_risk_factors = structure.has_risk_factors or '1A' in tracker.spans
+        structure.has_mda = structure.has_mda or '7' in tracker.spans
+        
+        # Cifras tipadas de los estados financieros
+        tables = tables or []
+        structure.num_financial_tables = len(tables)
+        facts = self.table_store.replace(doc_id, tables, ticker=ticker)
+        if tables:
+            logger.info(f"Tablas financieras: {len(tables)} tablas, {facts} cifras")
+        
+        # Tiempos por etapa (la extracción se solapa con el indexado en streaming)
+        timings = structure.timings
+        timings['total'] = time.perf_counter() - start
+        timings['index'] = max(0.0, timings['total'] - timings.get('extract_text', 0.0) - timings.get('extract_tables', 0.0))
+        logger.info("Ingesta por etapas: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+        
+        # Registrar y activar
+        self.registry.register(doc_id, structure.filename, structure.num_chunks, structure.to_dict(), ticker=ticker)
+        self._active_doc_id = doc_id
+        self._current_structure = structure
         
-        # Limpiar caché
-        self._search_cache.clear()
+        # Limpiar caché de búsquedas del documento
+        self.query_cache.invalidate()
         
-        # Crear estructura dummy
-        self._current_structure = DocumentStructure(
-            filename=filename,
-            num_chunks=len(chunks)
+        logger.info(
+            f"Documento indexado: {structure.num_chunks} chunks "
+            f"({structure.reused_chunks} reutilizados de un filing anterior)"
         )
+        return structure
+    
+    def _reuse_base(self, doc_id: str, ticker: Optional[str],
+                    form_type: Optional[str]) -> Optional[Tuple[VectorIndex, Dict[str, int]]]:
+        """
+        Filing previo del mismo emisor cuyos vectores se pueden reutilizar
+        (mismo modelo y perfil de almacenamiento): índice y hash -> vector_id.
+        """
+        base = self.registry.find_base(ticker, form_type, exclude=doc_id)
+        if base is None:
+            return None
+        index = self.registry.index(base['doc_id'])
+        if (index is None
+                or index.embedding_model != embedding_info(self.embeddings).get('embedding_model')
+                or index.profile != StorageProfile.from_config()):
+            return None
+        chunk_ids = self.registry.chunk_ids(base['doc_id'])
+        if not chunk_ids:
+            return None
+        logger.info(f"Reutilizando chunks sin cambios de {base['filename']} ({base['doc_id']})")
+        return index, chunk_ids
+    
+    def _index_pages(self, pages: Iterable[PageText], base_metadata: Dict, doc_id: str,
+                     base: Optional[Tuple[VectorIndex, Dict[str, int]]] = None,
+                     tracker: Optional[SectionTracker] = None) -> Tuple[int, int]:
+        """
+        Chunking + embeddings en lotes sobre un flujo de páginas y publicación
+        de la generación nueva en el almacén del documento.
         
-        logger.info(f"Texto indexado: {len(chunks)} chunks")
+        Los chunks no cruzan Items del 10-K y llevan en su metadata el Item
+        ('item'), su nombre ('section') y su posición en él ('section_chunk').
         
-        return len(chunks)
-        """
-        Extrae contenido de un archivo.
+        Cada chunk se identifica por el hash de su texto: los que ya están en
+        `base` (p.ej. el 10-K que corrige una 10-K/A) copian su vector en vez
+        de embeberse.
         
         Returns:
-            Tuple con (texto principal, texto de tablas, estructura)
+            (chunks indexados, chunks reutilizados)
         """
-        filename = os.path.basename(file_path)
-        structure = DocumentStructure(filename=filename)
-        text = ""
-        tables_text = ""
-        
-        try:
-            if file_path.endswith('.pdf'):
-                text, tables_text, structure = self._extract_pdf(file_path, structure)
-            elif file_path.endswith('.html') or file_path.endswith('.htm'):
-                text, tables_text, structure = self._extract_html(file_path, structure)
-            else:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    text = f.read()
-        except Exception as e:
-            logger.error(f"Error extrayendo contenido: {e}")
-            text = f"Error procesando archivo: {str(e)}"
-        
-        return text, tables_text, structure
-    
-    def _extract_pdf(self, file_path: str, structure: DocumentStructure) -> Tuple[str, str, DocumentStructure]:
-        """Extrae contenido de PDF"""
-        text_parts = []
-        tables_text = ""
-        
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                # Texto
-                page_text = page.extract_text() or ""
-                text_parts.append(page_text)
-                
-                # Tablas
-                tables = page.extract_tables()
-                for table in tables:
-                    structure.num_tables += 1
-                    tables_text += f"\n--- Table ---\n"
-                    for row in table:
-                        if row:
-                            tables_text += " | ".join([str(cell) if cell else "" for cell in row]) + "\n"
-        
-        text = "\n".join(text_parts)
-        structure = self._detect_sections(text, structure)
-        
-        return text, tables_text, structure
-    
-    def _extract_html(self, file_path: str, structure: DocumentStructure) -> Tuple[str, str, DocumentStructure]:
-        """Extrae contenido de HTML (típico 10-K de SEC)"""
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-        
-        # Extraer tablas primero
-        tables_text = ""
-        for idx, table in enumerate(soup.find_all('table')):
-            structure.num_tables += 1
-            tables_text += f"\n--- Table {idx + 1} ---\n"
+        chunker = StreamingChunker(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            separators=["\n\n", "\n", ". ", " "],
+            anchor_period=CHUNK_ANCHOR_PERIOD
+        )
+        indexed_at = datetime.now().isoformat()
+        base_index, base_ids = base or (None, {})
+        
+        with self.registry.store(doc_id).writer(reset=True) as writer:
+            chunk_hashes: List[Tuple[str, int]] = []
+            num_chunks = 0
+            reused = 0
+            chunks = iter_section_chunks(pages, chunker, tracker)
+            for batch in iter_chunk_batches(chunks, EMBED_BATCH_SIZE):
+                texts = [chunk.text for chunk in batch]
+                hashes = [content_id(text.encode('utf-8')) for text in texts]
+                metadatas = [
+                    {
+                        **base_metadata,
+                        'chunk_id': chunk.index,
+                        'chunk_hash': chunk_hash,
+                        'item': chunk.section,
+                        'section': TRACKED_ITEMS.get(chunk.section),
+                        'section_chunk': chunk.section_position,
+                        'page_start': chunk.page_start,
+                        'page_end': chunk.page_end,
+                        'indexed_at': indexed_at
+                    }
+                    for chunk, chunk_hash in zip(batch, hashes)
+                ]
+            
+                # Solo se embeben los chunks nuevos o modificados
+                known = [i for i, chunk_hash in enumerate(hashes) if chunk_hash in base_ids]
+                fresh = [i for i, chunk_hash in enumerate(hashes) if chunk_hash not in base_ids]
+                vectors: List[Optional[np.ndarray]] = [None] * len(batch)
+                if known:
+                    for i, vector in zip(known, base_index.reconstruct([base_ids[hashes[i]] for i in known])):
+                        vectors[i] = vector
+                if fresh:
+                    embedded = writer.profile.apply(embed_texts(self.embeddings, [texts[i] for i in fresh]))
+                    for i, vector in zip(fresh, embedded):
+                        vectors[i] = vector
+            
+                ids = writer.add_vectors(np.vstack(vectors).astype(np.float32), texts, metadatas)
+                chunk_hashes.extend(zip(hashes, ids))
+                num_chunks += len(batch)
+                reused += len(known)
+            writer.commit()
+        self.registry.record_chunks(doc_id, chunk_hashes)
+        
+        return num_chunks, reused
+    
+    def _iter_content_pages(self, file_path: str, structure: DocumentStructure,
+                            tables: List[FinancialTable]) -> Iterator[PageText]:
+        """
+        Páginas de un archivo según su tipo. Rellena `structure` y `tables`
+        (tablas financieras tipadas) a medida que se consumen.
+
+        Un error de extracción se propaga: el mensaje no debe indexarse como
+        contenido del documento.
+        """
+        if file_path.endswith('.pdf'):
+            yield from self._iter_pdf_pages(file_path, structure, tables)
+        elif file_path.endswith('.html') or file_path.endswith('.htm'):
+            yield from self._iter_html_pages(file_path, structure, tables)
+        else:
+            yield from iter_txt_pages(file_path)
+    
+    def _iter_pdf_pages(self, file_path: str, structure: DocumentStructure,
+                        tables: List[FinancialTable]) -> Iterator[PageText]:
+        """
+        Extrae contenido de PDF por rangos de páginas en paralelo (texto en
+        todas, tablas solo en las de estados financieros), en orden de página.
+        """
+        for page in iter_pdf_pages(file_path, MODELS.pdf_workers, structure.timings):
+            page_text = page.text
+            
+            # Tablas (junto al texto de su página, para conservar la cita)
+            tables_text = ""
+            for table in page.tables:
+                structure.num_tables += 1
+                parsed = parse_table(table, context=page_text, page=page.number)
+                if parsed is not None:
+                    tables.append(parsed)
+                tables_text += f"\n--- Table ---\n"
+                for row in table:
+                    if row:
+                        tables_text += " | ".join([str(cell) if cell else "" for cell in row]) + "\n"
             
-            for row in table.find_all('tr'):
-                cols = [cell.get_text(strip=True) for cell in row.find_all(['td', 'th'])]
-                if any(cols):  # Solo filas con contenido
-                    tables_text += " | ".join(cols) + "\n"
+            self._detect_sections(page_text, structure)
+            if tables_text:
+                page_text += "\n\n=== FINANCIAL TABLES ===\n" + tables_text
+            if page_text.strip():
+                yield PageText(page.number, page_text)
+    
+    def _iter_html_pages(self, file_path: str, structure: DocumentStructure,
+                         tables: List[FinancialTable]) -> Iterator[PageText]:
+        """
+        Extrae contenido de HTML (típico 10-K de SEC) en una sola pasada
+        lxml: texto con las tablas en su sitio y tablas financieras tipadas.
+        """
+        with open(file_path, 'rb') as f:
+            parsed = parse_filing_html(f.read())
         
-        # Texto principal
-        text = soup.get_text(separator='\n')
+        structure.num_tables += parsed.num_tables
+        tables.extend(parsed.tables)
         
         # Detectar secciones
-        structure = self._detect_sections(text, structure)
+        self._detect_sections(parsed.text, structure)
         
-        return text, tables_text, structure
+        # HTML no tiene páginas: todo el documento como una sola "página"
+        if parsed.text:
+            yield PageText(1, parsed.text)
     
     def _detect_sections(self, text: str, structure: DocumentStructure) -> DocumentStructure:
         """Detecta secciones comunes en documentos financieros"""
@@ -332,67 +578,259 @@ class OraculoV8:
         
         return structure
     
-    @st.cache_data(ttl=300, show_spinner=False)
-    def search(_self, query: str, k: int = 5) -> str:
+    # =========================================================================
+    # BÚSQUEDA
+    # =========================================================================
+    
+    def search(self, query: str, k: int = 5, doc_id: Optional[str] = None, ticker: Optional[str] = None) -> str:
         """
-        Búsqueda semántica en el vectorstore.
+        Búsqueda híbrida (BM25 + semántica) en el vectorstore.
         
         Args:
             query: Consulta de búsqueda
             k: Número de resultados
+            doc_id: Documento concreto (por defecto, el activo)
+            ticker: Buscar en todos los filings de este ticker
             
         Returns:
             Texto concatenado de los resultados
         """
-        if not _self._vectorstore:
-            return "⚠️ No hay documentos cargados en el Oráculo. Sube un 10-K primero."
+        return self.search_batch([query], k=k, doc_id=doc_id, ticker=ticker)[0]
+    
+    def search_batch(self, queries: List[str], k: int = 5,
+                     doc_id: Optional[str] = None, ticker: Optional[str] = None) -> List[str]:
+        """
+        N búsquedas en una sola ida y vuelta: un lote de embeddings para las
+        consultas no cacheadas y una búsqueda FAISS matricial.
         
-        # Verificar caché
-        cache_key = f"{query}_{k}"
-        if cache_key in _self._search_cache:
-            return _self._search_cache[cache_key]
+        Args:
+            queries: Consultas de búsqueda
+            k: Número de resultados por consulta
+            doc_id: Documento concreto (por defecto, el activo)
+            ticker: Buscar en todos los filings de este ticker (fan-out)
+            
+        Returns:
+            Texto concatenado de los resultados de cada consulta, en orden
+        """
+        return self._cached_batch(queries, (k,), doc_id, ticker, lambda index, positions, vectors, cite:
+            self._run_search_batch(index, [queries[i] for i in positions], k, vectors, cite))
+    
+    def _cached_batch(self, queries: List[str], params: Tuple, doc_id: Optional[str], ticker: Optional[str],
+                      compute_fn: Callable) -> List[str]:
+        """
+        Resuelve el índice destino y pasa las consultas por su caché.
+        compute_fn(index, posiciones, vectores, cite) calcula los fallos.
+        """
+        doc_id = doc_id or self._active_doc_id
+        try:
+            index = self._resolve_index(doc_id, ticker)
+        except Exception as e:
+            logger.error(f"Error abriendo índice: {e}")
+            index = None
+        if not index:
+            return ["⚠️ No hay documentos cargados en el Oráculo. Sube un 10-K primero."] * len(queries)
         
+        # En fan-out cada fragmento se cita con su filing de origen
+        cite = isinstance(index, ShardedIndex)
         try:
-            docs = _self._vectorstore.similarity_search(query, k=k)
-            result = "\n\n---\n\n".join([doc.page_content for doc in docs])
-            
-            # Guardar en caché
-            _self._search_cache[cache_key] = result
-            
-            return result
+            # Caché semántico compartido (se invalida solo al cambiar de generación);
+            # las consultas de sección no llaman al proveedor de embeddings
+            return self._target_cache(doc_id, ticker).get_or_compute_many(
+                index.name, queries, [params] * len(queries),
+                embed_fn=self.section_vectors.embed,
+                compute_fn=lambda positions, vectors: compute_fn(index, positions, vectors, cite)
+            )
         except Exception as e:
             logger.error(f"Error en búsqueda: {e}")
-            return f"Error en búsqueda: {str(e)}"
+            return [f"Error en búsqueda: {str(e)}"] * len(queries)
+    
+    def _run_search_batch(self, index: VectorIndex, queries: List[str], k: int, query_vectors,
+                          cite: bool = False) -> List[str]:
+        all_hits = [
+            hits[:k] for hits in
+            hybrid_search_batch(index, self.embeddings, queries, [k] * len(queries), query_vectors=query_vectors)
+        ]
+        index.fill_texts([hit for hits in all_hits for hit in hits])
+        return [self._format_hits(hits, cite) for hits in all_hits]
     
-    def search_section(self, section_type: str) -> str:
+    def _run_sections(self, index: VectorIndex, section_types: List[str], queries: List[str], k: int,
+                      query_vectors: np.ndarray, cite: bool = False, dedup: bool = False) -> List[str]:
+        """
+        Secciones de un filing. Con dedup, los candidatos se reparten por
+        rango (el mejor rango de cada sección primero) y un chunk ya asignado
+        cede su hueco al siguiente candidato.
+        """
+        candidates = self._section_candidates(index, section_types, queries, k, query_vectors)
+        if dedup:
+            selected: List[List[SearchHit]] = [[] for _ in queries]
+            claimed = set()
+            for rank in range(max((len(hits) for hits in candidates), default=0)):
+                for section, hits in enumerate(candidates):
+                    if rank >= len(hits) or len(selected[section]) >= k:
+                        continue
+                    hit = hits[rank]
+                    if hit.vector_id not in claimed:
+                        claimed.add(hit.vector_id)
+                        selected[section].append(hit)
+        else:
+            selected = [hits[:k] for hits in candidates]
+        index.fill_texts([hit for hits in selected for hit in hits])
+        return [self._format_hits(hits, cite) for hits in selected]
+    
+    def _section_candidates(self, index: VectorIndex, section_types: List[str], queries: List[str], k: int,
+                            query_vectors: np.ndarray) -> List[List[SearchHit]]:
+        """
+        Candidatos de cada sección. Si el filing tiene marcado su Item, es
+        una consulta de metadata (en orden de documento, u ordenada por
+        similitud con la consulta de sección dentro del Item); si no, la
+        búsqueda híbrida por lotes de siempre.
+        """
+        limit = k * len(section_types)
+        candidates: List[Optional[List[SearchHit]]] = [None] * len(section_types)
+        for position, section_type in enumerate(section_types):
+            items, ranked = SECTION_ITEMS.get(section_type, ((), True))
+            ids = index.docstore.ids_where('item', list(items), below=index.ntotal) if items else []
+            if not ids:
+                continue
+            # Solo una remisión ("included in Part IV, Item 15"): como si el
+            # Item no estuviera (un Item largo ni se lee)
+            if len(ids) <= 2 and is_cross_reference(index.docstore.get_texts(ids).values()):
+                continue
+            # Varios filings: el orden de documento solo vería el primero
+            if ranked or isinstance(index, ShardedIndex):
+                query = fit_dimensions(query_vectors[position:position + 1], index.dimension)[0]
+                scores = index.reconstruct(ids) @ query
+                order = np.argsort(-scores, kind='stable')[:limit]
+                candidates[position] = [SearchHit(vector_id=ids[j], score=float(scores[j]), metadata={}) for j in order]
+            else:
+                candidates[position] = [SearchHit(vector_id=vid, score=1.0, metadata={}) for vid in ids[:limit]]
+        
+        direct = [hit for hits in candidates if hits for hit in hits]
+        if direct:
+            metadata = index.docstore.get_metadata([hit.vector_id for hit in direct])
+            for hit in direct:
+                hit.metadata = metadata.get(hit.vector_id, {})
+        
+        # Secciones sin Item en este filing (10-Q, filings antiguos, remisiones): búsqueda híbrida
+        fallback = [position for position, hits in enumerate(candidates) if hits is None]
+        if fallback:
+            searched = hybrid_search_batch(
+                index, self.embeddings, [queries[i] for i in fallback], [k] * len(fallback),
+                query_vectors=query_vectors[fallback]
+            )
+            for position, hits in zip(fallback, searched):
+                candidates[position] = hits
+        return candidates
+    
+    @staticmethod
+    def _format_hits(hits: List, cite: bool) -> str:
+        if cite:
+            return "\n\n---\n\n".join([f"[{hit.metadata.get('source', '?')}]\n{hit.content}" for hit in hits])
+        return "\n\n---\n\n".join([hit.content for hit in hits])
+    
+    def search_section(self, section_type: str, doc_id: Optional[str] = None, ticker: Optional[str] = None) -> str:
         """
         Búsqueda dirigida por tipo de sección.
         
         Args:
             section_type: Tipo de sección (balance, income, cashflow, etc.)
+            doc_id: Documento concreto (por defecto, el activo)
+            ticker: Buscar en todos los filings de este ticker
             
         Returns:
             Texto de la sección encontrada
         """
-        query = SECTION_QUERIES.get(section_type, section_type)
-        return self.search(query, k=5)
+        return self.search_sections([section_type], doc_id=doc_id, ticker=ticker)[section_type]
+    
+    def search_sections(self, section_types: List[str], doc_id: Optional[str] = None,
+                        ticker: Optional[str] = None, dedup: bool = False, k: int = 5) -> Dict[str, str]:
+        """
+        Varias secciones de una vez: lectura directa de los Items marcados
+        al ingerir (SECTION_ITEMS) y una búsqueda por lotes para el resto.
+        
+        Args:
+            dedup: Un chunk aparece solo en la sección donde mejor se clasifica
+        """
+        queries = [SECTION_QUERIES.get(s, s) for s in section_types]
+        if not dedup:
+            def compute(index, positions, vectors, cite):
+                return self._run_sections(
+                    index, [section_types[i] for i in positions], [queries[i] for i in positions], k, vectors, cite
+                )
+            results = self._cached_batch(queries, (k, 'section'), doc_id, ticker, compute)
+            return dict(zip(section_types, results))
+        
+        # El reparto depende del conjunto de secciones: se calcula siempre
+        # entero y se cachea con las secciones como parámetro
+        def compute_all(index, positions, _vectors, cite):
+            texts = self._run_sections(
+                index, section_types, queries, k, self.section_vectors.embed(queries), cite, dedup=True
+            )
+            return [texts[i] for i in positions]
+        
+        results = self._cached_batch(queries, (k, 'dedup', tuple(section_types)), doc_id, ticker, compute_all)
+        return dict(zip(section_types, results))
     
-    def get_financial_context(self) -> Dict[str, str]:
+    def get_financial_context(self, doc_id: Optional[str] = None, ticker: Optional[str] = None) -> Dict[str, str]:
         """
         Obtiene contexto financiero completo para el comité.
         
+        Las cinco secciones se leen de sus Items (o, si el filing no los
+        tiene, en una única búsqueda FAISS con los embeddings persistidos de
+        SECTION_QUERIES), sin chunks repetidos entre secciones.
+        
+        Args:
+            doc_id: Documento concreto (por defecto, el activo)
+            ticker: Contexto agregado de todos los filings de este ticker
+        
         Returns:
             Dict con contexto de value, growth y risk
         """
+        sections = self.search_sections(FINANCIAL_CONTEXT_SECTIONS, doc_id=doc_id, ticker=ticker, dedup=True)
         return {
-            'value': self.search_section('balance') + "\n\n" + self.search_section('debt'),
-            'growth': self.search_section('rnd') + "\n\n" + self.search_section('mda'),
-            'risk': self.search_section('risks')
+            'value': sections['balance'] + "\n\n" + sections['debt'],
+            'growth': sections['rnd'] + "\n\n" + sections['mda'],
+            'risk': sections['risks']
         }
     
+    # =========================================================================
+    # CIFRAS FINANCIERAS (tablas tipadas)
+    # =========================================================================
+
+    def financial_facts(self, line_item: str, period: Optional[str] = None,
+                        doc_id: Optional[str] = None, ticker: Optional[str] = None) -> pd.DataFrame:
+        """
+        Cifras de una línea de los estados financieros, sin búsqueda ni LLM.
+
+        Args:
+            line_item: Línea ("Total revenues", "net income")
+            period: Año fiscal ("2023") o fecha de cierre ("2023-12-31")
+            doc_id: Documento concreto (por defecto, el activo)
+            ticker: Todos los filings de este ticker
+
+        Returns:
+            DataFrame en formato largo (line_item, period, duration, value, unit...)
+        """
+        doc_id = None if ticker else (doc_id or self._active_doc_id)
+        return self.table_store.query(line_item, period, doc_id=doc_id, ticker=ticker)
+
+    def financial_value(self, line_item: str, period: str, doc_id: Optional[str] = None,
+                        duration: Optional[str] = None) -> Optional[float]:
+        """Cifra exacta (ya escalada a unidades) de una línea y periodo del documento."""
+        doc_id = doc_id or self._active_doc_id
+        if not doc_id:
+            return None
+        return self.table_store.value(doc_id, line_item, period, duration)
+
+    def financial_tables(self, doc_id: Optional[str] = None) -> List[Dict]:
+        """Tablas financieras reconocidas del documento (título, página, periodos)."""
+        doc_id = doc_id or self._active_doc_id
+        return self.table_store.tables(doc_id) if doc_id else []
+
     def clear_cache(self) -> None:
         """Limpia el caché de búsquedas"""
-        self._search_cache.clear()
-        # También limpiar caché de Streamlit si existe
-        if hasattr(st, 'cache_data'):
-            st.cache_data.clear()
+        self.query_cache.invalidate()
+    
+    def cache_stats(self) -> Dict:
+        """Aciertos del caché de consultas y latencia ahorrada"""
+        return self.query_cache.stats()
@@ -0,0 +1,236 @@
+"""
+📑 EXTRACCIÓN PARALELA DE PDFs
+Un 10-K de 150-300 páginas se reparte en rangos de páginas entre procesos:
+
+1. Pasada rápida de solo texto en todos los rangos
+2. extract_tables solo en las páginas que parecen estados financieros
+   (se lanza por rango en cuanto termina su texto)
+3. Cada rango se entrega, en orden de página, en cuanto su texto y sus
+   tablas están listos: el indexado empieza sin esperar al resto del PDF
+   y solo hay unos pocos rangos en vuelo a la vez
+
+pdfplumber es Python puro y sujeto al GIL: los hilos no ayudan, los
+procesos sí. El pool se crea una vez por proceso (arrancar los workers
+cuesta más que un rango de páginas) y los documentos pequeños se extraen
+en el propio proceso.
+"""
+
+import re
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pdfplumber
+
+logger = logging.getLogger(__name__)
+
+# Páginas por tarea (un PDF se abre una vez por tarea)
+PAGES_PER_TASK = 16
+
+# Por debajo de este número de páginas no compensa arrancar procesos
+MIN_PARALLEL_PAGES = 24
+
+# Rangos en vuelo por proceso por delante de la página que se está entregando
+LOOKAHEAD_PER_WORKER = 2
+
+_STATEMENT_RE = re.compile(
+    r"consolidated\s+(?:balance\s+sheets?|statements?\s+of\s+(?:operations|income|cash\s+flows?|"
+    r"comprehensive\s+income|(?:stockholders|shareholders)['’]?\s+equity))|"
+    r"\((?:in|dollars\s+in)\s+(?:millions|thousands|billions)|"
+    r"balance\s+sheets?|statements?\s+of\s+cash\s+flows?",
+    re.IGNORECASE
+)
+_NUMBER_RE = re.compile(r'\(?\$?\d{1,3}(?:,\d{3})+(?:\.\d+)?\)?|\(?\d+\.\d+\)?')
+
+# Densidad mínima de cifras por línea para considerar tabla una página sin título reconocible
+NUMERIC_DENSITY = 1.5
+
+Table = List[List[Optional[str]]]
+
+
+@dataclass
+class ExtractedPage:
+    """Página extraída: texto y, si parecía un estado financiero, sus tablas."""
+    number: int
+    text: str
+    tables: List[Table] = field(default_factory=list)
+
+
+def looks_financial(text: str) -> bool:
+    """Heurística barata: título de estado financiero o muchas cifras por línea."""
+    if _STATEMENT_RE.search(text):
+        return True
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return False
+    return len(_NUMBER_RE.findall(text)) / len(lines) >= NUMERIC_DENSITY
+
+
+# ============================================================================
+# TAREAS (nivel de módulo para poder enviarlas a otros procesos)
+# ============================================================================
+
+def _extract_text_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Texto de las páginas [start, end) (índices desde 0)."""
+    pages = []
+    with pdfplumber.open(file_path) as pdf:
+        for index in range(start, min(end, len(pdf.pages))):
+            page = pdf.pages[index]
+            pages.append((index + 1, page.extract_text() or ""))
+            # pdfplumber retiene los objetos parseados de cada página
+            page.flush_cache()
+    return pages
+
+
+def _extract_table_pages(file_path: str, numbers: List[int]) -> Dict[int, List[Table]]:
+    """Tablas de las páginas indicadas (números desde 1)."""
+    tables = {}
+    with pdfplumber.open(file_path) as pdf:
+        for number in numbers:
+            page = pdf.pages[number - 1]
+            found = page.extract_tables()
+            page.flush_cache()
+            if found:
+                tables[number] = found
+    return tables
+
+
+def page_count(file_path: str) -> int:
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+# ============================================================================
+# POOL POR PROCESO
+# ============================================================================
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            # spawn: el proceso padre tiene hilos (Streamlit, FAISS) y fork no es seguro
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================================
+# EXTRACCIÓN
+# ============================================================================
+
+def iter_pdf_pages(file_path: str, workers: int = 4,
+                   timings: Optional[Dict[str, float]] = None) -> Iterator[ExtractedPage]:
+    """
+    Páginas de un PDF en orden, con tablas solo en las de estados financieros.
+
+    Args:
+        workers: Procesos (1 = extracción en el propio proceso)
+        timings: Si se pasa, recibe los segundos de 'extract_text' y
+            'extract_tables' (en paralelo, solo lo que las tablas añaden
+            tras la pasada de texto)
+    """
+    timings = timings if timings is not None else {}
+    total = page_count(file_path)
+    ranges = [(start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)]
+
+    if workers <= 1 or total < MIN_PARALLEL_PAGES:
+        yield from _iter_serial(file_path, ranges, timings)
+        return
+
+    start_time = time.perf_counter()
+    # Fin de cada rango de texto: 'extract_text' es lo que tarda la pasada de texto
+    finished: List[float] = []
+    lookahead = max(2, workers * LOOKAHEAD_PER_WORKER)
+    text_futures: Dict[int, Future] = {}
+    table_futures: Dict[int, Future] = {}
+    scanned = set()
+    pool = _get_pool(workers)
+
+    def scan(position: int) -> None:
+        """Lanza las tablas de un rango en cuanto su texto está listo."""
+        scanned.add(position)
+        financial = [number for number, text in text_futures[position].result() if looks_financial(text)]
+        if financial:
+            table_futures[position] = pool.submit(_extract_table_pages, file_path, financial)
+
+    # Solo cuenta la espera por tablas: el consumidor indexa entre yields
+    timings['extract_tables'] = 0.0
+    position = 0
+    submitted = 0
+    try:
+        while position < len(ranges):
+            try:
+                # Como mucho `lookahead` rangos por delante del consumidor (memoria acotada)
+                while submitted < len(ranges) and submitted < position + lookahead:
+                    start, end = ranges[submitted]
+                    future = pool.submit(_extract_text_range, file_path, start, end)
+                    future.add_done_callback(lambda _: finished.append(time.perf_counter()))
+                    text_futures[submitted] = future
+                    submitted += 1
+                # Mientras se espera el rango actual, cada rango que termina lanza sus tablas
+                while True:
+                    for ready in [i for i, future in text_futures.items() if future.done() and i not in scanned]:
+                        scan(ready)
+                    if position in scanned:
+                        break
+                    wait([future for i, future in text_futures.items() if i not in scanned],
+                         return_when=FIRST_COMPLETED)
+                pages = text_futures[position].result()
+                wait_start = time.perf_counter()
+                tables = table_futures.pop(position).result() if position in table_futures else {}
+                timings['extract_tables'] += time.perf_counter() - wait_start
+            except BrokenProcessPool as e:
+                # Los rangos ya entregados no se repiten: se sigue en el propio proceso
+                logger.warning(f"Pool de extracción caído ({e}); extracción secuencial desde la página {ranges[position][0] + 1}")
+                _discard_pool(pool)
+                yield from _iter_serial(file_path, ranges[position:], timings)
+                return
+            del text_futures[position]
+            position += 1
+            for number, text in pages:
+                yield ExtractedPage(number, text, tables.get(number, []))
+    finally:
+        # Consumidor que abandona a medias: no dejar tareas pendientes en el pool
+        for future in list(text_futures.values()) + list(table_futures.values()):
+            future.cancel()
+
+    timings['extract_text'] = (max(finished) if finished else time.perf_counter()) - start_time
+    logger.info(
+        f"PDF extraído en paralelo: {total} páginas, {len(ranges)} rangos, {workers} procesos"
+    )
+
+
+def _iter_serial(file_path: str, ranges: List[Tuple[int, int]],
+                 timings: Dict[str, float]) -> Iterator[ExtractedPage]:
+    timings.setdefault('extract_text', 0.0)
+    timings.setdefault('extract_tables', 0.0)
+    for start, end in ranges:
+        t0 = time.perf_counter()
+        pages = _extract_text_range(file_path, start, end)
+        t1 = time.perf_counter()
+        financial = [number for number, text in pages if looks_financial(text)]
+        tables = _extract_table_pages(file_path, financial) if financial else {}
+        timings['extract_text'] += t1 - t0
+        timings['extract_tables'] += time.perf_counter() - t1
+        for number, text in pages:
+            yield ExtractedPage(number, text, tables.get(number, []))
@@ -0,0 +1,291 @@
+"""
+🧠 CACHÉ SEMÁNTICO DE CONSULTAS
+Usuarios y agentes repiten preguntas casi idénticas ("how much debt does
+it have" / "total debt and leverage"): cada una cuesta un embedding y una
+búsqueda. Dos niveles:
+
+1. Exacto: texto normalizado (+ parámetros) → resultados, sin embedding
+2. Semántico: embedding de la consulta → resultados de una consulta previa
+   con similitud coseno >= umbral (búsqueda sobre las consultas pasadas) y
+   los mismos números e Items: "revenue 2022" / "revenue 2023" o "Item 7" /
+   "Item 7A" superan el umbral pero piden otros chunks
+
+Las entradas pertenecen a una generación del índice: cuando cambia la
+generación, el caché se vacía. Registra tasa de aciertos y latencia ahorrada.
+"""
+
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+# Coseno mínimo para reutilizar los resultados de otra consulta
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+_PUNCT_RE = re.compile(r'[^\w\s"]', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+# Tokens que fijan el contenido pedido: "item 7a", años, cifras, "q3", "fy2023"
+_ANCHOR_RE = re.compile(r'\bitem \w+|\b\w*\d\w*\b')
+
+
+def normalize_query(query: str) -> str:
+    """Minúsculas, sin acentos, sin puntuación (salvo comillas) y espacios colapsados."""
+    text = unicodedata.normalize('NFKD', query.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCT_RE.sub(' ', text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def query_anchors(normalized: str) -> frozenset:
+    """Números e Items de una consulta ya normalizada (normalize_query)."""
+    return frozenset(_ANCHOR_RE.findall(normalized))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    params: Hashable
+    row: int  # Fila de su embedding en la matriz de consultas
+
+
+class SemanticQueryCache:
+    """
+    Caché LRU de dos niveles para una línea de índices (una ruta de vectorstore).
+
+    El nivel semántico compara el embedding de la consulta con los de las
+    consultas cacheadas (producto matricial sobre como mucho max_entries
+    filas: a este tamaño el escaneo exacto es más rápido que un índice ANN).
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._generation: Optional[str] = None
+        self._entries: 'OrderedDict[Tuple[str, Hashable], _Entry]' = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._row_keys: list = []
+        self._free_rows: list = []
+
+        self._stats = {
+            'lookups': 0, 'exact_hits': 0, 'semantic_hits': 0, 'misses': 0,
+            'invalidations': 0, 'miss_ms': 0.0, 'hit_ms': 0.0,
+        }
+
+    # =========================================================================
+    # API
+    # =========================================================================
+
+    def get_or_compute(
+        self,
+        generation: str,
+        query: str,
+        params: Hashable,
+        embed_fn: Callable[[], np.ndarray],
+        compute_fn: Callable[[np.ndarray], Any]
+    ) -> Any:
+        """
+        Devuelve los resultados cacheados de la consulta o los calcula.
+
+        Args:
+            generation: Generación del índice consultado
+            query: Texto de la consulta
+            params: Resto de parámetros que afectan al resultado (k, filtros...)
+            embed_fn: Calcula el embedding (1, d) normalizado de la consulta
+            compute_fn: Ejecuta la búsqueda dado ese embedding
+        """
+        return self.get_or_compute_many(
+            generation, [query], [params],
+            embed_fn=lambda queries: embed_fn(),
+            compute_fn=lambda positions, vectors: [compute_fn(vectors)]
+        )[0]
+
+    def get_or_compute_many(
+        self,
+        generation: str,
+        queries: List[str],
+        params: List[Hashable],
+        embed_fn: Callable[[List[str]], np.ndarray],
+        compute_fn: Callable[[List[int], np.ndarray], List[Any]]
+    ) -> List[Any]:
+        """
+        Versión por lotes de get_or_compute: los fallos del nivel exacto se
+        embeben en una sola llamada y los del nivel semántico se calculan
+        juntos.
+
+        Args:
+            embed_fn: Calcula los embeddings (n, d) de las consultas dadas
+            compute_fn: Recibe las posiciones (en queries) que faltan y sus
+                embeddings; devuelve un resultado por posición
+        """
+        start = time.perf_counter()
+        keys = [(normalize_query(q), p) for q, p in zip(queries, params)]
+        results: List[Any] = [None] * len(queries)
+
+        with self._lock:
+            self._check_generation(generation)
+            self._stats['lookups'] += len(queries)
+            pending = []
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    pending.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                self._stats['exact_hits'] += 1
+                results[i] = entry.value
+            self._stats['hit_ms'] += (time.perf_counter() - start) * 1000 * (len(queries) - len(pending))
+        if not pending:
+            return results
+
+        vectors = np.asarray(embed_fn([queries[i] for i in pending]), dtype=np.float32).reshape(len(pending), -1)
+
+        with self._lock:
+            self._check_generation(generation)
+            missing = []
+            for row, i in enumerate(pending):
+                entry = self._semantic_lookup(vectors[row], params[i], query_anchors(keys[i][0]))
+                if entry is None:
+                    missing.append(row)
+                    continue
+                self._stats['semantic_hits'] += 1
+                results[i] = entry.value
+            self._stats['hit_ms'] += (time.perf_counter() - start) * 1000 * (len(pending) - len(missing))
+        if not missing:
+            return results
+
+        positions = [pending[row] for row in missing]
+        values = compute_fn(positions, vectors[missing])
+
+        with self._lock:
+            self._stats['misses'] += len(positions)
+            self._stats['miss_ms'] += (time.perf_counter() - start) * 1000 * len(positions)
+            # Si la generación cambió durante el cálculo, el resultado ya no vale
+            store = generation == self._generation
+            for row, i, value in zip(missing, positions, values):
+                results[i] = value
+                if store:
+                    self._put(keys[i], vectors[row], params[i], value)
+        return results
+
+    def invalidate(self) -> None:
+        """Vacía el caché (p.ej. al indexar un documento nuevo)."""
+        with self._lock:
+            self._clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Tasa de aciertos y latencia ahorrada estimada."""
+        with self._lock:
+            s = dict(self._stats)
+            entries = len(self._entries)
+        hits = s['exact_hits'] + s['semantic_hits']
+        avg_miss = s['miss_ms'] / s['misses'] if s['misses'] else 0.0
+        avg_hit = s['hit_ms'] / hits if hits else 0.0
+        return {
+            'generation': self._generation,
+            'entries': entries,
+            'lookups': s['lookups'],
+            'exact_hits': s['exact_hits'],
+            'semantic_hits': s['semantic_hits'],
+            'misses': s['misses'],
+            'hit_rate': round(hits / s['lookups'], 3) if s['lookups'] else 0.0,
+            'avg_miss_ms': round(avg_miss, 2),
+            'avg_hit_ms': round(avg_hit, 2),
+            'saved_ms': round(max(avg_miss - avg_hit, 0.0) * hits, 1),
+            'invalidations': s['invalidations'],
+        }
+
+    # =========================================================================
+    # INTERNOS (con self._lock adquirido)
+    # =========================================================================
+
+    def _check_generation(self, generation: str) -> None:
+        if generation != self._generation:
+            if self._entries:
+                self._stats['invalidations'] += 1
+                logger.info(f"Caché de consultas invalidado (generación {self._generation} → {generation})")
+            self._clear()
+            self._generation = generation
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._vectors = None
+        self._row_keys = []
+        self._free_rows = []
+
+    def _semantic_lookup(self, vector: np.ndarray, params: Hashable, anchors: frozenset) -> Optional[_Entry]:
+        if self._vectors is None or not self._entries:
+            return None
+        if vector.shape[0] != self._vectors.shape[1]:
+            return None
+
+        similarities = self._vectors @ vector
+        for row in np.argsort(-similarities):
+            if similarities[row] < self.similarity_threshold:
+                break
+            key = self._row_keys[row]
+            if key is None or key[1] != params:
+                continue
+            # Parecidas pero con otro año, cifra o Item: otros resultados
+            if query_anchors(key[0]) != anchors:
+                continue
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    def _put(self, key, vector: np.ndarray, params: Hashable, value: Any) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._entries[key].value = value
+            return
+
+        while len(self._entries) >= self.max_entries:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._row_keys[old_entry.row] = None
+            self._vectors[old_entry.row] = 0.0
+            self._free_rows.append(old_entry.row)
+
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            self._vectors = np.zeros((0, vector.shape[0]), dtype=np.float32)
+            self._row_keys = []
+            self._free_rows = []
+
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._vectors[row] = vector
+            self._row_keys[row] = key
+        else:
+            row = len(self._row_keys)
+            self._vectors = np.vstack([self._vectors, vector[None, :]])
+            self._row_keys.append(key)
+
+        self._entries[key] = _Entry(value=value, params=params, row=row)
+
+
+# ============================================================================
+# REGISTRO POR PROCESO
+# ============================================================================
+
+_CACHES: Dict[str, SemanticQueryCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_query_cache(name: str) -> SemanticQueryCache:
+    """Caché compartido por todas las sesiones que consultan el mismo índice."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None:
+            cache = _CACHES[name] = SemanticQueryCache()
+        return cache
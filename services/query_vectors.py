@@ -0,0 +1,102 @@
+"""
+🧭 EMBEDDINGS PERSISTIDOS DE CONSULTAS FIJAS
+Las consultas constantes (SECTION_QUERIES, temas canónicos...) se embeben
+una sola vez por modelo y se guardan en disco: las búsquedas que las usan
+no vuelven a llamar al proveedor de embeddings.
+
+- <root>/<modelo>/<nombre>.npz: claves, textos y matriz normalizada
+- Se recalcula solo si cambia el texto de alguna consulta
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .vector_store import embed_texts
+
+logger = logging.getLogger(__name__)
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+
+
+class ConstantQueryVectors:
+    """Embeddings de un conjunto fijo de consultas para un modelo concreto."""
+
+    def __init__(self, root: str, embeddings, name: str, queries: Dict[str, str]):
+        self.embeddings = embeddings
+        self.queries = dict(queries)
+        self.path = os.path.join(root, _model_slug(embeddings.name), f"{name}.npz")
+        self._lock = threading.Lock()
+        self._by_text: Dict[str, np.ndarray] = {}
+
+    def _load(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if self._by_text:
+                return self._by_text
+            keys = list(self.queries)
+            texts = [self.queries[key] for key in keys]
+            matrix = self._read(keys, texts)
+            if matrix is None:
+                matrix = embed_texts(self.embeddings, texts)
+                self._write(keys, texts, matrix)
+                logger.info(f"Embeddings de {len(keys)} consultas fijas calculados ({self.path})")
+            self._by_text = {text: matrix[row] for row, text in enumerate(texts)}
+            return self._by_text
+
+    def _read(self, keys: List[str], texts: List[str]):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                # Consultas editadas en config.py: recalcular
+                if list(data['keys']) != keys or list(data['texts']) != texts:
+                    return None
+                return np.asarray(data['vectors'], dtype=np.float32)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Embeddings de consultas ilegibles ({self.path}): {e}")
+            return None
+
+    def _write(self, keys: List[str], texts: List[str], matrix: np.ndarray) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, keys=np.array(keys), texts=np.array(texts), vectors=matrix)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"No se pudieron persistir los embeddings de consultas: {e}")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Matriz (n, d) para `texts`: las consultas fijas salen del disco y
+        el resto se embebe en una sola llamada.
+        """
+        known = self._load()
+        missing = [i for i, text in enumerate(texts) if text not in known]
+        computed = embed_texts(self.embeddings, [texts[i] for i in missing]) if missing else None
+        rows = {i: computed[row] for row, i in enumerate(missing)}
+        return np.vstack([rows[i] if i in rows else known[text] for i, text in enumerate(texts)]).astype(np.float32)
+
+
+# ============================================================================
+# REGISTRO POR PROCESO
+# ============================================================================
+
+_CONSTANTS: Dict[Tuple[str, str, str], ConstantQueryVectors] = {}
+_CONSTANTS_LOCK = threading.Lock()
+
+
+def get_constant_vectors(root: str, embeddings, name: str, queries: Dict[str, str]) -> ConstantQueryVectors:
+    """ConstantQueryVectors compartido por todas las sesiones del proceso."""
+    key = (os.path.realpath(root), embeddings.name, name)
+    with _CONSTANTS_LOCK:
+        vectors = _CONSTANTS.get(key)
+        if vectors is None or vectors.queries != queries:
+            vectors = _CONSTANTS[key] = ConstantQueryVectors(key[0], embeddings, name, queries)
+        return vectors
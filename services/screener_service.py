@@ -9,6 +9,9 @@ import streamlit as st
 from typing import List, Dict, Optional
 import yfinance as yf
 
+from config import PATHS
+from services.xbrl_facts import get_fact_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -233,6 +236,30 @@ class ScreenerService:
         
         return score, tag
     
+    def get_revenue_growth(self, tickers: List[str], years: int = 5) -> Dict[str, float]:
+        """
+        Crecimiento anual compuesto de los ingresos en los últimos `years`
+        ejercicios, de los hechos XBRL de SEC ya cargados en el almacén
+        local (una sola consulta para todos los tickers).
+        
+        Returns:
+            Dict ticker (BRK.B como BRK-B) -> CAGR; sin los que no tienen histórico
+        """
+        try:
+            history = get_fact_store(PATHS.sec).frame(tickers, 'revenue', years=years + 1)
+        except Exception as e:
+            logger.error(f"Error leyendo histórico XBRL: {e}")
+            return {}
+        
+        growth = {}
+        for symbol in history.columns:
+            revenue = history[symbol].dropna()
+            if len(revenue) < 2 or revenue.iloc[0] <= 0 or revenue.iloc[-1] <= 0:
+                continue
+            span = revenue.index[-1] - revenue.index[0]
+            growth[symbol] = float((revenue.iloc[-1] / revenue.iloc[0]) ** (1 / span) - 1)
+        return growth
+    
     def run_screen(self, ticker: str, mode: str = "standard") -> pd.DataFrame:
         """
         Ejecuta el screener completo.
@@ -292,6 +319,13 @@ class ScreenerService:
         
         my_bar.empty()
         
+        # Crecimiento histórico de ingresos (XBRL de SEC), si hay datos cargados
+        growth = self.get_revenue_growth([r["Ticker"] for r in results])
+        if growth:
+            for r in results:
+                cagr = growth.get(r["Ticker"].upper().replace('.', '-'))
+                r["Ingresos CAGR 5a"] = f"{cagr*100:.1f}%" if cagr is not None else '-'
+        
         # 3. Convertir a DataFrame y ordenar
         if results:
             df = pd.DataFrame(results).sort_values(by="Score", ascending=False)
@@ -4,10 +4,14 @@ Inspirado en FinRobot: Extracción automática de insights de SEC filings.
 
 Features:
 - Descarga directa desde SEC EDGAR
-- Extracción de secciones clave (MD&A, Risk Factors, Financials)
+- Índice de CIKs persistido con refresco condicional diario
+- Caché local de filings (por accession) y de submissions
+- Extracción de secciones clave (MD&A, Risk Factors, Financials) en una
+  sola pasada lxml
 - Resumen ejecutivo con LLM
 - Detector de Red Flags
 - Comparación YoY
+- Tablas de estados financieros tipadas (cifras exactas por línea y periodo)
 """
 
 import logging
@@ -16,15 +20,21 @@ from dataclasses import dataclass, field
 from typing import Optional, Dict, List, Any, Tuple
 from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
 import streamlit as st
 
+from config import PATHS, MODELS
+from .cik_index import CikIndex, CompanyEntry, get_cik_index
+from .filing_cache import FilingCache, get_filing_cache
+from .financial_tables import FinancialTable
+from .filing_parser import parse_filing_html
+from .filing_sections import is_cross_reference
+from .xbrl_facts import XbrlFactStore, get_fact_store
+from .sec_downloader import SEC_EDGAR_FILING, BulkFilingDownloader, RateLimitedSession, submission_filings
+
 logger = logging.getLogger(__name__)
 
 # SEC EDGAR Base URLs
 SEC_EDGAR_SEARCH = "https://efts.sec.gov/LATEST/search-index"
-SEC_EDGAR_SUBMISSIONS = "https://data.sec.gov/submissions/CIK{cik}.json"
-SEC_EDGAR_FILING = "https://www.sec.gov/Archives/edgar/data/{cik}/{accession}/{filename}"
 
 # Headers requeridos por SEC
 SEC_HEADERS = {
@@ -45,6 +55,7 @@ class SECFiling:
     
     # Contenido extraído
     raw_html: str = ""
+    text: str = ""  # Texto plano (una línea por bloque, tablas como filas "a | b")
     
     # Secciones parseadas
     business_description: str = ""
@@ -52,6 +63,9 @@ class SECFiling:
     md_and_a: str = ""  # Management Discussion & Analysis
     financial_statements: str = ""
     
+    # Tablas financieras tipadas (periodos como columnas)
+    tables: List[FinancialTable] = field(default_factory=list)
+    
     # Métricas extraídas
     metrics: Dict[str, Any] = field(default_factory=dict)
     
@@ -73,47 +87,78 @@ class SECAnalyzer:
     """
     
     def __init__(self):
-        self._cik_cache: Dict[str, str] = {}
-        self._session = requests.Session()
-        self._session.headers.update(SEC_HEADERS)
+        # Todas las peticiones a SEC pasan por el cubo de tokens del proceso (10/s)
+        self._session = RateLimitedSession(SEC_HEADERS)
     
     # =========================================================================
     # BÚSQUEDA Y DESCARGA
     # =========================================================================
     
+    @property
+    def cik_index(self) -> CikIndex:
+        """Índice de CIKs en disco, cargado una vez por proceso"""
+        return get_cik_index(PATHS.sec)
+    
+    @property
+    def filing_cache(self) -> FilingCache:
+        """Filings descargados (por accession) y submissions, en disco"""
+        return get_filing_cache(PATHS.sec)
+    
+    @property
+    def fact_store(self) -> XbrlFactStore:
+        """Hechos XBRL (companyfacts) en formato largo, en disco"""
+        return get_fact_store(PATHS.sec)
+    
+    def load_company_facts(self, ticker: str, max_age_hours: float = 24) -> int:
+        """
+        Descarga el companyfacts XBRL de un ticker al almacén local si no
+        está o tiene más de max_age_hours. Devuelve los hechos cargados
+        (0 si ya estaba al día o si falla).
+        """
+        ingested = self.fact_store.ingested_at(ticker)
+        if ingested is not None and (datetime.now() - ingested).total_seconds() < max_age_hours * 3600:
+            return 0
+        cik = self.get_cik(ticker)
+        if not cik:
+            return 0
+        try:
+            return self.fact_store.fetch(cik, self._session, ticker=ticker)
+        except Exception as e:
+            logger.error(f"Error cargando hechos XBRL de {ticker}: {e}")
+            return 0
+    
+    def import_company_facts(self, path: str, progress=None) -> int:
+        """Carga companyfacts de disco (JSON, .json.gz, directorio o companyfacts.zip). Devuelve los emisores."""
+        return self.fact_store.ingest_path(
+            path, ticker_for=lambda cik: self.cik_index.ticker(cik, self._session), progress=progress
+        )
+    
+    def bulk_downloader(self, workers: Optional[int] = None) -> BulkFilingDownloader:
+        """Descargador concurrente a la caché de filings (límite de 10 peticiones/s de SEC)."""
+        return BulkFilingDownloader(
+            self.cik_index, self.filing_cache, headers=SEC_HEADERS,
+            workers=workers or MODELS.sec_download_workers
+        )
+    
     def get_cik(self, ticker: str) -> Optional[str]:
         """Obtiene el CIK (Central Index Key) de un ticker."""
-        if ticker in self._cik_cache:
-            logger.info(f"CIK para {ticker} encontrado en cache: {self._cik_cache[ticker]}")
-            return self._cik_cache[ticker]
-        
-        logger.info(f"Buscando CIK para {ticker}...")
-        
         try:
-            # Usar el mapping oficial de SEC
-            mapping_url = "https://www.sec.gov/files/company_tickers.json"
-            response = self._session.get(mapping_url, timeout=10)
-            
-            logger.info(f"Respuesta SEC tickers: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                for entry in data.values():
-                    if entry.get("ticker", "").upper() == ticker.upper():
-                        cik = str(entry.get("cik_str", "")).zfill(10)
-                        self._cik_cache[ticker] = cik
-                        logger.info(f"CIK encontrado para {ticker}: {cik}")
-                        return cik
-                
-                logger.warning(f"Ticker {ticker} no encontrado en la lista de SEC")
-            else:
-                logger.error(f"Error obteniendo lista de tickers SEC: {response.status_code}")
-            
-            return None
-            
+            cik = self.cik_index.cik(ticker, self._session)
         except Exception as e:
             logger.error(f"Error obteniendo CIK para {ticker}: {e}")
             return None
+        
+        if cik is None:
+            logger.warning(f"Ticker {ticker} no encontrado en la lista de SEC")
+        return cik
+    
+    def search_companies(self, query: str, limit: int = 20) -> List[CompanyEntry]:
+        """Emisores de EDGAR cuyo ticker o nombre empieza por `query`."""
+        try:
+            return self.cik_index.search(query, limit, self._session)
+        except Exception as e:
+            logger.error(f"Error buscando emisores '{query}': {e}")
+            return []
     
     def get_recent_filings(self, ticker: str, form_types: List[str] = None) -> List[Dict]:
         """
@@ -140,42 +185,18 @@ class SECAnalyzer:
         logger.info(f"CIK encontrado para {ticker}: {cik}")
         
         try:
-            # Obtener submissions - SEC API necesita CIK con 10 dígitos (con ceros)
-            # Pero a veces necesita sin ceros, probamos ambos formatos
-            url = SEC_EDGAR_SUBMISSIONS.format(cik=cik)  # Con ceros (10 dígitos)
-            logger.info(f"Consultando SEC EDGAR: {url}")
-            
-            response = self._session.get(url, timeout=15)
-            
-            logger.info(f"Respuesta SEC: {response.status_code}")
-            
-            if response.status_code != 200:
-                logger.error(f"Error de SEC API: {response.status_code} - {response.text[:200]}")
-                st.error(f"❌ Error al consultar SEC (código {response.status_code})")
-                return []
-            
-            data = response.json()
+            # Submissions (CIK con 10 dígitos): de la caché local, revalidadas con SEC cada hora
+            data = self.filing_cache.submissions(cik, self._session)
             filings = []
             
             # Parsear filings recientes
             recent = data.get("filings", {}).get("recent", {})
-            forms = recent.get("form", [])
-            dates = recent.get("filingDate", [])
-            accessions = recent.get("accessionNumber", [])
-            documents = recent.get("primaryDocument", [])
-            
-            logger.info(f"Encontrados {len(forms)} filings totales para {ticker}")
-            
-            for i, form in enumerate(forms):
-                if form in form_types:
-                    filings.append({
-                        "form_type": form,
-                        "filing_date": dates[i] if i < len(dates) else "",
-                        "accession_number": accessions[i].replace("-", "") if i < len(accessions) else "",
-                        "primary_document": documents[i] if i < len(documents) else "",
-                        "ticker": ticker.upper(),
-                        "cik": cik
-                    })
+            
+            logger.info(f"Encontrados {len(recent.get('form', []))} filings totales para {ticker}")
+            
+            for filing in submission_filings(recent, ticker, cik):
+                if filing["form_type"] in form_types:
+                    filings.append(filing)
                 
                 # Limitar a 10 filings
                 if len(filings) >= 10:
@@ -188,6 +209,11 @@ class SECAnalyzer:
             
             return filings
             
+        except requests.exceptions.HTTPError as e:
+            code = e.response.status_code if e.response is not None else '?'
+            logger.error(f"Error de SEC API: {code}")
+            st.error(f"❌ Error al consultar SEC (código {code})")
+            return []
         except requests.exceptions.Timeout:
             logger.error(f"Timeout al consultar SEC para {ticker}")
             st.error("❌ Timeout al consultar SEC. Intenta de nuevo.")
@@ -223,12 +249,19 @@ class SECAnalyzer:
                 filename=document
             )
             
-            logger.info(f"Descargando filing: {url}")
-            response = self._session.get(url, timeout=30)
-            
-            if response.status_code != 200:
-                logger.error(f"Error descargando filing: {response.status_code}")
-                return None
+            # Un filing publicado no cambia: si está en caché no se descarga
+            raw_html = self.filing_cache.get_document(accession, document)
+            if raw_html is None:
+                logger.info(f"Descargando filing: {url}")
+                response = self._session.get(url, timeout=30)
+                
+                if response.status_code != 200:
+                    logger.error(f"Error descargando filing: {response.status_code}")
+                    return None
+                raw_html = response.text
+                self.filing_cache.put_document(accession, document, raw_html)
+            else:
+                logger.info(f"Filing {accession} leído de la caché local")
             
             # Crear objeto Filing
             filing = SECFiling(
@@ -238,7 +271,7 @@ class SECAnalyzer:
                 filing_date=filing_info["filing_date"],
                 accession_number=accession,
                 primary_document=document,
-                raw_html=response.text
+                raw_html=raw_html
             )
             
             # Parsear secciones
@@ -254,89 +287,41 @@ class SECAnalyzer:
     # PARSING DE SECCIONES
     # =========================================================================
     
+    # Item del 10-K de cada sección del SECFiling
+    SECTION_ITEMS = {
+        'business_description': '1',
+        'risk_factors': '1A',
+        'md_and_a': '7',
+        'financial_statements': '8',
+    }
+    
     def _parse_sections(self, filing: SECFiling) -> None:
-        """Extrae las secciones principales del filing."""
-        soup = BeautifulSoup(filing.raw_html, 'html.parser')
-        
-        # Limpiar scripts y styles
-        for tag in soup(['script', 'style']):
-            tag.decompose()
-        
-        text = soup.get_text(separator='\n', strip=True)
-        
-        # Patrones para secciones de 10-K (más robustos)
-        section_patterns = {
-            'business_description': [
-                # Patrones estándar
-                r'ITEM\s+1\.?\s+BUSINESS',  # Header inicio
-                r'Item\s+1\.?\s+Business',
-                r'PART\s+I.*?ITEM\s+1',      # Con Part I
-            ],
-            'risk_factors': [
-                r'ITEM\s+1A\.?\s+RISK\s+FACTORS',
-                r'Item\s+1A\.?\s+Risk\s+Factors',
-            ],
-            'md_and_a': [
-                r'ITEM\s+7\.?\s+MANAGEMENT',
-                r'Item\s+7\.?\s+Management',
-            ],
-            'financial_statements': [
-                r'ITEM\s+8\.?\s+FINANCIAL',
-                r'Item\s+8\.?\s+Financial',
-            ]
-        }
-        
-        # Estrategia de búsqueda mejorada: Buscar índices de inicio de cada sección
-        text_upper = text.upper()
-        
-        # Mapeo de posiciones
-        indices = {}
-        for section, patterns in section_patterns.items():
-            for pattern in patterns:
-                # Buscar el patrón compilado para velocidad y robustez
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    indices[section] = match.start()
-                    break
-        
-        # Ordenar secciones encontradas por posición
-        sorted_sections = sorted([(k, v) for k, v in indices.items()], key=lambda x: x[1])
+        """
+        Extrae texto, secciones y tablas del filing en una sola pasada de
+        parseo (lxml) y un único escaneo de encabezados de Item.
+        """
+        parsed = parse_filing_html(filing.raw_html)
+        filing.text = parsed.text
+        filing.tables = parsed.tables
         
-        # Extraer contenido entre secciones
-        for i, (section, start_idx) in enumerate(sorted_sections):
-            # El final es el inicio de la siguiente sección o el final del texto
-            end_idx = sorted_sections[i+1][1] if i < len(sorted_sections)-1 else len(text)
-            
-            # Extraer y limpiar
-            content = text[start_idx:end_idx].strip()
+        sections = parsed.sections
+        for attr, item in self.SECTION_ITEMS.items():
+            content = sections.get(item, "")
+            # Item 8 que solo remite a Part IV: los estados están en el Item 15
+            if item == '8' and is_cross_reference([content]) and sections.get('15'):
+                content = sections['15']
             
             # Limitar tamaño
             if len(content) > 60000:
                 content = content[:60000] + "... [truncated]"
             
-            setattr(filing, section, content)
+            setattr(filing, attr, content)
             
         # Fallback: Si no se encontró nada, usar todo el texto para resumen, 
         # pero marcar las secciones como "No encontradas automáticamente"
-        if not sorted_sections:
+        if not any(item in sections for item in self.SECTION_ITEMS.values()):
             logger.warning("No se pudieron detectar secciones en el 10-K. Usando extracción general.")
     
-    def _extract_text_clean(self, html: str, max_length: int = 50000) -> str:
-        """Extrae texto limpio del HTML."""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Eliminar tags no deseados
-        for tag in soup(['script', 'style', 'table']):
-            tag.decompose()
-        
-        text = soup.get_text(separator=' ', strip=True)
-        text = re.sub(r'\s+', ' ', text)
-        
-        if len(text) > max_length:
-            text = text[:max_length] + "..."
-        
-        return text
-    
     # =========================================================================
     # ANÁLISIS CON LLM
     # =========================================================================
@@ -371,7 +356,8 @@ class SECAnalyzer:
             context = "\n\n".join(context_parts)
             
             if not context:
-                context = self._extract_text_clean(filing.raw_html, 20000)
+                text = filing.text or parse_filing_html(filing.raw_html).text
+                context = text[:20000] + ("..." if len(text) > 20000 else "")
             
             # Prompt de análisis
             system_prompt = """Eres un analista financiero senior especializado en análisis de SEC filings.
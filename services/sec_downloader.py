@@ -0,0 +1,370 @@
+"""
+📦 DESCARGA MASIVA DE FILINGS DE SEC
+Descarga concurrente de los filings de un emisor (tipos de formulario y
+rango de fechas) o de una lista de accessions, respetando el límite de
+acceso justo de SEC (10 peticiones/segundo por cliente).
+
+- TokenBucket compartido por todo el proceso (get_sec_rate_limiter): todas
+  las sesiones de SEC (índice de CIKs, submissions, documentos) pasan por
+  el mismo cubo, da igual cuántos hilos descarguen a la vez
+- RateLimitedSession: requests.Session que toma un token antes de cada
+  petición y reintenta 429/5xx y errores de conexión con backoff
+  exponencial (respetando Retry-After)
+- Cada documento descargado se guarda en la FilingCache al terminar; los
+  que ya están en caché no tocan la red
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from .cik_index import CikIndex
+from .filing_cache import FilingCache
+
+logger = logging.getLogger(__name__)
+
+SEC_EDGAR_FILING = "https://www.sec.gov/Archives/edgar/data/{cik}/{accession}/{filename}"
+
+# Política de acceso justo de SEC: máximo 10 peticiones por segundo
+SEC_MAX_REQUESTS_PER_SECOND = 10
+
+# Reintentos ante 429/5xx y errores de red
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+_ACCESSION_RE = re.compile(r'^(\d{10})-?(\d{2})-?(\d{6})$')
+# Cabecera SGML del filing (-index-headers.html): emisor y quien presenta
+_HEADER_CIK_RE = {
+    section: re.compile(section + r':.*?CENTRAL INDEX KEY:\s*(\d{1,10})', re.DOTALL)
+    for section in ('SUBJECT COMPANY', 'FILER')
+}
+
+
+# ============================================================================
+# LÍMITE DE PETICIONES
+# ============================================================================
+
+class TokenBucket:
+    """
+    Cubo de tokens thread-safe: `rate` tokens por segundo con ráfagas de
+    hasta `capacity`. acquire() reserva el token bajo el lock y espera
+    fuera de él, así que los hilos salen en orden y sin ráfagas encima
+    del límite.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Toma un token (esperando si hace falta). Devuelve los segundos esperados."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_LIMITER: Optional[TokenBucket] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_sec_rate_limiter() -> TokenBucket:
+    """Cubo de tokens de SEC compartido por todas las sesiones del proceso."""
+    global _LIMITER
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            # Sin ráfaga (capacity=1): 10/s en cualquier ventana de un segundo,
+            # no solo de media (un cubo lleno permitiría ~20 en el primer segundo)
+            _LIMITER = TokenBucket(SEC_MAX_REQUESTS_PER_SECOND, capacity=1)
+        return _LIMITER
+
+
+class RateLimitedSession(requests.Session):
+    """
+    Sesión de SEC: un token del cubo compartido por cada intento y
+    reintentos con backoff exponencial + jitter ante 429/5xx y errores de
+    conexión o timeout. Tras agotar los reintentos devuelve la última
+    respuesta (o relanza la última excepción).
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, limiter: Optional[TokenBucket] = None,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE):
+        super().__init__()
+        if headers:
+            self.headers.update(headers)
+        self.limiter = limiter or get_sec_rate_limiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(BACKOFF_MAX, float(retry_after))
+        return min(BACKOFF_MAX, self.backoff_base * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"SEC {url}: {e}; reintento {attempt + 1} en {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                return response
+            delay = self._backoff(attempt, response)
+            logger.warning(f"SEC {url}: {response.status_code}; reintento {attempt + 1} en {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+
+
+# ============================================================================
+# DESCARGA MASIVA
+# ============================================================================
+
+@dataclass
+class DownloadResult:
+    """Resultado de descargar un filing (status: downloaded | cached | error)."""
+    filing: Dict
+    status: str
+    bytes: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status != 'error'
+
+
+ProgressCallback = Callable[[DownloadResult, int, int], None]
+
+
+def normalize_accession(accession: str) -> str:
+    """'0000320193-23-000106' o '000032019323000106' -> '000032019323000106'."""
+    match = _ACCESSION_RE.match(accession.strip())
+    if not match:
+        raise ValueError(f"Número de accession no válido: {accession!r}")
+    return "".join(match.groups())
+
+
+def submission_filings(block: Dict, ticker: str, cik: str) -> Iterator[Dict]:
+    """Filings (mismo formato que SECAnalyzer.get_recent_filings) de un bloque columnar de submissions."""
+    forms = block.get("form", [])
+    dates = block.get("filingDate", [])
+    accessions = block.get("accessionNumber", [])
+    documents = block.get("primaryDocument", [])
+    for i, form in enumerate(forms):
+        yield {
+            "form_type": form,
+            "filing_date": dates[i] if i < len(dates) else "",
+            "accession_number": accessions[i].replace("-", "") if i < len(accessions) else "",
+            "primary_document": documents[i] if i < len(documents) else "",
+            "ticker": ticker.upper(),
+            "cik": cik,
+        }
+
+
+class BulkFilingDownloader:
+    """
+    Selecciona filings de EDGAR y los descarga en paralelo a la FilingCache.
+    Cada hilo usa su propia RateLimitedSession; todas comparten el cubo de
+    tokens del proceso, así que `workers` solo solapa latencias.
+    """
+
+    def __init__(self, cik_index: CikIndex, cache: FilingCache, headers: Optional[Dict[str, str]] = None,
+                 workers: int = 4, session_factory: Optional[Callable[[], requests.Session]] = None):
+        self.cik_index = cik_index
+        self.cache = cache
+        self.workers = max(1, workers)
+        self._session_factory = session_factory or (lambda: RateLimitedSession(headers))
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """Sesión del hilo actual (requests.Session no es thread-safe)."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._session_factory()
+        return session
+
+    # =========================================================================
+    # SELECCIÓN
+    # =========================================================================
+
+    def _blocks(self, data: Dict, start_date: Optional[str] = None,
+                end_date: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Bloques columnares de submissions: "recent" y, bajo demanda, las
+        páginas históricas (filings.files) que solapan el rango de fechas.
+        """
+        filings_data = data.get("filings", {})
+        yield filings_data.get("recent", {})
+        for page in filings_data.get("files", []):
+            if start_date and page.get("filingTo", "9999") < start_date:
+                continue
+            if end_date and page.get("filingFrom", "0000") > end_date:
+                continue
+            yield self.cache.submissions_page(page["name"], self.session)
+
+    def select(self, ticker: str, form_types: Optional[List[str]] = None,
+               start_date: Optional[str] = None, end_date: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        """
+        Filings de un ticker por tipo de formulario y rango de fechas
+        (YYYY-MM-DD, ambos incluidos), del más reciente al más antiguo.
+        Si el rango llega antes de los filings "recent" se leen también
+        las páginas históricas de submissions.
+
+        Raises:
+            ValueError si el ticker no está en el índice de SEC
+            requests.RequestException si SEC falla y no hay copia local
+        """
+        cik = self.cik_index.cik(ticker, self.session)
+        if cik is None:
+            raise ValueError(f"Ticker {ticker} no encontrado en la lista de SEC")
+        data = self.cache.submissions(cik, self.session)
+
+        wanted = set(form_types) if form_types else None
+        selected = []
+        for block in self._blocks(data, start_date, end_date):
+            for filing in submission_filings(block, ticker, cik):
+                if wanted is not None and filing["form_type"] not in wanted:
+                    continue
+                if start_date and filing["filing_date"] < start_date:
+                    continue
+                if end_date and filing["filing_date"] > end_date:
+                    continue
+                selected.append(filing)
+        selected.sort(key=lambda f: f["filing_date"], reverse=True)
+        return selected[:limit] if limit else selected
+
+    def filing_issuer(self, accession: str) -> str:
+        """
+        CIK del emisor de un filing según su cabecera en EDGAR (SUBJECT
+        COMPANY o, si no hay, FILER). Los 10 primeros dígitos de la
+        accession son del que presenta, que puede ser un agente (p.ej.
+        0001193125 = Donnelley) y no el emisor.
+
+        Raises:
+            ValueError si la cabecera no indica ningún CIK
+            requests.RequestException si SEC falla
+        """
+        accession = normalize_accession(accession)
+        dashed = f"{accession[:10]}-{accession[10:12]}-{accession[12:]}"
+        url = SEC_EDGAR_FILING.format(cik=accession[:10].lstrip('0'), accession=accession,
+                                      filename=f"{dashed}-index-headers.html")
+        response = self.session.get(url, timeout=30)
+        response.raise_for_status()
+        for pattern in _HEADER_CIK_RE.values():
+            match = pattern.search(response.text)
+            if match:
+                return match.group(1).zfill(10)
+        raise ValueError(f"No se encontró el emisor de la accession {dashed} en EDGAR")
+
+    def select_accessions(self, accessions: Iterable[str], ticker: Optional[str] = None) -> List[Dict]:
+        """
+        Filings de una lista de accessions. El documento principal se busca
+        en las submissions del emisor: el del ticker si se indica; las que
+        no estén ahí (o todas, sin ticker) se buscan en las del emisor que
+        indica la cabecera del filing (filing_issuer).
+
+        Raises:
+            ValueError si una accession no es válida o no aparece en EDGAR
+            requests.RequestException si SEC falla y no hay copia local
+        """
+        wanted = [normalize_accession(a) for a in accessions]
+        by_accession: Dict[str, Dict] = {}
+        if ticker:
+            cik = self.cik_index.cik(ticker, self.session)
+            if cik is None:
+                raise ValueError(f"Ticker {ticker} no encontrado en la lista de SEC")
+            self._find_in_submissions(cik, set(wanted), by_accession, ticker)
+
+        issuers: Dict[str, List[str]] = {}
+        for accession in wanted:
+            if accession not in by_accession:
+                issuers.setdefault(self.filing_issuer(accession), []).append(accession)
+        for cik, pending in issuers.items():
+            self._find_in_submissions(cik, set(pending), by_accession)
+
+        missing = [a for a in wanted if a not in by_accession]
+        if missing:
+            raise ValueError(f"Accessions no encontradas en EDGAR: {', '.join(missing)}")
+        return [by_accession[a] for a in wanted]
+
+    def _find_in_submissions(self, cik: str, pending: set, found: Dict[str, Dict],
+                             ticker: Optional[str] = None) -> None:
+        """Añade a `found` los filings de `pending` que están en las submissions de un CIK."""
+        data = self.cache.submissions(cik, self.session)
+        name = ticker or (data.get("tickers") or [cik.lstrip('0')])[0]
+        for block in self._blocks(data):
+            for filing in submission_filings(block, name, cik):
+                if filing["accession_number"] in pending:
+                    found[filing["accession_number"]] = filing
+                    pending.discard(filing["accession_number"])
+            if not pending:
+                break
+
+    # =========================================================================
+    # DESCARGA
+    # =========================================================================
+
+    def fetch(self, filing: Dict) -> DownloadResult:
+        """Descarga un filing a la caché (si no estaba ya). No lanza excepciones."""
+        start = time.perf_counter()
+        accession = filing["accession_number"]
+        document = filing["primary_document"]
+        if self.cache.has_document(accession, document):
+            return DownloadResult(filing, 'cached', seconds=time.perf_counter() - start)
+        url = SEC_EDGAR_FILING.format(cik=filing["cik"].lstrip('0'), accession=accession, filename=document)
+        try:
+            response = self.session.get(url, timeout=30)
+            response.raise_for_status()
+            self.cache.put_document(accession, document, response.text)
+            return DownloadResult(filing, 'downloaded', bytes=len(response.content),
+                                  seconds=time.perf_counter() - start)
+        except Exception as e:
+            logger.error(f"Error descargando {url}: {e}")
+            return DownloadResult(filing, 'error', seconds=time.perf_counter() - start, error=str(e))
+
+    def iter_download(self, filings: List[Dict], progress: Optional[ProgressCallback] = None) -> Iterator[DownloadResult]:
+        """
+        Descarga los filings en paralelo y entrega cada resultado según
+        termina; progress(resultado, hechos, total) se llama en el hilo
+        del consumidor.
+        """
+        total = len(filings)
+        if total == 0:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, total), thread_name_prefix='sec-dl') as pool:
+            futures = [pool.submit(self.fetch, filing) for filing in filings]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if progress is not None:
+                    progress(result, done, total)
+                yield result
+
+    def download(self, filings: List[Dict], progress: Optional[ProgressCallback] = None) -> List[DownloadResult]:
+        """Como iter_download, pero devuelve todos los resultados (en orden de finalización)."""
+        return list(self.iter_download(filings, progress))
@@ -0,0 +1,878 @@
+"""
+🗄️ VECTOR STORE COMPARTIDO - Índices FAISS por proceso
+Abre cada índice en disco UNA vez por proceso y lo comparte entre sesiones.
+
+Características:
+- Índice FAISS mapeado en memoria (mmap, solo lectura)
+- Docstore SQLite por vector_id (sin pickle): el texto se lee bajo demanda
+- Generaciones inmutables: los escritores publican una generación nueva
+  y cambian el puntero CURRENT de forma atómica (os.replace)
+- Los lectores siguen sirviendo la generación antigua hasta que ven el cambio
+- Cada generación registra el modelo de embeddings: nunca se mezclan modelos
+- Escritores con dedup: un vector canónico por grupo de casi-duplicados
+- Un solo escritor por índice: cerrojo de fichero exclusivo entre procesos
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+from .docstore import SQLiteDocstore, remove_docstore_files
+from .embeddings import EmbeddingMismatchError, OPENAI_DIMENSIONS
+from .near_duplicates import MinHasher, band_keys, estimate_jaccard, DUPLICATE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+WRITE_LOCK_FILE = 'WRITE.lock'
+META_FILE = 'meta.json'
+GENERATION_PREFIX = 'gen-'
+DOCSTORE_PREFIX = 'docstore-'
+LEGACY_GENERATION = 'legacy'
+KEEP_GENERATIONS = 3
+# Un docstore sin generación que lo referencie puede ser de un escritor en curso
+ORPHAN_DOCSTORE_TTL = 3600
+QUANTIZATIONS = ('float32', 'float16', 'int8')
+# Margen sobre el rango min/max observado al entrenar el cuantizador int8
+INT8_RANGE_MARGIN = 0.2
+
+
+def read_index_mmap(index_file: str):
+    """
+    Lee un índice FAISS mapeado en memoria y en solo lectura.
+
+    Varios procesos/sesiones comparten las mismas páginas del SO en lugar
+    de tener cada uno su copia. Si la versión de FAISS no soporta mmap
+    para el tipo de índice, se hace una lectura normal.
+    """
+    import faiss
+
+    flags = 0
+    for flag_name in ('IO_FLAG_MMAP_IFC', 'IO_FLAG_MMAP'):
+        if hasattr(faiss, flag_name):
+            flags = getattr(faiss, flag_name)
+            break
+    flags |= getattr(faiss, 'IO_FLAG_READ_ONLY', 0)
+
+    try:
+        return faiss.read_index(index_file, flags)
+    except Exception as e:
+        logger.warning(f"mmap no disponible para {index_file} ({e}), lectura normal")
+        return faiss.read_index(index_file)
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Convierte a matriz float32 con filas de norma 1 (producto interno = coseno)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def embedding_info(embeddings) -> Dict[str, Any]:
+    """Modelo y dimensión de un proveedor (o de un objeto tipo LangChain)."""
+    if hasattr(embeddings, 'info'):
+        return embeddings.info()
+    model = getattr(embeddings, 'model', None) or type(embeddings).__name__
+    return {'embedding_model': str(model), 'dimension': None, 'backend': 'unknown'}
+
+
+def infer_legacy_model(dimension: int) -> str:
+    """Modelo probable de un índice antiguo sin metadata (por su dimensión)."""
+    # Antes index_biblioteca.py usaba text-embedding-3-small y la app
+    # text-embedding-3-large; hoy ambos usan MODELS.embedding_model y los
+    # índices antiguos con small se rechazan hasta reindexarlos
+    for model in ('text-embedding-3-small', 'text-embedding-3-large'):
+        if OPENAI_DIMENSIONS[model] == dimension:
+            return f"openai:{model}"
+    return f"unknown:{dimension}"
+
+
+def fit_dimensions(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Trunca a las primeras `dimension` componentes y renormaliza.
+
+    Los modelos Matryoshka (text-embedding-3-*) concentran la información
+    en las primeras dimensiones: el prefijo renormalizado sigue siendo un
+    embedding válido.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if vectors.shape[1] <= dimension:
+        return vectors
+    return normalize_rows(vectors[:, :dimension])
+
+
+@dataclass
+class StorageProfile:
+    """
+    Cómo guarda un índice sus vectores. Se fija al crear el índice y se
+    registra en meta.json: todas sus generaciones lo conservan aunque
+    cambie la configuración.
+
+    - dimensions: prefijo Matryoshka (None = dimensión completa del modelo)
+    - quantization: 'float32' (IndexFlatIP), 'float16' o 'int8'
+      (IndexScalarQuantizer; 2 y 1 bytes por componente)
+    """
+    dimensions: Optional[int] = None
+    quantization: str = 'float32'
+
+    @classmethod
+    def from_config(cls) -> 'StorageProfile':
+        from config import MODELS
+
+        quantization = MODELS.vector_quantization if MODELS.vector_quantization in QUANTIZATIONS else 'float32'
+        return cls(dimensions=MODELS.embedding_dimensions or None, quantization=quantization)
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any]) -> 'StorageProfile':
+        truncated = meta.get('source_dimension') and meta.get('dimension') != meta.get('source_dimension')
+        return cls(
+            dimensions=meta.get('dimension') if truncated else None,
+            quantization=meta.get('quantization', 'float32')
+        )
+
+    @property
+    def needs_training(self) -> bool:
+        return self.quantization == 'int8'
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Vectores normalizados en la dimensión del perfil."""
+        vectors = normalize_rows(vectors)
+        return fit_dimensions(vectors, self.dimensions) if self.dimensions else vectors
+
+    def build_index(self, dimension: int, training: Optional[np.ndarray] = None):
+        """Índice FAISS vacío (entrenado si la cuantización lo requiere)."""
+        import faiss
+
+        if self.quantization == 'float32':
+            return faiss.IndexFlatIP(dimension)
+
+        qtype = faiss.ScalarQuantizer.QT_fp16 if self.quantization == 'float16' else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+        if self.needs_training:
+            # Rango por componente con margen: los vectores posteriores no se recortan
+            index.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+            index.sq.rangestat_arg = INT8_RANGE_MARGIN
+            index.train(training)
+        return index
+
+
+def embed_texts(embeddings, texts: List[str]) -> np.ndarray:
+    """Embeddings de documentos como matriz normalizada."""
+    return normalize_rows(embeddings.embed_documents(list(texts)))
+
+
+def embed_query(embeddings, query: str) -> np.ndarray:
+    """Embedding de una consulta como matriz (1, d) normalizada."""
+    return normalize_rows(embeddings.embed_query(query))
+
+
+# ============================================================================
+# GENERACIÓN ABIERTA
+# ============================================================================
+
+@dataclass
+class SearchHit:
+    """Resultado de búsqueda: metadata inmediata, texto bajo demanda."""
+    vector_id: int
+    score: float  # Similitud coseno
+    metadata: Dict[str, Any]
+    content: Optional[str] = None
+
+
+@dataclass
+class VectorIndex:
+    """Generación publicada (inmutable): índice FAISS + docstore."""
+    name: str
+    path: str
+    index: Any
+    docstore: SQLiteDocstore
+    meta: Dict[str, Any]
+    loaded_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def dimension(self) -> int:
+        return self.index.d
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.meta.get('embedding_model')
+
+    @property
+    def profile(self) -> StorageProfile:
+        return StorageProfile.from_meta(self.meta)
+
+    def search(self, query_vectors: np.ndarray, k: int) -> List[List[SearchHit]]:
+        """
+        Búsqueda por vectores (ya normalizados), en lote.
+
+        Returns:
+            Una lista de SearchHit (sin texto) por cada vector de consulta
+        """
+        if self.ntotal == 0:
+            return [[] for _ in range(len(query_vectors))]
+
+        k = min(k, self.ntotal)
+        # Consultas con la dimensión completa del modelo → prefijo del índice
+        query_vectors = fit_dimensions(query_vectors, self.dimension)
+        scores, ids = self.index.search(np.ascontiguousarray(query_vectors, dtype=np.float32), k)
+
+        metadata = self.docstore.get_metadata(sorted({int(i) for i in ids.ravel() if i >= 0}))
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            results.append([
+                SearchHit(vector_id=int(vid), score=float(score), metadata=metadata.get(int(vid), {}))
+                for score, vid in zip(row_scores, row_ids)
+                if vid >= 0
+            ])
+        return results
+
+    def reconstruct(self, vector_ids: List[int]) -> np.ndarray:
+        """Vectores almacenados (normalizados) de los ids indicados, en ese orden."""
+        if not vector_ids:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        ids = np.asarray(vector_ids, dtype=np.int64)
+        try:
+            return self.index.reconstruct_batch(ids)
+        except (AttributeError, RuntimeError):
+            return np.vstack([self.index.reconstruct(int(i)) for i in ids])
+
+    def fill_texts(self, hits: List[SearchHit]) -> List[SearchHit]:
+        """Carga el texto de los hits indicados (una sola consulta)."""
+        missing = [h.vector_id for h in hits if h.content is None]
+        if missing:
+            texts = self.docstore.get_texts(missing)
+            for hit in hits:
+                if hit.content is None:
+                    hit.content = texts.get(hit.vector_id, "")
+        return hits
+
+
+# ============================================================================
+# CERROJO DE ESCRITURA
+# ============================================================================
+
+class WriteLock:
+    """
+    Cerrojo exclusivo de un índice: fichero (entre procesos) más condición
+    (entre hilos, que comparten el descriptor). Reentrante en el mismo hilo,
+    para que la migración del formato LangChain pueda escribir desde dentro
+    de un escritor.
+
+    Dos escritores que copiasen la misma generación se pisarían: el
+    segundo en publicar descartaría lo añadido por el primero, y ambos
+    escriben filas del docstore con los mismos vector_ids.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._owner: Optional[int] = None
+        self._depth = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return
+            while self._owner is not None:
+                self._cond.wait()
+            self._owner = me
+        try:
+            self._file = open(self.path, 'a+b')
+            self._lock_file()
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            with self._cond:
+                self._owner = None
+                self._cond.notify_all()
+            raise
+        self._depth = 1
+
+    def release(self) -> None:
+        with self._cond:
+            if self._owner is None:
+                return
+            self._depth -= 1
+            if self._depth:
+                return
+            try:
+                self._unlock_file()
+            finally:
+                self._file.close()
+                self._file = None
+                self._owner = None
+                self._cond.notify_all()
+
+    def _lock_file(self) -> None:
+        if os.name == 'nt':
+            import msvcrt
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    # LK_LOCK se rinde tras ~10 s: se sigue esperando
+                    continue
+        import fcntl
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"Esperando a otro escritor de {os.path.dirname(self.path)}")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(self) -> None:
+        if os.name == 'nt':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+
+# ============================================================================
+# ESCRITOR
+# ============================================================================
+
+class IndexWriter:
+    """
+    Construye una generación nueva sobre una copia privada del índice.
+
+    Las filas del docstore se añaden con vector_ids >= ntotal de la
+    generación activa, invisibles para los lectores hasta commit().
+
+    Desde la copia hasta la publicación el escritor tiene el cerrojo
+    exclusivo del índice: otro escritor espera y parte de la generación
+    recién publicada. commit() o close() lo liberan.
+    """
+
+    def __init__(self, store: 'SharedVectorStore', reset: bool = False,
+                 model_info: Optional[Dict[str, Any]] = None, dedup: bool = False,
+                 profile: Optional[StorageProfile] = None):
+        import faiss
+
+        self.store = store
+        self.model_info = model_info or embedding_info(store.embeddings)
+        self.profile = profile or StorageProfile.from_config()
+        self._added = 0
+        self._reset = reset
+        self._index = None
+        # int8 sin entrenar: se acumula en float32 y se cuantiza al publicar
+        self._pending_training = False
+        # Casi-duplicados: no se embeben, se añaden como procedencia del canónico
+        self._hasher = MinHasher() if dedup else None
+        self.duplicates = 0
+
+        # La generación de partida se lee con el cerrojo ya tomado
+        self._locked = False
+        store._write_lock.acquire()
+        self._locked = True
+        try:
+            current = None if reset else store.current()
+            if current is None and not reset and store.mismatch:
+                raise EmbeddingMismatchError(store.mismatch)
+            if current is not None:
+                self._index = faiss.read_index(os.path.join(current.path, 'index.faiss'))
+                self._docstore_name = current.meta['docstore']
+                # El perfil de almacenamiento es del índice, no de la configuración actual
+                self.profile = current.profile
+            else:
+                self._docstore_name = f"{DOCSTORE_PREFIX}{uuid.uuid4().hex[:12]}.sqlite"
+
+            self._docstore = SQLiteDocstore(os.path.join(store.root, self._docstore_name))
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'IndexWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self):
+        # Un escritor abandonado no debe bloquear el índice
+        if getattr(self, '_locked', False):
+            self.close()
+
+    def close(self) -> None:
+        """Libera el índice sin publicar lo añadido (no-op tras commit())."""
+        if self._locked:
+            self._locked = False
+            self.store._write_lock.release()
+
+    @property
+    def ntotal(self) -> int:
+        return self._index.ntotal if self._index is not None else 0
+
+    def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[int]:
+        """
+        Calcula embeddings y añade los textos.
+
+        Con dedup, los casi-duplicados de un chunk ya indexado (o anterior
+        en el mismo lote) no se embeben: se devuelve el id del canónico.
+        """
+        if not texts:
+            return []
+        if self._hasher is None:
+            return self.add_vectors(embed_texts(self.store.embeddings, texts), texts, metadatas)
+
+        signatures = [self._hasher.signature(text) for text in texts]
+        keys = [band_keys(signature) for signature in signatures]
+        canonical = self._find_canonical(signatures, keys)
+
+        new_positions = [i for i, target in enumerate(canonical) if target is None]
+        new_ids = self.add_vectors(
+            embed_texts(self.store.embeddings, [texts[i] for i in new_positions]),
+            [texts[i] for i in new_positions],
+            [metadatas[i] for i in new_positions]
+        ) if new_positions else []
+        id_of = dict(zip(new_positions, new_ids))
+        if new_ids:
+            self._docstore.add_signatures([(id_of[i], signatures[i], keys[i]) for i in new_positions])
+
+        ids = []
+        sources = []
+        for i, target in enumerate(canonical):
+            if target is None:
+                ids.append(id_of[i])
+                continue
+            # Duplicado de otro chunk del lote: ('batch', posición) -> su id ya asignado
+            vector_id = id_of[target[1]] if isinstance(target, tuple) else target
+            sources.append((vector_id, metadatas[i]))
+            ids.append(vector_id)
+        if sources:
+            self._docstore.add_sources(sources)
+            self.duplicates += len(sources)
+        return ids
+
+    def _find_canonical(self, signatures: List[np.ndarray], keys: List[List[int]]) -> List[Any]:
+        """
+        Canónico de cada texto: vector_id existente, ('batch', i) si
+        duplica al i-ésimo del lote, o None si es nuevo.
+        """
+        candidates = [self._docstore.lsh_candidates(k, below=self.ntotal) for k in keys]
+        known = self._docstore.get_signatures(sorted({c for cs in candidates for c in cs}))
+
+        batch_buckets: Dict[int, List[int]] = {}
+        canonical: List[Any] = []
+        for i, signature in enumerate(signatures):
+            match = None
+            best = DUPLICATE_THRESHOLD
+            for vector_id in candidates[i]:
+                similarity = estimate_jaccard(signature, known[vector_id]) if vector_id in known else 0.0
+                if similarity >= best:
+                    match, best = vector_id, similarity
+            if match is None:
+                for j in {j for key in keys[i] for j in batch_buckets.get(key, [])}:
+                    similarity = estimate_jaccard(signature, signatures[j])
+                    if similarity >= best:
+                        match, best = ('batch', j), similarity
+            canonical.append(match)
+            if match is None:
+                for key in keys[i]:
+                    batch_buckets.setdefault(key, []).append(i)
+        return canonical
+
+    def add_vectors(self, vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[int]:
+        """Añade vectores ya calculados con su texto y metadata."""
+        import faiss
+
+        if not self._locked:
+            raise RuntimeError("Escritor ya cerrado: crea otro con store.writer()")
+        vectors = self.profile.apply(vectors)
+        if self._index is None:
+            if self.profile.needs_training:
+                self._index = faiss.IndexFlatIP(vectors.shape[1])
+                self._pending_training = True
+            else:
+                self._index = self.profile.build_index(vectors.shape[1])
+        if vectors.shape[1] != self._index.d:
+            raise EmbeddingMismatchError(
+                f"Vectores de {vectors.shape[1]} dims para un índice de {self._index.d} dims"
+            )
+
+        start = self._index.ntotal
+        ids = list(range(start, start + len(texts)))
+        self._docstore.add([
+            {'vector_id': vid, 'content': text, 'metadata': meta}
+            for vid, text, meta in zip(ids, texts, metadatas)
+        ])
+        self._index.add(vectors)
+        self._added += len(ids)
+        return ids
+
+    def savepoint(self) -> Tuple[int, int]:
+        """Posición actual del escritor, para deshacer un libro que falle a medias."""
+        return self.ntotal, self._docstore.last_source_id() if self._hasher else 0
+
+    def rollback(self, savepoint: Tuple[int, int]) -> None:
+        """
+        Descarta lo añadido desde `savepoint`. Las filas de texto del docstore
+        quedan por encima de ntotal y se reemplazan en el siguiente add.
+        """
+        import faiss
+
+        ntotal, source_id = savepoint
+        if self._hasher is not None:
+            self._docstore.delete_sources_after(source_id)
+            self._docstore.delete_signatures_from(ntotal)
+        if self._index is None or ntotal >= self._index.ntotal:
+            return
+        removed = self._index.ntotal - ntotal
+        self._index.remove_ids(faiss.IDSelectorRange(ntotal, self._index.ntotal))
+        self._added = max(self._added - removed, 0)
+
+    def commit(self) -> Optional[str]:
+        """
+        Publica la generación y libera el índice. Sin cambios, devuelve la
+        generación activa. El escritor no admite más añadidos después.
+        """
+        if not self._locked:
+            raise RuntimeError("Escritor ya cerrado: crea otro con store.writer()")
+        try:
+            if self._index is None or (self._added == 0 and not self._reset):
+                return self.store.generation
+            if self._pending_training and self._index.ntotal:
+                # Cuantizador int8 entrenado con todos los vectores acumulados
+                vectors = self._index.reconstruct_n(0, self._index.ntotal)
+                quantized = self.profile.build_index(self._index.d, training=vectors)
+                quantized.add(vectors)
+                self._index = quantized
+                self._pending_training = False
+            return self.store._publish(self._index, self._docstore_name, self.model_info, self.profile)
+        finally:
+            self.close()
+
+
+# ============================================================================
+# ÍNDICE COMPARTIDO
+# ============================================================================
+
+class SharedVectorStore:
+    """
+    Índice vectorial compartido por todas las sesiones del proceso.
+
+    Layout en disco:
+        root/
+            CURRENT                  -> nombre de la generación activa
+            gen-<ts>-<id>/           -> index.faiss + meta.json (inmutables)
+            docstore-<linaje>.sqlite -> texto/metadata (append-only)
+
+    Un índice antiguo en formato LangChain (index.faiss + index.pkl) se
+    migra UNA vez al formato nuevo; a partir de ahí nunca se deserializa
+    un pickle al arrancar.
+    """
+
+    def __init__(self, root: str, embeddings):
+        self.root = root
+        self.embeddings = embeddings
+        self._lock = threading.RLock()
+        # Un solo escritor a la vez (ver IndexWriter)
+        self._write_lock = WriteLock(os.path.join(root, WRITE_LOCK_FILE))
+        self._loaded: Optional[VectorIndex] = None
+        # Mensaje si la generación activa usa otro modelo de embeddings
+        self.mismatch: Optional[str] = None
+        self._rejected_generation: Optional[str] = None
+
+        os.makedirs(self.root, exist_ok=True)
+
+    # =========================================================================
+    # LECTURA
+    # =========================================================================
+
+    @property
+    def generation(self) -> Optional[str]:
+        """Nombre de la generación activa en disco (lectura barata del puntero)."""
+        pointer = os.path.join(self.root, CURRENT_FILE)
+        try:
+            with open(pointer, 'r', encoding='utf-8') as f:
+                name = f.read().strip()
+            if name and os.path.exists(os.path.join(self.root, name, 'index.faiss')):
+                return name
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error leyendo puntero de generación: {e}")
+
+        if os.path.exists(os.path.join(self.root, 'index.faiss')):
+            return LEGACY_GENERATION
+        return None
+
+    def _generation_path(self, name: str) -> str:
+        if name == LEGACY_GENERATION:
+            return self.root
+        return os.path.join(self.root, name)
+
+    def current(self) -> Optional[VectorIndex]:
+        """
+        Devuelve la generación activa.
+
+        Si otro escritor ha publicado una generación nueva, se abre y se
+        sustituye; las búsquedas en curso siguen usando la anterior.
+        """
+        name = self.generation
+        loaded = self._loaded
+        if loaded is not None and loaded.name == name:
+            return loaded
+        if name is not None and name == self._rejected_generation:
+            return None
+        if name == LEGACY_GENERATION:
+            # La migración escribe: cerrojo de escritura antes que el del proceso
+            self._write_lock.acquire()
+            try:
+                return self._load(name)
+            finally:
+                self._write_lock.release()
+        return self._load(name)
+
+    def _load(self, name: Optional[str]) -> Optional[VectorIndex]:
+        with self._lock:
+            if name is None:
+                self._loaded = None
+                self.mismatch = None
+                return None
+            if self._loaded is not None and self._loaded.name == name:
+                return self._loaded
+
+            path = self._generation_path(name)
+            try:
+                if not os.path.exists(os.path.join(path, META_FILE)):
+                    name = self._migrate_langchain(path)
+                    path = self._generation_path(name)
+                opened = self._open(name, path)
+            except Exception as e:
+                logger.error(f"Error abriendo generación {name}: {e}")
+                return self._loaded
+
+            expected = embedding_info(self.embeddings)['embedding_model']
+            if opened.embedding_model != expected:
+                # Buscar con otro modelo devolvería basura: no se sirve el índice
+                self.mismatch = (
+                    f"El índice {self.root} se construyó con '{opened.embedding_model}' "
+                    f"pero el proveedor activo es '{expected}'. Reindexa o cambia de backend."
+                )
+                logger.error(self.mismatch)
+                self._loaded = None
+                self._rejected_generation = name
+                return None
+
+            self.mismatch = None
+            self._rejected_generation = None
+            self._loaded = opened
+            logger.info(f"Índice {self.root} abierto (generación {name}, {opened.ntotal} vectores, {opened.embedding_model})")
+            return self._loaded
+
+    def release(self) -> None:
+        """
+        Olvida la generación abierta (se reabre en el próximo current()).
+
+        Las búsquedas en curso conservan su referencia; el mapa de memoria
+        y el docstore se liberan cuando terminan.
+        """
+        with self._lock:
+            self._loaded = None
+
+    def _open(self, name: str, path: str) -> VectorIndex:
+        """Abre una generación: índice mapeado en memoria + docstore SQLite."""
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        index = read_index_mmap(os.path.join(path, 'index.faiss'))
+        docstore = SQLiteDocstore(os.path.join(self.root, meta['docstore']), readonly=True)
+        return VectorIndex(name=name, path=path, index=index, docstore=docstore, meta=meta)
+
+    def _migrate_langchain(self, path: str) -> str:
+        """
+        Convierte un índice LangChain (docstore pickled) al formato nuevo.
+
+        Es el único punto donde se deserializa index.pkl y solo ocurre una
+        vez: después CURRENT apunta a la generación migrada.
+        """
+        import pickle
+        import faiss
+
+        logger.warning(f"Migrando índice LangChain en {path} a docstore SQLite (una sola vez)")
+
+        legacy_index = faiss.read_index(os.path.join(path, 'index.faiss'))
+        with open(os.path.join(path, 'index.pkl'), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        model_info = {
+            'embedding_model': infer_legacy_model(legacy_index.d),
+            'dimension': legacy_index.d,
+            'backend': 'openai',
+            'inferred': True,
+        }
+        # La migración conserva los vectores tal cual (float32, dimensión completa)
+        writer = IndexWriter(self, reset=True, model_info=model_info, profile=StorageProfile())
+        batch = 1000
+        for start in range(0, legacy_index.ntotal, batch):
+            n = min(batch, legacy_index.ntotal - start)
+            vectors = legacy_index.reconstruct_n(start, n)
+            documents = [docstore.search(index_to_docstore_id[i]) for i in range(start, start + n)]
+            writer.add_vectors(
+                vectors,
+                [doc.page_content for doc in documents],
+                [dict(doc.metadata) for doc in documents]
+            )
+        return writer.commit()
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def writer(self, reset: bool = False, dedup: bool = False) -> IndexWriter:
+        """
+        Escritor para construir la próxima generación. Espera a que el
+        escritor anterior del índice haga commit() o close().
+
+        Args:
+            reset: True para empezar un índice vacío (sustituye al actual)
+            dedup: True para no embeber chunks casi-duplicados (MinHash/LSH)
+        """
+        return IndexWriter(self, reset=reset, dedup=dedup)
+
+    def _publish(self, index, docstore_name: str, model_info: Dict[str, Any],
+                 profile: Optional[StorageProfile] = None) -> str:
+        """
+        Persiste el índice como generación nueva y la activa.
+
+        Se escribe en un directorio temporal, se renombra y finalmente se
+        reemplaza el puntero CURRENT de forma atómica.
+        """
+        import faiss
+
+        with self._lock:
+            name = f"{GENERATION_PREFIX}{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}"
+            tmp_path = os.path.join(self.root, f".tmp-{name}")
+            os.makedirs(tmp_path)
+
+            faiss.write_index(index, os.path.join(tmp_path, 'index.faiss'))
+            profile = profile or StorageProfile()
+            meta = {
+                **model_info,
+                'docstore': docstore_name,
+                'ntotal': index.ntotal,
+                'dimension': index.d,
+                'source_dimension': model_info.get('dimension') or index.d,
+                'quantization': profile.quantization,
+                'bytes_per_vector': index.sa_code_size() if hasattr(index, 'sa_code_size') else index.d * 4,
+                'metric': 'inner_product',
+                'created_at': datetime.now().isoformat(),
+            }
+            with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+
+            os.replace(tmp_path, os.path.join(self.root, name))
+            self._write_pointer(name)
+
+            logger.info(f"Generación {name} publicada en {self.root} ({index.ntotal} vectores)")
+            self._collect_garbage()
+            return name
+
+    def _write_pointer(self, name: str) -> None:
+        pointer = os.path.join(self.root, CURRENT_FILE)
+        tmp_pointer = f"{pointer}.{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_pointer, pointer)
+
+    def _list_generations(self) -> List[str]:
+        return sorted(
+            d for d in os.listdir(self.root)
+            if d.startswith(GENERATION_PREFIX) and os.path.isdir(os.path.join(self.root, d))
+        )
+
+    def _collect_garbage(self) -> None:
+        """Elimina generaciones antiguas y docstores que ninguna referencia."""
+        active = self.generation
+        generations = self._list_generations()
+        for name in generations[:-KEEP_GENERATIONS]:
+            if name == active:
+                continue
+            # En Windows un fichero mapeado no se puede borrar: se reintenta en la próxima publicación
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+        referenced = set()
+        for name in self._list_generations():
+            try:
+                with open(os.path.join(self.root, name, META_FILE), 'r', encoding='utf-8') as f:
+                    referenced.add(json.load(f)['docstore'])
+            except Exception:
+                continue
+
+        now = time.time()
+        for entry in os.listdir(self.root):
+            if not (entry.startswith(DOCSTORE_PREFIX) and entry.endswith('.sqlite')):
+                continue
+            path = os.path.join(self.root, entry)
+            if entry not in referenced and now - os.path.getmtime(path) > ORPHAN_DOCSTORE_TTL:
+                remove_docstore_files(path)
+
+    def clear(self) -> None:
+        """Elimina todas las generaciones y docstores (incluido el formato legacy)."""
+        with self._lock:
+            self._loaded = None
+            self.mismatch = None
+            for entry in os.listdir(self.root):
+                path = os.path.join(self.root, entry)
+                if entry == WRITE_LOCK_FILE:
+                    # Borrarlo dejaría a un escritor en curso con un cerrojo huérfano
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.warning(f"No se pudo eliminar {path}: {e}")
+
+
+# ============================================================================
+# REGISTRO POR PROCESO
+# ============================================================================
+
+_SHARED_STORES: Dict[str, SharedVectorStore] = {}
+_SHARED_STORES_LOCK = threading.Lock()
+
+
+def get_shared_store(root: str, embeddings) -> SharedVectorStore:
+    """
+    Devuelve el SharedVectorStore del proceso para una ruta.
+
+    Todas las sesiones de Streamlit (y scripts en el mismo proceso) reciben
+    la misma instancia, de modo que el índice se abre una sola vez.
+    """
+    key = os.path.realpath(root)
+    with _SHARED_STORES_LOCK:
+        store = _SHARED_STORES.get(key)
+        if store is None:
+            store = SharedVectorStore(key, embeddings)
+            _SHARED_STORES[key] = store
+        return store
@@ -0,0 +1,458 @@
+"""
+🧮 HECHOS XBRL DE SEC (companyfacts)
+Todos los datos XBRL que un emisor ha presentado a SEC (companyfacts JSON:
+cada concepto us-gaap/dei/ifrs con todos sus valores y el filing que los
+reportó) normalizados a formato largo en SQLite:
+
+    (cik, concepto, unidad, periodo, valor, formulario, fecha de presentación)
+
+- Conceptos codificados como enteros (tabla concepts): las consultas
+  resuelven primero los ids y luego leen solo enteros y fechas
+- Índices por (concepto, periodo) y (cik, concepto, periodo): "Revenues de
+  50 tickers en 15 años" es un recorrido de índice de milisegundos
+- Un mismo hecho aparece en varios filings (comparativos, reexpresiones):
+  se guardan todos y las consultas se quedan con el último presentado
+- Carga desde la API de SEC (o un servidor equivalente, SINDICATO_SEC_FACTS_URL),
+  un .json/.json.gz suelto o el companyfacts.zip masivo de EDGAR
+
+Sustituye a los 4-5 periodos de los estados de yfinance como histórico
+de fundamentales para el comparador, el screener y el Comité.
+"""
+
+import os
+import gzip
+import json
+import sqlite3
+import logging
+import zipfile
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+logger = logging.getLogger(__name__)
+
+SEC_COMPANY_FACTS = os.getenv('SINDICATO_SEC_FACTS_URL', "https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json")
+
+# Formularios cuyos hechos FY son los del ejercicio completo
+ANNUAL_FORMS = ('10-K', '10-K/A', '10-KT', '20-F', '20-F/A', '40-F', '40-F/A')
+
+# Duración (días) de un periodo anual y de uno trimestral
+ANNUAL_DAYS = (350, 380)
+QUARTER_DAYS = (80, 100)
+
+# Métricas habituales -> conceptos us-gaap por orden de preferencia (los
+# emisores cambian de concepto con los años, p.ej. SalesRevenueNet ->
+# RevenueFromContractWithCustomer... tras ASC 606)
+METRICS: Dict[str, List[str]] = {
+    'revenue': [
+        'Revenues', 'RevenueFromContractWithCustomerExcludingAssessedTax',
+        'RevenueFromContractWithCustomerIncludingAssessedTax', 'SalesRevenueNet', 'SalesRevenueGoodsNet',
+    ],
+    'gross_profit': ['GrossProfit'],
+    'operating_income': ['OperatingIncomeLoss'],
+    'net_income': ['NetIncomeLoss', 'ProfitLoss'],
+    'eps_diluted': ['EarningsPerShareDiluted'],
+    'rnd': ['ResearchAndDevelopmentExpense'],
+    'operating_cash_flow': [
+        'NetCashProvidedByUsedInOperatingActivities',
+        'NetCashProvidedByUsedInOperatingActivitiesContinuingOperations',
+    ],
+    'capex': ['PaymentsToAcquirePropertyPlantAndEquipment'],
+    'total_assets': ['Assets'],
+    'total_liabilities': ['Liabilities'],
+    'equity': ['StockholdersEquity', 'StockholdersEquityIncludingPortionAttributableToNoncontrollingInterest'],
+    'cash': ['CashAndCashEquivalentsAtCarryingValue', 'CashCashEquivalentsRestrictedCashAndRestrictedCashEquivalents'],
+    'long_term_debt': ['LongTermDebt', 'LongTermDebtNoncurrent'],
+    'shares_outstanding': ['CommonStockSharesOutstanding'],
+}
+
+# Métricas por acción (no se expresan en millones)
+PER_SHARE_METRICS = {'eps_diluted'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    cik INTEGER PRIMARY KEY,
+    ticker TEXT,
+    name TEXT,
+    facts INTEGER,
+    ingested_at TEXT
+);
+CREATE INDEX IF NOT EXISTS companies_ticker ON companies(ticker);
+CREATE TABLE IF NOT EXISTS concepts (
+    concept_id INTEGER PRIMARY KEY,
+    taxonomy TEXT NOT NULL,
+    concept TEXT NOT NULL,
+    label TEXT,
+    UNIQUE (taxonomy, concept)
+);
+CREATE INDEX IF NOT EXISTS concepts_name ON concepts(concept);
+CREATE TABLE IF NOT EXISTS facts (
+    cik INTEGER NOT NULL,
+    concept_id INTEGER NOT NULL,
+    unit TEXT NOT NULL,
+    period_start TEXT,          -- NULL en hechos de instante (balance)
+    period_end TEXT NOT NULL,
+    days INTEGER,               -- duración del periodo; NULL en instantes
+    value REAL NOT NULL,
+    form TEXT,
+    filed TEXT,
+    fy INTEGER,                 -- ejercicio del filing que lo reporta (no del hecho)
+    fp TEXT,
+    accession TEXT,
+    frame TEXT
+);
+CREATE INDEX IF NOT EXISTS facts_concept_period ON facts(concept_id, period_end);
+CREATE INDEX IF NOT EXISTS facts_cik_concept_period ON facts(cik, concept_id, period_end);
+"""
+
+_FACT_COLUMNS = [
+    'ticker', 'cik', 'metric', 'concept', 'unit', 'period_start', 'period_end',
+    'year', 'value', 'form', 'filed', 'fy', 'fp', 'accession',
+]
+
+
+def _cik_int(cik: Any) -> int:
+    return int(str(cik).upper().replace('CIK', '').split('.')[0])
+
+
+def _normalize_ticker(ticker: str) -> str:
+    return ticker.upper().strip().replace('.', '-')
+
+
+def _days(start: Optional[str], end: str, cache: Dict[Tuple[str, str], Optional[int]]) -> Optional[int]:
+    if not start:
+        return None
+    key = (start, end)
+    if key not in cache:
+        try:
+            cache[key] = (date.fromisoformat(end) - date.fromisoformat(start)).days
+        except ValueError:
+            cache[key] = None
+    return cache[key]
+
+
+def iter_company_facts(path: str) -> Iterator[Dict]:
+    """
+    JSON de companyfacts de un fichero: .json, .json.gz, un directorio de
+    ellos o el companyfacts.zip de EDGAR (un JSON por emisor, se lee de
+    uno en uno sin descomprimir el archivo entero).
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(('.json', '.json.gz')):
+                yield from iter_company_facts(os.path.join(path, name))
+        return
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith('.json'):
+                    with archive.open(name) as f:
+                        yield json.load(f)
+        return
+    opener: Callable[..., IO] = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        yield json.load(f)
+
+
+class XbrlFactStore:
+    """
+    Hechos XBRL de companyfacts en formato largo. Compartido por todas las
+    sesiones del proceso (get_fact_store); una conexión SQLite por hilo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._concept_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # =========================================================================
+    # CARGA
+    # =========================================================================
+
+    def ingest(self, data: Dict, ticker: Optional[str] = None) -> int:
+        """
+        Sustituye los hechos de un emisor por los de su JSON de companyfacts.
+        Devuelve el número de hechos guardados.
+        """
+        cik = _cik_int(data['cik'])
+        conn = self._connect()
+        day_cache: Dict[Tuple[str, str], Optional[int]] = {}
+        rows = []
+        with self._concept_lock, conn:
+            concept_ids = self._concept_ids(conn, data.get('facts', {}))
+            for (taxonomy, concept), concept_id in concept_ids.items():
+                for unit, entries in data['facts'][taxonomy][concept].get('units', {}).items():
+                    for entry in entries:
+                        value = entry.get('val')
+                        end = entry.get('end')
+                        if value is None or not end:
+                            continue
+                        start = entry.get('start')
+                        rows.append((
+                            cik, concept_id, unit, start, end, _days(start, end, day_cache), float(value),
+                            entry.get('form'), entry.get('filed'), entry.get('fy'), entry.get('fp'),
+                            entry.get('accn'), entry.get('frame'),
+                        ))
+            conn.execute("DELETE FROM facts WHERE cik = ?", (cik,))
+            conn.executemany("INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO companies VALUES (?, ?, ?, ?, ?)",
+                (cik, _normalize_ticker(ticker) if ticker else None, data.get('entityName'),
+                 len(rows), datetime.now().isoformat())
+            )
+        logger.info(f"XBRL de CIK {cik} ({ticker or data.get('entityName')}): {len(rows)} hechos")
+        return len(rows)
+
+    def _concept_ids(self, conn: sqlite3.Connection, facts: Dict) -> Dict[Tuple[str, str], int]:
+        """Ids de los conceptos del JSON (se crean los que faltan)."""
+        known = {(row['taxonomy'], row['concept']): row['concept_id']
+                 for row in conn.execute("SELECT concept_id, taxonomy, concept FROM concepts")}
+        new = [(taxonomy, concept, body.get('label'))
+               for taxonomy, concepts in facts.items()
+               for concept, body in concepts.items()
+               if (taxonomy, concept) not in known]
+        if new:
+            conn.executemany("INSERT INTO concepts (taxonomy, concept, label) VALUES (?, ?, ?)", new)
+            known = {(row['taxonomy'], row['concept']): row['concept_id']
+                     for row in conn.execute("SELECT concept_id, taxonomy, concept FROM concepts")}
+        return {(taxonomy, concept): known[(taxonomy, concept)]
+                for taxonomy, concepts in facts.items() for concept in concepts}
+
+    def ingest_path(self, path: str, ticker_for: Optional[Callable[[str], Optional[str]]] = None,
+                    progress: Optional[Callable[[int, str], None]] = None) -> int:
+        """
+        Carga companyfacts desde disco (ver iter_company_facts).
+
+        Args:
+            ticker_for: CIK (10 dígitos) -> ticker, para consultar por ticker
+                (p.ej. CikIndex.ticker); sin él solo se consulta por CIK
+            progress: progress(emisores cargados, nombre) tras cada emisor
+
+        Returns:
+            Emisores cargados
+        """
+        companies = 0
+        for data in iter_company_facts(path):
+            if 'cik' not in data:
+                continue
+            ticker = ticker_for(str(_cik_int(data['cik'])).zfill(10)) if ticker_for else None
+            self.ingest(data, ticker)
+            companies += 1
+            if progress is not None:
+                progress(companies, data.get('entityName', ''))
+        return companies
+
+    def fetch(self, cik: str, session: requests.Session, ticker: Optional[str] = None,
+              url: str = SEC_COMPANY_FACTS, timeout: int = 60) -> int:
+        """
+        Descarga el companyfacts de un emisor (API de SEC o servidor
+        equivalente) y lo carga. Devuelve los hechos guardados.
+
+        Raises:
+            requests.RequestException si la descarga falla
+        """
+        response = session.get(url.format(cik=str(cik).zfill(10)), timeout=timeout)
+        response.raise_for_status()
+        return self.ingest(response.json(), ticker)
+
+    def ingested_at(self, ticker: str) -> Optional[datetime]:
+        row = self._connect().execute(
+            "SELECT ingested_at FROM companies WHERE ticker = ?", (_normalize_ticker(ticker),)
+        ).fetchone()
+        return datetime.fromisoformat(row['ingested_at']) if row else None
+
+    def companies(self) -> pd.DataFrame:
+        return pd.read_sql_query(
+            "SELECT cik, ticker, name, facts, ingested_at FROM companies ORDER BY ticker", self._connect()
+        )
+
+    # =========================================================================
+    # CONSULTAS
+    # =========================================================================
+
+    def _resolve_concepts(self, metric: str) -> List[Tuple[int, str]]:
+        """
+        (concept_id, concepto) de una métrica de METRICS o de un concepto
+        ("Revenues", "us-gaap:Revenues"), en orden de preferencia.
+        """
+        names = [name.rpartition(':') for name in METRICS.get(metric.lower(), [metric])]
+        rows = self._connect().execute(
+            f"SELECT concept_id, taxonomy, concept FROM concepts WHERE concept IN ({','.join('?' * len(names))})",
+            [concept for _, _, concept in names]
+        ).fetchall()
+        resolved = []
+        for taxonomy, _, concept in names:
+            resolved.extend((row['concept_id'], row['concept']) for row in rows
+                            if row['concept'] == concept and (not taxonomy or row['taxonomy'] == taxonomy))
+        return resolved
+
+    def _tickers(self, tickers: Optional[Iterable[str]] = None) -> Dict[int, Optional[str]]:
+        """CIK -> ticker de los emisores indicados (o de todos los cargados)."""
+        conn = self._connect()
+        if tickers is None:
+            return {row['cik']: row['ticker'] for row in conn.execute("SELECT cik, ticker FROM companies")}
+        tickers = [_normalize_ticker(t) for t in tickers]
+        if not tickers:
+            return {}
+        rows = conn.execute(f"SELECT cik, ticker FROM companies WHERE ticker IN ({','.join('?' * len(tickers))})", tickers)
+        return {row['cik']: row['ticker'] for row in rows}
+
+    def series(self, tickers: Optional[Iterable[str]], metric: str,
+               start_year: Optional[int] = None, end_year: Optional[int] = None,
+               annual: bool = True, unit: Optional[str] = None) -> pd.DataFrame:
+        """
+        Valores de una métrica por emisor y periodo, en formato largo: uno
+        por (emisor, fecha de cierre), del concepto preferido de METRICS
+        disponible y, entre reexpresiones, el último presentado.
+
+        Args:
+            tickers: Emisores (None = todos los cargados)
+            metric: Clave de METRICS ("revenue") o concepto XBRL ("Revenues")
+            start_year / end_year: Años (de la fecha de cierre) incluidos
+            annual: Ejercicios completos (10-K/20-F); False = trimestres
+            unit: Unidad ("USD", "USD/shares", "shares"); por defecto, cualquiera
+
+        Returns:
+            DataFrame (ticker, cik, metric, concept, unit, period_start,
+            period_end, year, value, form, filed, fy, fp, accession)
+        """
+        concepts = self._resolve_concepts(metric)
+        companies = self._tickers(tickers)
+        if not concepts or not companies:
+            return pd.DataFrame(columns=_FACT_COLUMNS)
+        names = dict(concepts)
+        ids = list(names)
+        where = [f"f.concept_id IN ({','.join('?' * len(ids))})"]
+        params: List[Any] = list(ids)
+
+        if tickers is not None:
+            where.append(f"f.cik IN ({','.join('?' * len(companies))})")
+            params.extend(companies)
+        if start_year is not None:
+            where.append("f.period_end >= ?")
+            params.append(f"{start_year}-01-01")
+        if end_year is not None:
+            where.append("f.period_end <= ?")
+            params.append(f"{end_year}-12-31")
+        if unit:
+            where.append("f.unit = ?")
+            params.append(unit)
+        if annual:
+            # Instantes: saldos de cierre de ejercicio de un 10-K
+            where.append(f"f.form IN ({','.join('?' * len(ANNUAL_FORMS))})")
+            params.extend(ANNUAL_FORMS)
+            where.append("(f.days IS NULL OR f.days BETWEEN ? AND ?)")
+            params.extend(ANNUAL_DAYS)
+        else:
+            # Los instantes de un 10-Q no distinguen trimestre: solo duraciones
+            where.append("f.days BETWEEN ? AND ?")
+            params.extend(QUARTER_DAYS)
+
+        # Un valor por (emisor, cierre): el de mayor preferencia = concepto
+        # preferido y, dentro de él, el filing más reciente. Con un único
+        # max() SQLite toma las demás columnas de esa misma fila (más barato
+        # que una función de ventana: ~2x en 50 tickers x 15 años)
+        rank = "CASE f.concept_id " + " ".join(f"WHEN {i} THEN {999 - n}" for n, i in enumerate(ids)) + " END"
+        sql = (
+            "SELECT f.cik, f.concept_id, f.unit, f.period_start, f.period_end, f.value, f.form, f.filed, "
+            f"f.fy, f.fp, f.accession, MAX({rank} || COALESCE(f.filed, '')) "
+            f"FROM facts f WHERE {' AND '.join(where)} GROUP BY f.cik, f.period_end ORDER BY f.cik, f.period_end"
+        )
+        cursor = self._connect().cursor()
+        cursor.row_factory = None
+        rows = [
+            (companies.get(cik), cik, metric, names[concept_id], unit_, start, end, int(end[:4]),
+             value, form, filed, fy, fp, accession)
+            for cik, concept_id, unit_, start, end, value, form, filed, fy, fp, accession, _
+            in cursor.execute(sql, params)
+        ]
+        return pd.DataFrame(rows, columns=_FACT_COLUMNS)
+
+    def frame(self, tickers: Iterable[str], metric: str, years: int = 15,
+              end_year: Optional[int] = None, annual: bool = True) -> pd.DataFrame:
+        """
+        Métrica en formato ancho: años (o cierres trimestrales) x tickers,
+        los últimos `years` ejercicios presentados hasta end_year (por
+        defecto, el actual).
+        """
+        end_year = end_year or date.today().year
+        # Un año de margen: el último 10-K puede ser del ejercicio anterior
+        facts = self.series(list(tickers), metric, start_year=end_year - years, end_year=end_year, annual=annual)
+        if facts.empty:
+            return pd.DataFrame()
+        index = 'year' if annual else 'period_end'
+        # Un cambio de fecha de cierre puede dejar dos ejercicios en un año: el último
+        facts = facts.drop_duplicates(['ticker', index], keep='last')
+        wide = facts.pivot(index=index, columns='ticker', values='value')
+        wide.columns.name = None
+        return wide.tail(years if annual else years * 4)
+
+    def cross_section(self, metric: str, year: int, tickers: Optional[Iterable[str]] = None) -> pd.Series:
+        """
+        Valor anual de una métrica en un año para todos los emisores
+        cargados (o los indicados), por ticker (o CIK si no tiene).
+        """
+        facts = self.series(tickers, metric, start_year=year, end_year=year)
+        facts['ticker'] = facts['ticker'].fillna(facts['cik'].astype(str))
+        facts = facts.drop_duplicates('ticker', keep='last')
+        return facts.set_index('ticker')['value'].rename(metric)
+
+    def summary(self, ticker: str, metrics: Optional[List[str]] = None, years: int = 10) -> pd.DataFrame:
+        """Histórico anual de un emisor: años x métricas (para el contexto del Comité)."""
+        metrics = metrics or ['revenue', 'gross_profit', 'operating_income', 'net_income', 'eps_diluted',
+                              'operating_cash_flow', 'capex', 'total_assets', 'equity', 'long_term_debt']
+        columns = {}
+        for metric in metrics:
+            wide = self.frame([ticker], metric, years=years)
+            if not wide.empty:
+                columns[metric] = wide.iloc[:, 0]
+        return pd.DataFrame(columns)
+
+    def summary_text(self, ticker: str, years: int = 10) -> str:
+        """summary() como texto para el contexto de los agentes ("" si no hay datos)."""
+        summary = self.summary(ticker, years=years)
+        if summary.empty:
+            return ""
+        shown = pd.DataFrame(index=summary.index)
+        for metric in summary.columns:
+            if metric in PER_SHARE_METRICS:
+                shown[metric] = summary[metric].map(lambda v: f"{v:.2f}" if pd.notna(v) else '-')
+            else:
+                shown[metric] = summary[metric].map(lambda v: f"{v / 1e6:,.0f}" if pd.notna(v) else '-')
+        return (f"HISTÓRICO ANUAL DE {ticker.upper()} (SEC XBRL; millones, por acción en unidades):\n"
+                f"{shown.to_string()}")
+
+
+# ============================================================================
+# ALMACÉN POR PROCESO
+# ============================================================================
+
+_STORES: Dict[str, XbrlFactStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_fact_store(root: str) -> XbrlFactStore:
+    """XbrlFactStore de <root>/companyfacts.sqlite compartido por el proceso."""
+    key = os.path.realpath(root)
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = XbrlFactStore(os.path.join(key, 'companyfacts.sqlite'))
+        return store
@@ -0,0 +1,36 @@
+"""
+🧪 Índice de CIKs sin red: una revalidación fallida no se repite en cada
+consulta; se sigue usando la copia local.
+"""
+
+import json
+import time
+
+import requests
+
+from services.cik_index import CikIndex
+
+
+class OfflineSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        raise requests.exceptions.ConnectionError("sin red")
+
+
+def test_failed_revalidation_backs_off_and_uses_local_copy(tmp_path):
+    (tmp_path / 'company_tickers.json').write_text(
+        json.dumps({"0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}})
+    )
+    # Copia de hace dos días: hay que revalidarla
+    (tmp_path / 'company_tickers.meta.json').write_text(json.dumps({"checked_at": time.time() - 2 * 86400}))
+    session = OfflineSession()
+    index = CikIndex(str(tmp_path))
+
+    assert [index.cik('AAPL', session) for _ in range(3)] == ['0000320193'] * 3
+    assert session.calls == 1
+    # Otro proceso (u otro arranque) respeta la espera registrada en disco
+    assert CikIndex(str(tmp_path)).cik('AAPL', session) == '0000320193'
+    assert session.calls == 1
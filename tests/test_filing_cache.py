@@ -0,0 +1,34 @@
+"""
+🧪 Submissions sin red: pasado el TTL, una revalidación fallida no se
+repite en cada consulta; se sigue usando la copia local.
+"""
+
+import gzip
+import json
+import time
+
+import requests
+
+from services.filing_cache import FilingCache
+
+
+class OfflineSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        raise requests.exceptions.ConnectionError("sin red")
+
+
+def test_failed_revalidation_backs_off_and_uses_local_copy(tmp_path):
+    cache = FilingCache(str(tmp_path))
+    data_path, meta_path = cache._submissions_paths('320193')
+    submissions = {"cik": "320193", "filings": {"recent": {}}}
+    cache._write(data_path, gzip.compress(json.dumps(submissions).encode('utf-8')))
+    # Revalidada hace dos horas: fuera del TTL
+    cache._write(meta_path, json.dumps({"checked_at": time.time() - 7200}).encode('utf-8'))
+    session = OfflineSession()
+
+    assert [cache.submissions('320193', session) for _ in range(3)] == [submissions] * 3
+    assert session.calls == 1
@@ -0,0 +1,36 @@
+"""
+🧪 Encabezados de Item: una remisión que el PDF parte al inicio de línea
+("Item 1A, Risk Factors, of this report...") no abre un Item nuevo.
+"""
+
+from services.chunking import PageText
+from services.filing_sections import SectionTracker, find_headings
+
+MDA_PAGE = (
+    "Item 7. Management's Discussion and Analysis of Financial Condition\n"
+    "Revenue grew on higher volumes. For a discussion of the risks see\n"
+    "Item 1A, Risk Factors, of this report and we caution readers\n"
+    "that results may differ. Liquidity remained strong during the year.\n"
+    "Item 7A. Quantitative and Qualitative Disclosures About Market Risk\n"
+    "We are exposed to interest rate risk.\n"
+)
+
+
+def test_wrapped_cross_reference_is_not_a_heading():
+    assert [item for _, item, _ in find_headings(MDA_PAGE)] == ['7', '7A']
+
+
+def test_wrapped_cross_reference_stays_in_its_item():
+    segments = SectionTracker().split(PageText(1, MDA_PAGE))
+    assert [item for item, _ in segments] == ['7', '7A']
+    assert "Liquidity remained strong" in segments[0][1].text
+
+
+def test_heading_forms():
+    assert find_headings("Item 1A. Risk Factors") == [(0, '1A', 'Risk Factors')]
+    assert find_headings("ITEM 7A QUANTITATIVE AND QUALITATIVE DISCLOSURES") == [
+        (0, '7A', 'QUANTITATIVE AND QUALITATIVE DISCLOSURES')
+    ]
+    assert find_headings("Item 8") == [(0, '8', '')]
+    assert find_headings("Item 7 of this report describes") == []
+    assert find_headings("Item 15(a)(1) of this Annual Report on Form 10-K") == []
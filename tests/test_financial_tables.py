@@ -0,0 +1,49 @@
+"""
+🧪 Tablas financieras tipadas: la unidad de "Basic"/"Diluted" depende de
+la fila padre ("Net income per share:" frente a "Weighted-average shares").
+"""
+
+from services.financial_tables import parse_table
+
+CONTEXT = "Consolidated Statements of Operations (in millions, except per share data)"
+
+ROWS = [
+    ["", "Year Ended December 31,", "", ""],
+    ["", "2023", "2022", "2021"],
+    ["Total revenues", "$ 96,773", "$ 81,462", "$ 53,823"],
+    ["Net income", "15,001", "12,587", "5,644"],
+    ["Net income per share of common stock:", "", "", ""],
+    ["Basic", "$ 4.73", "$ 4.02", "$ 1.87"],
+    ["Diluted", "$ 4.30", "$ 3.62", "$ 1.63"],
+    ["Weighted average shares used in computing net income per share of common stock:", "", "", ""],
+    ["Basic", "3,174", "3,130", "3,019"],
+    ["Diluted", "3,485", "3,475", "3,386"],
+]
+
+
+def _rows_by_parent(table):
+    return {(row.parent, row.label): row for row in table.rows}
+
+
+def test_basic_and_diluted_under_per_share_parent_are_per_share():
+    table = parse_table(ROWS, context=CONTEXT)
+    rows = _rows_by_parent(table)
+    diluted = rows[("Net income per share of common stock", "Diluted")]
+    assert diluted.unit == "USD/share"
+    assert table.row_scale(diluted) == 1
+    assert diluted.values == [4.30, 3.62, 1.63]
+
+
+def test_basic_and_diluted_under_shares_parent_are_share_counts():
+    table = parse_table(ROWS, context=CONTEXT)
+    parent = "Weighted average shares used in computing net income per share of common stock"
+    diluted = _rows_by_parent(table)[(parent, "Diluted")]
+    assert diluted.unit == "shares"
+    assert table.row_scale(diluted) == 1_000_000
+
+
+def test_currency_rows_keep_currency_unit():
+    table = parse_table(ROWS, context=CONTEXT)
+    revenue = _rows_by_parent(table)[(None, "Total revenues")]
+    assert revenue.unit == "USD"
+    assert table.row_scale(revenue) == 1_000_000
@@ -0,0 +1,56 @@
+"""
+🧪 Caché semántico de consultas: el nivel semántico no debe mezclar
+consultas que solo difieren en un año, una cifra o un Item.
+"""
+
+import numpy as np
+
+from services.query_cache import SemanticQueryCache, normalize_query, query_anchors
+
+
+def _vector(seed: int = 0) -> np.ndarray:
+    vector = np.random.default_rng(seed).standard_normal(16).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).reshape(1, -1)
+
+
+def _lookup(cache: SemanticQueryCache, query: str, vector: np.ndarray, calls: list):
+    def compute(vectors):
+        calls.append(query)
+        return f"resultados de {query}"
+    return cache.get_or_compute('g1', query, ('k', 5), lambda: vector, compute)
+
+
+def test_year_only_difference_is_not_a_semantic_hit():
+    cache = SemanticQueryCache(similarity_threshold=0.95)
+    calls = []
+    # Mismo embedding: coseno 1.0, por encima de cualquier umbral
+    vector = _vector()
+    assert _lookup(cache, "revenue 2022", vector, calls) == "resultados de revenue 2022"
+    assert _lookup(cache, "revenue 2023", vector, calls) == "resultados de revenue 2023"
+    assert calls == ["revenue 2022", "revenue 2023"]
+    assert cache.stats()['semantic_hits'] == 0
+
+
+def test_item_difference_is_not_a_semantic_hit():
+    cache = SemanticQueryCache()
+    calls = []
+    vector = _vector(1)
+    _lookup(cache, "Item 7 liquidity", vector, calls)
+    _lookup(cache, "Item 7A liquidity", vector, calls)
+    assert calls == ["Item 7 liquidity", "Item 7A liquidity"]
+
+
+def test_paraphrase_with_same_anchors_is_a_semantic_hit():
+    cache = SemanticQueryCache()
+    calls = []
+    vector = _vector(2)
+    _lookup(cache, "total debt in 2023", vector, calls)
+    assert _lookup(cache, "2023 total debt levels", vector, calls) == "resultados de total debt in 2023"
+    assert calls == ["total debt in 2023"]
+    assert cache.stats()['semantic_hits'] == 1
+
+
+def test_query_anchors():
+    assert query_anchors(normalize_query("Item 7A. Market Risk")) == {"item 7a"}
+    assert query_anchors(normalize_query("Q3 FY2023 revenue")) == {"q3", "fy2023"}
+    assert query_anchors(normalize_query("how much debt does it have")) == frozenset()
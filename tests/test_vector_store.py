@@ -0,0 +1,38 @@
+"""
+🧪 Índice compartido: escritores concurrentes de un mismo índice no
+deben perder lo que publica el otro.
+"""
+
+import threading
+
+from services.embeddings import get_embedding_provider
+from services.vector_store import SharedVectorStore
+
+
+def test_concurrent_writers_do_not_lose_updates(tmp_path):
+    store = SharedVectorStore(str(tmp_path), get_embedding_provider('hashing'))
+
+    def write(tag):
+        for i in range(5):
+            writer = store.writer()
+            writer.add_texts([f"{tag} texto {i}"], [{'tag': tag}])
+            writer.commit()
+
+    threads = [threading.Thread(target=write, args=(tag,)) for tag in 'abcd']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.current().ntotal == 20
+
+
+def test_closed_writer_releases_the_index(tmp_path):
+    store = SharedVectorStore(str(tmp_path), get_embedding_provider('hashing'))
+    with store.writer() as writer:
+        writer.add_texts(["sin publicar"], [{}])
+    # Sin commit no se publica nada y el siguiente escritor no espera
+    writer = store.writer()
+    writer.add_texts(["publicado"], [{}])
+    writer.commit()
+    assert store.current().ntotal == 1